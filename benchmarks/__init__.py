@@ -0,0 +1 @@
+"""Micro-benchmarks, run as modules from the repository root."""
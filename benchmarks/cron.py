@@ -0,0 +1,51 @@
+"""Micro-benchmark for computing cron run times.
+
+Run from the repository root, as a module so `pingpong` can be imported:
+
+    python -m benchmarks.cron
+
+Running the file directly (`python benchmarks/cron.py`) fails to import
+`pingpong`, because the script's own directory is put on the path instead of
+the repository root.
+"""
+
+import timeit
+from datetime import datetime, timezone
+
+from pingpong.now import CronSchedule, compile_cron
+
+SCHEDULES = [
+    "*/15 * * * *",
+    "0 * * * *",
+    "30 2 * * *",
+    "0 9 * * mon-fri",
+    "0 0 1 * *",
+    "0 0 29 2 *",
+    "0 0 13 * 5",
+]
+START = datetime(2025, 3, 1, 12, 7, 30, tzinfo=timezone.utc)
+NUMBER = 10_000
+
+
+def main() -> None:
+    print(f"{'schedule':<18} {'compile':>10} {'next run':>10} {'next 100':>10}")
+    for sched in SCHEDULES:
+        compiled = CronSchedule(sched)
+        compile_time = timeit.timeit(lambda: CronSchedule(sched), number=NUMBER)
+        next_time = timeit.timeit(
+            lambda: compile_cron(sched).next_after(START), number=NUMBER
+        )
+        iterate_time = timeit.timeit(
+            lambda: [ts for ts, _ in zip(compiled.iter_after(START), range(100))],
+            number=NUMBER // 100,
+        )
+        print(
+            f"{sched:<18} "
+            f"{compile_time / NUMBER * 1e6:>8.2f}us "
+            f"{next_time / NUMBER * 1e6:>8.2f}us "
+            f"{iterate_time / (NUMBER // 100) * 1e6:>8.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import os
+
+# Settings read at import time by the server and the sync scripts. Tests never
+# talk to Airtable or PingPong.
+os.environ.setdefault("CONFIG_PATH", "test_config.toml")
+os.environ.setdefault("AIRTABLE_BASE_ID", "appStudyTest")
+os.environ.setdefault("AIRTABLE_NONSTUDY_BASE_ID", "appNonStudyTest")
+os.environ.setdefault("AIRTABLE_API_KEY", "test-api-key")
+os.environ.setdefault("PINGPONG_COOKIE", "test-cookie")
+os.environ.setdefault("PINGPONG_URL", "http://pingpong.test")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def rate_limit_dir(tmp_path, monkeypatch):
+    """Keep the shared Airtable rate limiter state out of the real temp dir."""
+    import pingpong.ratelimit as ratelimit
+
+    monkeypatch.setenv("AIRTABLE_RATE_LIMIT_DIR", str(tmp_path / "ratelimit"))
+    monkeypatch.setattr(ratelimit, "_buckets", {})
+    return tmp_path / "ratelimit"
@@ -0,0 +1,304 @@
+"""Async Airtable client for the pyairtable ORM models.
+
+The pyairtable ORM only speaks synchronous HTTP, so calling it from the event
+loop means borrowing a worker thread for every request. This client talks to
+the Airtable REST API directly over a shared, pooled aiohttp session and
+turns the responses back into ORM model instances.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Generic, NamedTuple, TypeVar
+from urllib.parse import quote
+
+import aiohttp
+from pyairtable.api.types import RecordDict
+from pyairtable.formulas import to_formula_str
+from pyairtable.orm import Model
+
+from pingpong.ratelimit import Priority, acquire, backoff, MAX_RETRIES
+
+AIRTABLE_API_URL = "https://api.airtable.com/v0"
+# Largest page Airtable will return when listing records.
+PAGE_SIZE = 100
+# Largest number of records Airtable accepts in a single batch write.
+BATCH_SIZE = 10
+
+M = TypeVar("M", bound=Model)
+
+_clients: list["AirtableClient"] = []
+
+
+class BatchUpdateResult(NamedTuple, Generic[M]):
+    updated: list[M]
+    # Error message for each record ID that could not be updated.
+    failed: dict[str, str]
+
+
+class AirtableError(aiohttp.ClientResponseError):
+    """An error response from Airtable, with the error type from its body."""
+
+    def __init__(self, *args: Any, error_type: str | None = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.error_type = error_type
+
+
+class AirtableClient:
+    """Airtable API client sharing one keep-alive connection pool.
+
+    Every request waits its turn in the shared per-base rate limiter, at the
+    client's `priority`, and is retried after a backoff when Airtable answers
+    with a 429.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        priority: Priority = Priority.INTERACTIVE,
+        limit: int = 20,
+        keepalive_timeout: float = 30.0,
+        timeout: float = 30.0,
+    ):
+        self.api_key = api_key
+        self.priority = priority
+        self._limit = limit
+        self._keepalive_timeout = keepalive_timeout
+        self._timeout = timeout
+        self._session: aiohttp.ClientSession | None = None
+        _clients.append(self)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session, created on first use inside the running loop."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self._limit,
+                    keepalive_timeout=self._keepalive_timeout,
+                    ttl_dns_cache=300,
+                ),
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+                raise_for_status=True,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @staticmethod
+    def url(model: type[Model]) -> str:
+        return f"{AIRTABLE_API_URL}/{model.meta.base_id}/{quote(model.meta.table_name, safe='')}"
+
+    async def request(
+        self, method: str, model: type[Model], path: str = "", **kwargs: Any
+    ) -> Any:
+        base_id = model.meta.base_id
+        url = f"{self.url(model)}{path}"
+        attempt = 0
+        while True:
+            await acquire(base_id, self.priority)
+            async with self.session.request(
+                method, url, raise_for_status=False, **kwargs
+            ) as resp:
+                if resp.status == 429 and attempt < MAX_RETRIES:
+                    await asyncio.to_thread(
+                        backoff, base_id, attempt, resp.headers.get("Retry-After")
+                    )
+                    attempt += 1
+                    continue
+                if resp.status >= 400:
+                    raise await self._error(resp)
+                return await resp.json()
+
+    @staticmethod
+    async def _error(resp: aiohttp.ClientResponse) -> AirtableError:
+        error_type = None
+        try:
+            error = (await resp.json(content_type=None) or {}).get("error")
+            error_type = error.get("type") if isinstance(error, dict) else error
+        except (ValueError, AttributeError, aiohttp.ClientError):
+            pass
+        return AirtableError(
+            resp.request_info,
+            resp.history,
+            status=resp.status,
+            message=resp.reason or "",
+            headers=resp.headers,
+            error_type=error_type,
+        )
+
+    async def get(self, model: type[M], record_id: str) -> M:
+        """Fetch a single record by its Airtable record ID."""
+        record = await self.request("GET", model, f"/{record_id}")
+        return model.from_record(record)
+
+    async def list_page(
+        self,
+        model: type[Model],
+        *,
+        formula: Any = None,
+        sort: list[str] | None = None,
+        page_size: int = PAGE_SIZE,
+        max_records: int | None = None,
+        offset: str | None = None,
+    ) -> tuple[list[RecordDict], str | None]:
+        """Fetch one page of raw records and the offset of the next page.
+
+        `sort` takes field names, prefixed with "-" for descending order.
+        """
+        body: dict[str, Any] = {"pageSize": page_size}
+        if formula is not None:
+            body["filterByFormula"] = to_formula_str(formula)
+        if sort:
+            body["sort"] = [
+                {"field": field.lstrip("-"), "direction": "desc"}
+                if field.startswith("-")
+                else {"field": field, "direction": "asc"}
+                for field in sort
+            ]
+        if max_records is not None:
+            body["maxRecords"] = max_records
+        if offset:
+            body["offset"] = offset
+        # Use the POST form of the list endpoint so long formulas don't run
+        # into URL length limits.
+        response = await self.request("POST", model, "/listRecords", json=body)
+        return response.get("records", []), response.get("offset")
+
+    async def iterate_records(
+        self,
+        model: type[Model],
+        *,
+        formula: Any = None,
+        sort: list[str] | None = None,
+        page_size: int = PAGE_SIZE,
+        max_records: int | None = None,
+    ) -> AsyncIterator[list[RecordDict]]:
+        """Yield pages of raw records as they arrive.
+
+        Airtable pages are chained through an offset token, so they can't be
+        requested in parallel. Instead the next page is requested as soon as
+        the current one arrives, while the caller works on the current one.
+        """
+
+        def fetch(offset: str | None):
+            return asyncio.ensure_future(
+                self.list_page(
+                    model,
+                    formula=formula,
+                    sort=sort,
+                    page_size=page_size,
+                    max_records=max_records,
+                    offset=offset,
+                )
+            )
+
+        next_page = fetch(None)
+        try:
+            while True:
+                records, offset = await next_page
+                if offset:
+                    next_page = fetch(offset)
+                yield records
+                if not offset:
+                    return
+        finally:
+            if not next_page.done():
+                next_page.cancel()
+
+    async def iterate(
+        self,
+        model: type[M],
+        *,
+        formula: Any = None,
+        sort: list[str] | None = None,
+        page_size: int = PAGE_SIZE,
+        max_records: int | None = None,
+    ) -> AsyncIterator[list[M]]:
+        """Yield pages of records as model instances."""
+        async for records in self.iterate_records(
+            model,
+            formula=formula,
+            sort=sort,
+            page_size=page_size,
+            max_records=max_records,
+        ):
+            yield [model.from_record(record) for record in records]
+
+    async def all(
+        self,
+        model: type[M],
+        *,
+        formula: Any = None,
+        sort: list[str] | None = None,
+        max_records: int | None = None,
+    ) -> list[M]:
+        """Fetch every record matching the formula."""
+        records = list[M]()
+        async for page in self.iterate(
+            model, formula=formula, sort=sort, max_records=max_records
+        ):
+            records.extend(page)
+        return records
+
+    async def first(self, model: type[M], *, formula: Any = None) -> M | None:
+        """Fetch the first record matching the formula, if there is one."""
+        records, _ = await self.list_page(
+            model, formula=formula, page_size=1, max_records=1
+        )
+        return model.from_record(records[0]) if records else None
+
+    async def update(self, model: type[M], record_id: str, fields: dict[str, Any]) -> M:
+        """Update the given fields (by Airtable field name) on one record."""
+        record = await self.request(
+            "PATCH", model, f"/{record_id}", json={"fields": fields}
+        )
+        return model.from_record(record)
+
+    async def batch_update(
+        self, model: type[M], updates: list[tuple[str, dict[str, Any]]]
+    ) -> BatchUpdateResult[M]:
+        """Update many records, `BATCH_SIZE` records per request.
+
+        The batches are sent concurrently, paced by the rate limiter. Airtable
+        applies each batch all-or-nothing, so when a batch fails every record
+        in it is reported as failed and the other batches still go through.
+        """
+        batches = [
+            updates[start : start + BATCH_SIZE]
+            for start in range(0, len(updates), BATCH_SIZE)
+        ]
+        responses = await asyncio.gather(
+            *[
+                self.request(
+                    "PATCH",
+                    model,
+                    json={
+                        "records": [
+                            {"id": record_id, "fields": fields}
+                            for record_id, fields in batch
+                        ]
+                    },
+                )
+                for batch in batches
+            ],
+            return_exceptions=True,
+        )
+
+        result = BatchUpdateResult[M]([], {})
+        for batch, response in zip(batches, responses):
+            if isinstance(response, BaseException):
+                for record_id, _ in batch:
+                    result.failed[record_id] = str(response)
+            else:
+                result.updated.extend(model.from_record(r) for r in response["records"])
+        return result
+
+
+async def close_clients() -> None:
+    """Close the connection pools of every client created in this process."""
+    for client in _clients:
+        await client.close()
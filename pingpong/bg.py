@@ -1,12 +1,18 @@
+import base64
 import contextlib
+import hashlib
+import hmac
+import json
 import logging
 import threading
 import time
 import uvicorn
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from typing import Generator
 
+from pingpong.jobs import Scheduler
+
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
@@ -24,6 +30,46 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/jobs")
+def jobs(request: Request):
+    """Status, duration and backlog of each scheduled job."""
+    scheduler: Scheduler | None = request.app.state.scheduler
+    return {"jobs": scheduler.status() if scheduler else []}
+
+
+def _valid_airtable_mac(secret: str, body: bytes, header: str | None) -> bool:
+    """Check the MAC Airtable signs webhook notifications with."""
+    if not header or not header.startswith("hmac-sha256="):
+        return False
+    expected = hmac.new(base64.b64decode(secret), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(header.removeprefix("hmac-sha256="), expected)
+
+
+@app.post("/webhooks/airtable")
+async def airtable_webhook(request: Request):
+    """Airtable webhook notification: run the jobs that watch the changed base."""
+    body = await request.body()
+    secret: str | None = request.app.state.webhook_secret
+    # Without a secret there's no way to tell Airtable from anyone else.
+    if not secret:
+        raise HTTPException(status_code=401, detail="Webhooks aren't configured.")
+    if not _valid_airtable_mac(
+        secret, body, request.headers.get("X-Airtable-Content-MAC")
+    ):
+        raise HTTPException(status_code=401, detail="Invalid signature.")
+    try:
+        base_id = json.loads(body)["base"]["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid notification.")
+
+    scheduler: Scheduler | None = request.app.state.scheduler
+    jobs: dict[str, list[str]] = request.app.state.webhook_jobs
+    notified = [
+        name for name in jobs.get(base_id, []) if scheduler and scheduler.notify(name)
+    ]
+    return {"notified": notified}
+
+
 class BackgroundServer(uvicorn.Server):
     """A uvicorn server that can be run in a background thread."""
 
@@ -54,7 +100,21 @@ class BackgroundServer(uvicorn.Server):
                 )
 
 
-def get_server(host="localhost", port=8001) -> BackgroundServer:
-    """Get the background server."""
+def get_server(
+    host="localhost",
+    port=8001,
+    scheduler: Scheduler | None = None,
+    webhook_jobs: dict[str, list[str]] | None = None,
+    webhook_secret: str | None = None,
+) -> BackgroundServer:
+    """Get the background server, reporting on the given scheduler's jobs.
+
+    Airtable webhook notifications for a base in `webhook_jobs` notify the
+    jobs listed for it. Notifications must be signed with `webhook_secret` (the
+    webhook's base64 MAC secret); without one, every notification is rejected.
+    """
+    app.state.scheduler = scheduler
+    app.state.webhook_jobs = webhook_jobs or {}
+    app.state.webhook_secret = webhook_secret
     config = uvicorn.Config(app, host=host, port=port, log_level="info")
     return BackgroundServer(config)
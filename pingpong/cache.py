@@ -0,0 +1,48 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+import pingpong.metrics as metrics
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """A per-process cache whose entries expire `ttl` seconds after being set.
+
+    Hits and misses are reported through the `cache_lookups` metric, labeled
+    with the cache's `name`. When more than `maxsize` entries are stored, the
+    least recently used ones are evicted.
+    """
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 1024):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict[K, tuple[float, V]]()
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            metrics.cache_lookups.inc(cache=self.name, result="hit")
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        metrics.cache_lookups.inc(cache=self.name, result="miss")
+        return None
+
+    def set(self, key: K, value: V) -> None:
+        if self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -114,6 +114,13 @@ class StudySettings(BaseSettings):
     airtable_preassessment_submission_table_id: str
     airtable_postassessment_submission_table_id: str
     airtable_user_class_association_table_id: str
+    instructor_cache_ttl: int = Field(60)
+    course_index_ttl: int = Field(300)
+    replica_path: str | None = Field(None)
+    replica_sync_interval: int = Field(30)
+    replica_full_sync_interval: int = Field(3600)
+    replica_lookup_full_sync_interval: int = Field(300)
+    http_validator_ttl: int = Field(60)
 
 
 class Config(BaseSettings):
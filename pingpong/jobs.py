@@ -0,0 +1,202 @@
+"""Independently scheduled background jobs.
+
+Each job runs on its own cron schedule, so a slow job doesn't hold up the
+others. When a job is triggered while it's still running (or already running
+as many times as its concurrency allows), its overlap policy decides what
+happens to the new run:
+
+- `skip`: drop it.
+- `queue`: start it once a running one finishes, keeping every missed run.
+- `coalesce`: like `queue`, but any number of missed runs collapse into one.
+
+Jobs can also be triggered by change notifications through
+`Scheduler.notify`, from any thread. Notifications are debounced: the first
+one starts the job after the job's debounce delay, and any that arrive in the
+meantime are folded into that run.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Literal
+
+import pingpong.metrics as metrics
+from pingpong.now import MissedTickPolicy, croner, utcnow
+
+logger = logging.getLogger(__name__)
+
+OverlapPolicy = Literal["skip", "queue", "coalesce"]
+
+
+class Job:
+    """A named coroutine function run on a cron schedule."""
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[], Awaitable[None]],
+        crontime: str,
+        *,
+        concurrency: int = 1,
+        overlap: OverlapPolicy = "coalesce",
+        debounce: float = 0.0,
+        missed: MissedTickPolicy = "skip",
+        jitter: float = 0.0,
+    ):
+        self.name = name
+        self.run = run
+        self.crontime = crontime
+        self.concurrency = max(1, concurrency)
+        self.overlap = overlap
+        self.debounce = debounce
+        self.missed = missed
+        self.jitter = jitter
+        # Runs that were triggered but are waiting for a free slot.
+        self.backlog = 0
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.notifications = 0
+        self.last_started: datetime | None = None
+        self.last_finished: datetime | None = None
+        self.last_duration: float | None = None
+        self.last_error: str | None = None
+        self._tasks = set[asyncio.Task]()
+        self._notified: asyncio.TimerHandle | None = None
+
+    @property
+    def running(self) -> int:
+        return len(self._tasks)
+
+    def trigger(self) -> None:
+        """Start a run now, or apply the overlap policy if there's no free slot."""
+        if self.running < self.concurrency:
+            self._start()
+        elif self.overlap == "queue":
+            self.backlog += 1
+        elif self.overlap == "coalesce":
+            self.backlog = 1
+        else:
+            self.skipped += 1
+            logger.info(f"Skipping {self.name}: previous run still in progress.")
+        metrics.job_backlog.set(self.backlog, job=self.name)
+
+    def notify(self) -> None:
+        """Trigger the job once the debounce delay passes."""
+        self.notifications += 1
+        if self._notified is None:
+            self._notified = asyncio.get_running_loop().call_later(
+                self.debounce, self._trigger_notified
+            )
+
+    def _trigger_notified(self) -> None:
+        self._notified = None
+        self.trigger()
+
+    def _start(self) -> None:
+        task = asyncio.create_task(self._execute(), name=self.name)
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if self.backlog and self.running < self.concurrency:
+            self.backlog -= 1
+            metrics.job_backlog.set(self.backlog, job=self.name)
+            self._start()
+
+    async def _execute(self) -> None:
+        self.last_started = utcnow()
+        start = time.monotonic()
+        status = "ok"
+        try:
+            await self.run()
+            self.last_error = None
+        except Exception as e:
+            status = "error"
+            self.failures += 1
+            self.last_error = str(e)
+            logger.exception(f"Error running {self.name}: {e}")
+        finally:
+            self.runs += 1
+            self.last_duration = time.monotonic() - start
+            self.last_finished = utcnow()
+            metrics.job_duration.observe(
+                self.last_duration, job=self.name, status=status
+            )
+
+    async def schedule(self) -> None:
+        """Trigger the job on its cron schedule until cancelled."""
+        async for _ in croner(
+            self.crontime,
+            logger=logger,
+            task_name=self.name,
+            missed=self.missed,
+            jitter=self.jitter,
+        ):
+            self.trigger()
+
+    async def cancel(self) -> None:
+        """Cancel any running runs and drop the backlog."""
+        self.backlog = 0
+        if self._notified is not None:
+            self._notified.cancel()
+            self._notified = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "crontime": self.crontime,
+            "overlap": self.overlap,
+            "missed_ticks": self.missed,
+            "jitter": self.jitter,
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "backlog": self.backlog,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "notifications": self.notifications,
+            "last_started": self.last_started,
+            "last_finished": self.last_finished,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    """Runs a set of jobs concurrently on the same event loop."""
+
+    def __init__(self, jobs: list[Job] | None = None):
+        self.jobs = {job.name: job for job in jobs or []}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def add(self, job: Job) -> None:
+        self.jobs[job.name] = job
+
+    async def run(self) -> None:
+        """Schedule every job until cancelled."""
+        self._loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*(job.schedule() for job in self.jobs.values()))
+        finally:
+            self._loop = None
+            await asyncio.gather(*(job.cancel() for job in self.jobs.values()))
+
+    def notify(self, name: str) -> bool:
+        """Tell a job it has new work. Safe to call from any thread.
+
+        Returns whether the job exists and the scheduler is running.
+        """
+        job = self.jobs.get(name)
+        if job is None or self._loop is None or self._loop.is_closed():
+            return False
+        self._loop.call_soon_threadsafe(job.notify)
+        return True
+
+    def status(self) -> list[dict[str, Any]]:
+        return [job.status() for job in self.jobs.values()]
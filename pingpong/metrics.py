@@ -34,6 +34,62 @@ in_flight = Gauge(
 )
 
 
+cache_lookups = Counter(
+    "cache_lookups",
+    "Number of lookups against in-process caches",
+    unit="lookups",
+    labels=["cache", "result"],
+)
+
+
+airtable_rate_limit_wait = Histogram(
+    "airtable_rate_limit_wait",
+    "Time spent waiting for the Airtable rate limiter",
+    unit="s",
+    labels=["base", "priority"],
+)
+
+
+pingpong_api_connections = Counter(
+    "pingpong_api_connections",
+    "Connections the sync scripts opened or reused to reach the PingPong API",
+    unit="connections",
+    labels=["event"],
+)
+
+
+job_duration = Histogram(
+    "job_duration",
+    "Duration of background job runs",
+    unit="s",
+    labels=["job", "status"],
+)
+
+
+job_backlog = Gauge(
+    "job_backlog",
+    "Number of background job runs waiting for the previous run to finish",
+    unit="runs",
+    labels=["job"],
+)
+
+
+cron_lag = Histogram(
+    "cron_lag",
+    "How late scheduled ticks fire behind their scheduled time plus jitter",
+    unit="s",
+    labels=["task"],
+)
+
+
+cron_missed_ticks = Counter(
+    "cron_missed_ticks",
+    "Scheduled ticks that passed while the previous tick was still being handled",
+    unit="ticks",
+    labels=["task", "policy"],
+)
+
+
 @contextmanager
 def metrics():
     # TODO - set up for AWS
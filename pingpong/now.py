@@ -1,8 +1,12 @@
 import asyncio
 import calendar
+import functools
 import logging
+import random
 from datetime import datetime, timedelta, timezone
-from typing import Callable, Optional
+from typing import Callable, Iterator, Literal
+
+import pingpong.metrics as metrics
 
 NowFn = Callable[[], datetime]
 
@@ -12,73 +16,188 @@ def utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def _parse_cron_element(element: str) -> list[int]:
+# Inclusive value range of each cron field: minute, hour, day of month, month,
+# day of week (0 and 7 are both Sunday).
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+_FIELD_NAMES = ("minute", "hour", "day of month", "month", "day of week")
+_MONTH_NAMES = {
+    name: i
+    for i, name in enumerate(
+        "jan feb mar apr may jun jul aug sep oct nov dec".split(), start=1
+    )
+}
+_WEEKDAY_NAMES = {
+    name: i for i, name in enumerate("sun mon tue wed thu fri sat".split())
+}
+_MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+# Days of the month 1-31 spaced a week apart, by first day (bit n is day n).
+_EVERY_WEEK_FROM = [sum(1 << day for day in range(first, 32, 7)) for first in range(8)]
+# Days 1 to n of a month, by n.
+_MONTH_DAYS = [((1 << (n + 1)) - 1) & ~1 for n in range(32)]
+# Every day of the week, Sunday to Saturday.
+_EVERY_WEEKDAY = 0x7F
+# The largest number of days each month can have.
+_MAX_MONTH_DAYS = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _parse_cron_value(value: str, names: dict[str, int]) -> int:
+    return names[value.lower()] if value.lower() in names else int(value)
+
+
+def _parse_cron_element(
+    element: str, low: int, high: int, names: dict[str, int] | None = None
+) -> int:
     """
-    Parse a cron element into a list of valid integers.
-    Handles simple numbers, lists (1,2,3), ranges (1-5), and steps (*/2, 1-5/2)
+    Parse a cron element into a bitset of the values it matches (bit n is n).
+    Handles wildcards, simple numbers or names, lists (1,2,3), ranges (1-5),
+    and steps (*/2, 1-5/2, 3/2).
     """
-    if element == "*":
-        return []
-
-    values = set[int]()
+    names = names or {}
+    values = 0
     for part in element.split(","):
-        if "/" in part:
-            range_part, step_str = part.split("/")
-            step = int(step_str)
-            if range_part == "*":
-                start, end = 0, 59  # Default range for *
-            else:
-                if "-" in range_part:
-                    start_str, end_str = range_part.split("-")
-                    start, end = int(start_str), int(end_str)
-                else:
-                    start = end = int(range_part)
-            values.update(range(start, end + 1, step))
-        elif "-" in part:
-            start_str, end_str = part.split("-")
-            start, end = int(start_str), int(end_str)
-            values.update(range(start, end + 1))
+        range_part, slash, step_str = part.partition("/")
+        step = int(step_str) if slash else 1
+        if step < 1:
+            raise ValueError(f"Invalid step in {part!r}")
+        if range_part == "*":
+            start, end = low, high
+        elif "-" in range_part:
+            start_str, end_str = range_part.split("-")
+            start = _parse_cron_value(start_str, names)
+            end = _parse_cron_value(end_str, names)
         else:
-            values.add(int(part))
-    return sorted(list(values))
+            start = _parse_cron_value(range_part, names)
+            # A single value with a step runs to the end of the range.
+            end = high if slash else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"Value out of range in {part!r}")
+        for value in range(start, end + 1, step):
+            values |= 1 << value
+    return values
 
 
-def _matches(
-    pattern: str, value: int, year: Optional[int] = None, month: Optional[int] = None
-) -> bool:
-    """
-    Check if a value matches a cron pattern.
+def _next_bit(bits: int, start: int) -> int | None:
+    """The lowest set bit in `bits` at or above `start`, if any."""
+    above = bits >> start
+    if not above:
+        return None
+    return start + (above & -above).bit_length() - 1
 
-    Args:
-        pattern: Cron pattern (e.g., "*/15", "1,2,3", "1-5", "9-17/2")
-        value: Value to check
-        year: Optional year for day validation
-        month: Optional month for day validation
 
-    Returns:
-        bool: True if value matches pattern
+class CronSchedule:
     """
-    # First validate the day of month if year and month are provided
-    if year is not None and month is not None:
-        _, last_day = calendar.monthrange(year, month)
-        if value > last_day:
-            raise ValueError(f"Invalid day {value} for month {month}")
+    A compiled cron schedule.
 
-    # Handle wildcard
-    if pattern == "*":
-        return True
+    Each field is a bitset of the values it matches, so the next run time is
+    found by looking up the next matching value of each field, carrying into
+    the field above when a field runs out, rather than by stepping through
+    time. As in standard cron, when both the day of month and the day of week
+    are restricted, a day matches if either does.
+    """
 
-    try:
-        valid_values = _parse_cron_element(pattern)
+    def __init__(self, sched: str):
+        self.sched = sched
+        fields = _MACROS.get(sched.strip().lower(), sched).split()
+        if len(fields) != 5:
+            raise ValueError("Invalid cron format. Expected 5 fields.")
+        parsed = list[int]()
+        for element, (low, high), name, names in zip(
+            fields,
+            _FIELD_RANGES,
+            _FIELD_NAMES,
+            (None, None, None, _MONTH_NAMES, _WEEKDAY_NAMES),
+        ):
+            try:
+                parsed.append(_parse_cron_element(element, low, high, names))
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"Invalid cron pattern for {name}: {element}") from e
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # Sunday can be written as 0 or 7.
+        self.weekdays = (weekdays | weekdays >> 7) & _EVERY_WEEKDAY
+        # A day matches if either day field does only when neither starts
+        # with a wildcard; otherwise both have to match.
+        self.either_day = not (fields[2].startswith("*") or fields[4].startswith("*"))
+
+        # Catch day and month combinations that never exist, like February
+        # 30th. Every other date falls on every weekday within the 400-year
+        # calendar cycle, so any other schedule runs.
+        if not self.either_day and not any(
+            self.days & _MONTH_DAYS[_MAX_MONTH_DAYS[month]]
+            for month in range(1, 13)
+            if self.months >> month & 1
+        ):
+            raise ValueError(f"Cron schedule never runs: {sched}")
+
+    def _days_in(self, year: int, month: int) -> int:
+        """The bitset of the days that match in a month."""
+        month_days = _MONTH_DAYS[calendar.monthrange(year, month)[1]]
+        if self.weekdays == _EVERY_WEEKDAY:
+            return month_days if self.either_day else self.days & month_days
+        # Cron weekday of the 1st, where Sunday is 0.
+        first_weekday = (calendar.weekday(year, month, 1) + 1) % 7
+        weekdays = 0
+        for weekday in range(7):
+            if self.weekdays >> weekday & 1:
+                weekdays |= _EVERY_WEEK_FROM[1 + (weekday - first_weekday) % 7]
+        if self.either_day:
+            return (weekdays | self.days) & month_days
+        return weekdays & self.days & month_days
+
+    def next_after(self, ts: datetime, tz=timezone.utc) -> datetime:
+        """The first run time strictly after `ts`, in the given timezone."""
+        ts = ts.astimezone(tz).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        year, month, day, hour, minute = ts.year, ts.month, ts.day, ts.hour, ts.minute
+        # The calendar repeats every 400 years, so a schedule that hasn't run
+        # by then never will.
+        last_year = year + 400
+        while year <= last_year:
+            next_month = _next_bit(self.months, month)
+            if next_month is None:
+                year, month, day, hour, minute = year + 1, 1, 1, 0, 0
+                continue
+            if next_month != month:
+                month, day, hour, minute = next_month, 1, 0, 0
+
+            next_day = _next_bit(self._days_in(year, month), day)
+            if next_day is None:
+                month, day, hour, minute = month + 1, 1, 0, 0
+                continue
+            if next_day != day:
+                day, hour, minute = next_day, 0, 0
+
+            next_hour = _next_bit(self.hours, hour)
+            if next_hour is None:
+                day, hour, minute = day + 1, 0, 0
+                continue
+            if next_hour != hour:
+                hour, minute = next_hour, 0
+
+            next_minute = _next_bit(self.minutes, minute)
+            if next_minute is None:
+                hour, minute = hour + 1, 0
+                continue
+            return datetime(year, month, day, hour, next_minute, tzinfo=tz)
+        raise ValueError(f"Cron schedule never runs: {self.sched}")
 
-        # Empty list means wildcard
-        if not valid_values:
-            return True
+    def iter_after(self, ts: datetime, tz=timezone.utc) -> Iterator[datetime]:
+        """Iterate over the run times after `ts`, lazily."""
+        while True:
+            ts = self.next_after(ts, tz)
+            yield ts
 
-        return value in valid_values
 
-    except ValueError as e:
-        raise ValueError(f"Invalid cron pattern: {pattern}") from e
+@functools.lru_cache(maxsize=128)
+def compile_cron(sched: str) -> CronSchedule:
+    """Compile a cron schedule, reusing schedules compiled before."""
+    return CronSchedule(sched)
 
 
 def _get_next_run_time(sched: str, ts: datetime, tz=timezone.utc) -> datetime:
@@ -94,97 +213,16 @@ def _get_next_run_time(sched: str, ts: datetime, tz=timezone.utc) -> datetime:
         datetime: The next run time.
 
     Raises:
-        ValueError: If the cron format is invalid or if unable to find next run time within MAX_ITERATIONS
+        ValueError: If the cron expression is invalid or never runs.
     """
-    MAX_ITERATIONS = 1000  # Prevent infinite loops
-    iteration_count = 0
-
-    # Split the cron schedule into its components
-    try:
-        minute, hour, day, month, weekday = sched.split()
-    except ValueError:
-        raise ValueError("Invalid cron format. Expected 5 fields.")
-
-    # Start with the current timestamp
-    ts = ts.astimezone(tz)
-    ts = ts.replace(second=0, microsecond=0)
-    original_ts = ts
-
-    # If we're looking for a specific day (not *), store it
-    target_day = None if day == "*" else int(day)
-
-    while iteration_count < MAX_ITERATIONS:
-        iteration_count += 1
-
-        if target_day:
-            _, last_day = calendar.monthrange(ts.year, ts.month)
-            if target_day > last_day:
-                # Skip to next month if target day is greater than days in current month
-                if ts.month == 12:
-                    ts = ts.replace(year=ts.year + 1, month=1, day=1)
-                else:
-                    ts = ts.replace(month=ts.month + 1, day=1)
-                ts = ts.replace(hour=0, minute=0, second=0)
-                continue
-            elif ts.day > target_day:
-                # If we've passed the target day in current month, move to next month
-                if ts.month == 12:
-                    ts = ts.replace(year=ts.year + 1, month=1, day=target_day)
-                else:
-                    ts = ts.replace(month=ts.month + 1, day=target_day)
-                ts = ts.replace(hour=0, minute=0, second=0)
-                continue
-
-        # Convert weekday to cron format (0-6, where 0 is Sunday)
-        cron_wday = ts.weekday()
-        if weekday != "*":  # Only adjust if we're checking specific days
-            cron_wday = (
-                ts.weekday() + 1
-            ) % 7  # Convert to cron format where 1-7 represents Mon-Sun
-
-        matches_all = (
-            _matches(minute, ts.minute)
-            and _matches(hour, ts.hour)
-            and _matches(day, ts.day, ts.year, ts.month)
-            and _matches(month, ts.month)
-            and _matches(weekday, cron_wday)
-        )
-
-        if matches_all:
-            if ts <= original_ts:
-                ts += timedelta(minutes=1)
-                ts = ts.replace(second=0)
-                continue
-            return ts
-
-        if not _matches(minute, ts.minute):
-            ts += timedelta(minutes=1)
-            ts = ts.replace(second=0)
-            continue
-
-        if not _matches(hour, ts.hour):
-            ts += timedelta(hours=1)
-            ts = ts.replace(minute=0, second=0)
-            continue
+    return compile_cron(sched).next_after(ts, tz)
 
-        if not _matches(day, ts.day, ts.year, ts.month) or not _matches(
-            weekday, cron_wday
-        ):
-            ts += timedelta(days=1)
-            ts = ts.replace(hour=0, minute=0, second=0)
-            continue
 
-        if not _matches(month, ts.month):
-            if ts.month == 12:
-                ts = ts.replace(year=ts.year + 1, month=1, day=1)
-            else:
-                ts = ts.replace(month=ts.month + 1, day=1)
-            ts = ts.replace(hour=0, minute=0, second=0)
-            continue
+MissedTickPolicy = Literal["skip", "catch_up", "coalesce"]
 
-    raise ValueError(
-        f"Unable to find next run time within {MAX_ITERATIONS} iterations. Possible invalid cron expression or infinite loop detected."
-    )
+# Seconds the wall clock may move against the loop's monotonic clock before
+# it's taken to have been set, and ticks are scheduled from it again.
+CLOCK_STEP_TOLERANCE = 1.0
 
 
 async def croner(
@@ -192,17 +230,69 @@ async def croner(
     now: NowFn = utcnow,
     logger: logging.Logger = logging.getLogger(__name__),
     task_name: str | None = None,
+    *,
+    missed: MissedTickPolicy = "skip",
+    jitter: float = 0.0,
 ):
-    """Iterate over the given cron schedule."""
+    """Iterate over the given cron schedule, yielding each tick's scheduled time.
+
+    Ticks are waited for on the event loop's monotonic clock, and each one is
+    computed from the previous tick rather than from when the caller got
+    back, so the schedule doesn't drift. Ticks that pass while the caller is
+    still handling the previous one are dropped (`skip`), all yielded late in
+    order (`catch_up`), or yielded once (`coalesce`). Each tick fires up to
+    `jitter` seconds late at random, to spread out tasks on the same schedule.
+    Firing up to `jitter` seconds late doesn't count as time spent handling a
+    tick, so a jitter longer than the gap between ticks never drops any.
+    """
+    schedule = compile_cron(sched)
+    loop = asyncio.get_running_loop()
+    label = task_name or sched
+    # Wall clock time minus loop time, to place wall clock ticks on the loop.
+    offset = now().timestamp() - loop.time()
+    next_run = schedule.next_after(now())
     while True:
-        ts = now()
-        next_run = _get_next_run_time(sched, ts)
-        wait = (next_run - now()).total_seconds()
+        current_offset = now().timestamp() - loop.time()
+        if abs(current_offset - offset) > CLOCK_STEP_TOLERANCE:
+            logger.warning(
+                f"Wall clock moved by {current_offset - offset:.1f} seconds, "
+                "rescheduling from it."
+            )
+            offset = current_offset
+        scheduled = next_run.timestamp() - offset
+        deadline = scheduled + random.uniform(0, jitter)
+        wait = deadline - loop.time()
         if task_name:
             logger.info(
                 f"Next run for {task_name} scheduled at: {next_run} (in {wait} seconds)"
             )
         else:
             logger.info(f"Next job scheduled at: {next_run} (in {wait} seconds)")
-        await asyncio.sleep(wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        metrics.cron_lag.observe(max(0.0, loop.time() - deadline), task=label)
+        late = min(max(0.0, loop.time() - scheduled), jitter)
         yield next_run
+
+        following = schedule.next_after(next_run)
+        # Ticks are missed against the schedule without jitter: take back the
+        # part of the delay the jitter accounts for.
+        current = now() - timedelta(seconds=late)
+        if following > current or missed == "catch_up":
+            next_run = following
+            continue
+        # Ticks passed while the caller was busy: count them, and resume
+        # from the latest one (to fire it now) or from the next future one.
+        latest, count = following, 0
+        for tick in schedule.iter_after(next_run):
+            if tick > current:
+                break
+            latest, count = tick, count + 1
+        if missed == "coalesce":
+            next_run = latest
+            count -= 1
+        else:
+            next_run = schedule.next_after(current)
+        if count:
+            logger.info(f"Missed {count} ticks of {label} ({missed}).")
+            metrics.cron_missed_ticks.inc(count, task=label, policy=missed)
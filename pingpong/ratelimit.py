@@ -0,0 +1,318 @@
+"""Client-side rate limiting for Airtable traffic.
+
+Airtable allows 5 requests per second per base and answers anything above that
+with a 429 and a 30-second penalty. Both the study server workers and the sync
+scripts talk to the same bases, so the limiter state lives in one small file
+per base, locked with `flock`, which every process on the host shares. Point
+`AIRTABLE_RATE_LIMIT_DIR` at a shared volume to coordinate across containers.
+
+Taking the lock can block while another process holds it, so the async
+`acquire` updates the file from a worker thread.
+
+Within a process, requests waiting on a base queue up by priority and then
+arrival, and only the one at the front of the queue polls the shared file.
+Between processes there is no queue: priority only keeps a reserve of tokens
+that batch work can't take.
+"""
+
+import asyncio
+import fcntl
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from enum import IntEnum
+from pathlib import Path
+from weakref import WeakKeyDictionary
+
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import pingpong.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+# Requests per second Airtable allows for each base.
+AIRTABLE_RATE = 5.0
+# Tokens kept back for interactive requests; batch work can't use them.
+AIRTABLE_RESERVE = 2.0
+# Number of times a rate-limited request is retried before giving up.
+MAX_RETRIES = 5
+# Upper bound for the exponential backoff when Airtable sends no Retry-After.
+MAX_BACKOFF = 30.0
+
+
+class Priority(IntEnum):
+    """Who is waiting on a request. Lower values are served first."""
+
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+class TokenBucket:
+    """A token bucket whose state is stored in a file shared between processes."""
+
+    def __init__(self, path: Path, rate: float, burst: float, reserve: float = 0.0):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.reserve = reserve
+
+    def _update(self, take: bool, priority: Priority, penalty: float = 0.0) -> float:
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                state = json.loads(raw) if raw else {}
+                now = time.time()
+                elapsed = max(0.0, now - state.get("updated", now))
+                tokens = min(
+                    self.burst, state.get("tokens", self.burst) + elapsed * self.rate
+                )
+                blocked_until = max(state.get("blocked_until", 0.0), now + penalty)
+
+                wait = 0.0
+                floor = self.reserve if priority == Priority.BATCH else 0.0
+                if blocked_until > now:
+                    wait = blocked_until - now
+                elif tokens - floor >= 1.0:
+                    if take:
+                        tokens -= 1.0
+                else:
+                    wait = (1.0 + floor - tokens) / self.rate
+
+                f.seek(0)
+                f.truncate()
+                json.dump(
+                    {"tokens": tokens, "updated": now, "blocked_until": blocked_until},
+                    f,
+                )
+                return wait
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def try_acquire(self, priority: Priority = Priority.INTERACTIVE) -> float:
+        """Take a token and return 0, or return the seconds to wait before retrying."""
+        return self._update(take=True, priority=priority)
+
+    def penalize(self, seconds: float) -> None:
+        """Stop every process from sending requests for the next `seconds`."""
+        self._update(take=False, priority=Priority.INTERACTIVE, penalty=seconds)
+
+
+_buckets: dict[str, TokenBucket] = {}
+
+
+def airtable_bucket(base_id: str) -> TokenBucket:
+    """Get the shared token bucket for an Airtable base."""
+    if base_id not in _buckets:
+        directory = Path(
+            os.environ.get("AIRTABLE_RATE_LIMIT_DIR", tempfile.gettempdir())
+        )
+        directory.mkdir(parents=True, exist_ok=True)
+        _buckets[base_id] = TokenBucket(
+            directory / f"pingpong-airtable-{base_id}.ratelimit",
+            rate=AIRTABLE_RATE,
+            burst=AIRTABLE_RATE,
+            reserve=AIRTABLE_RESERVE,
+        )
+    return _buckets[base_id]
+
+
+def _jitter(wait: float) -> float:
+    # Spread out waiters so they don't all retry at the same instant.
+    return wait + random.uniform(0, 0.05)
+
+
+class _Waiters:
+    """Requests on one event loop waiting for a bucket, served by priority."""
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self._queue = list[tuple[Priority, int, asyncio.Future]]()
+        self._arrivals = itertools.count()
+        self._arrived = asyncio.Event()
+        self._server: asyncio.Task | None = None
+
+    async def wait(self, priority: Priority) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._arrivals), future))
+        self._arrived.set()
+        if self._server is None or self._server.done():
+            self._server = asyncio.create_task(self._serve())
+        await future
+
+    def _pop(self) -> asyncio.Future | None:
+        """The first waiter that hasn't given up, removed from the queue."""
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                return future
+        return None
+
+    async def _serve(self) -> None:
+        while self._queue:
+            priority, _, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            self._arrived.clear()
+            try:
+                wait = await asyncio.to_thread(self.bucket.try_acquire, priority)
+            except Exception as e:
+                if waiter := self._pop():
+                    waiter.set_exception(e)
+                continue
+            if wait <= 0:
+                # Anyone who jumped the queue meanwhile has at least this
+                # priority, so the token is theirs.
+                if waiter := self._pop():
+                    waiter.set_result(None)
+                continue
+            # Wake early if someone joins the queue, in case they go first.
+            try:
+                await asyncio.wait_for(self._arrived.wait(), _jitter(wait))
+            except asyncio.TimeoutError:
+                pass
+
+
+class _SyncWaiters:
+    """Threads waiting for a bucket, served by priority."""
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self._queue = list[tuple[Priority, int]]()
+        self._arrivals = itertools.count()
+        self._changed = threading.Condition()
+
+    def wait(self, priority: Priority) -> None:
+        entry = (priority, next(self._arrivals))
+        with self._changed:
+            heapq.heappush(self._queue, entry)
+            self._changed.notify_all()
+            try:
+                while True:
+                    if self._queue[0] != entry:
+                        self._changed.wait()
+                        continue
+                    wait = self.bucket.try_acquire(priority)
+                    if wait <= 0:
+                        return
+                    self._changed.wait(_jitter(wait))
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._changed.notify_all()
+
+
+_waiters = WeakKeyDictionary[asyncio.AbstractEventLoop, dict[TokenBucket, _Waiters]]()
+_sync_waiters = WeakKeyDictionary[TokenBucket, _SyncWaiters]()
+_sync_waiters_lock = threading.Lock()
+
+
+async def acquire(base_id: str, priority: Priority = Priority.INTERACTIVE) -> None:
+    """Wait until a request to the given base may be sent."""
+    bucket = airtable_bucket(base_id)
+    start = time.monotonic()
+    waiters = _waiters.setdefault(asyncio.get_running_loop(), {})
+    if bucket not in waiters:
+        waiters[bucket] = _Waiters(bucket)
+    await waiters[bucket].wait(priority)
+    metrics.airtable_rate_limit_wait.observe(
+        time.monotonic() - start, base=base_id, priority=priority.name.lower()
+    )
+
+
+def acquire_sync(base_id: str, priority: Priority = Priority.BATCH) -> None:
+    """Blocking version of `acquire`, for code running outside the event loop."""
+    bucket = airtable_bucket(base_id)
+    start = time.monotonic()
+    with _sync_waiters_lock:
+        if bucket not in _sync_waiters:
+            _sync_waiters[bucket] = _SyncWaiters(bucket)
+        waiters = _sync_waiters[bucket]
+    waiters.wait(priority)
+    metrics.airtable_rate_limit_wait.observe(
+        time.monotonic() - start, base=base_id, priority=priority.name.lower()
+    )
+
+
+def backoff(base_id: str, attempt: int, retry_after: str | None) -> None:
+    """Record a 429 from Airtable, pausing all traffic to the base.
+
+    Honors the Retry-After header when Airtable sends one, and otherwise backs
+    off exponentially.
+    """
+    try:
+        delay = float(retry_after) if retry_after else None
+    except ValueError:
+        delay = None
+    if delay is None:
+        delay = min(MAX_BACKOFF, 2.0**attempt) + random.uniform(0, 1)
+    logger.warning(
+        "Airtable rate limit hit for base %s, pausing for %.1f seconds.",
+        base_id,
+        delay,
+    )
+    airtable_bucket(base_id).penalize(delay)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """A requests adapter that sends Airtable calls through the shared limiter.
+
+    Mounted on the pyairtable ORM's session, so the synchronous scripts share
+    the limiter with the async study client. Connection errors and other
+    retriable responses are still retried by `max_retries`, but 429s are
+    retried here, after pausing every process through the shared bucket.
+    """
+
+    def __init__(
+        self,
+        base_id: str,
+        priority: Priority = Priority.BATCH,
+        max_retries: Retry | int = 0,
+    ):
+        if isinstance(max_retries, Retry):
+            max_retries = max_retries.new(
+                status_forcelist=set(max_retries.status_forcelist or ()) - {429},
+                respect_retry_after_header=False,
+            )
+        super().__init__(max_retries=max_retries)
+        self.base_id = base_id
+        self.priority = priority
+
+    def send(self, request: PreparedRequest, *args, **kwargs) -> Response:  # type: ignore[override]
+        attempt = 0
+        while True:
+            acquire_sync(self.base_id, self.priority)
+            response = super().send(request, *args, **kwargs)
+            if response.status_code != 429 or attempt >= MAX_RETRIES:
+                return response
+            backoff(self.base_id, attempt, response.headers.get("Retry-After"))
+            response.close()
+            attempt += 1
+
+
+def limit_models(*models, priority: Priority = Priority.BATCH) -> None:
+    """Route the given pyairtable ORM models' requests through the limiter.
+
+    The adapter keeps the retry strategy of the one it replaces.
+    """
+    for model in models:
+        session = model.meta.api.session
+        current = session.get_adapter("https://api.airtable.com/")
+        session.mount(
+            "https://api.airtable.com/",
+            RateLimitedAdapter(
+                model.meta.base_id,
+                priority,
+                max_retries=getattr(current, "max_retries", 0),
+            ),
+        )
@@ -2,16 +2,26 @@ import asyncio
 import click
 import logging
 
-from datetime import datetime
+from typing import Awaitable, Callable, cast, get_args
 from pingpong.bg import get_server
-from pingpong.now import croner
+from pingpong.jobs import Job, OverlapPolicy, Scheduler
+from pingpong.now import MissedTickPolicy, compile_cron
+from pingpong.scripts.airtable.changes import QueueWatcher, queues_by_base
 from pingpong.scripts.airtable.helpers import (
+    CLASS_REQUESTS,
+    EXTERNAL_LOGINS_TO_ADD,
+    EXTERNAL_LOGINS_TO_ADD_NON_STUDY,
+    NONSTUDY_CLASS_REQUESTS,
+    STUDENTS_TO_ADD,
     _process_airtable_class_requests,
     _process_airtable_nonstudy_class_requests,
     _process_external_logins_to_add_non_study,
     _process_students_to_add,
     _process_external_logins_to_add,
 )
+from pingpong.scripts.airtable.queues import Queue
+from pingpong.scripts.airtable.sync_context import SyncContext
+from pingpong.scripts.airtable.vars import AIRTABLE_WEBHOOK_SECRET
 
 logger = logging.getLogger(__name__)
 
@@ -21,27 +31,178 @@ def cli() -> None:
     pass
 
 
+# The sync phases, in the order they used to run in. They touch different
+# tables, so each runs as its own job.
+SYNC_PHASES = {
+    "class_requests": _process_airtable_class_requests,
+    "students_to_add": _process_students_to_add,
+    "external_logins_to_add": _process_external_logins_to_add,
+    "nonstudy_class_requests": _process_airtable_nonstudy_class_requests,
+    "external_logins_to_add_non_study": _process_external_logins_to_add_non_study,
+}
+
+# The rows each phase works through, watched for changes.
+PHASE_QUEUES: dict[str, Queue] = {
+    "class_requests": CLASS_REQUESTS,
+    "students_to_add": STUDENTS_TO_ADD,
+    "external_logins_to_add": EXTERNAL_LOGINS_TO_ADD,
+    "nonstudy_class_requests": NONSTUDY_CLASS_REQUESTS,
+    "external_logins_to_add_non_study": EXTERNAL_LOGINS_TO_ADD_NON_STUDY,
+}
+
+
+def _parse_phase_options(values: tuple[str, ...], option: str) -> dict[str, str]:
+    parsed = dict[str, str]()
+    for value in values:
+        phase, sep, setting = value.partition("=")
+        if not sep or phase not in SYNC_PHASES:
+            raise click.BadParameter(
+                f"Expected PHASE=VALUE with PHASE one of {', '.join(SYNC_PHASES)}.",
+                param_hint=option,
+            )
+        parsed[phase] = setting
+    return parsed
+
+
 @cli.command("sync_pingpong_with_airtable")
 @click.option("--crontime", default="*/15 * * * *")
+@click.option(
+    "--phase-crontime",
+    multiple=True,
+    help="Cron schedule for one phase, as PHASE=CRON. Defaults to --crontime.",
+)
+@click.option(
+    "--overlap",
+    type=click.Choice(["skip", "queue", "coalesce"]),
+    default="coalesce",
+    help="What to do when a phase is due while its previous run is still going.",
+)
+@click.option(
+    "--phase-overlap",
+    multiple=True,
+    help="Overlap policy for one phase, as PHASE=POLICY. Defaults to --overlap.",
+)
+@click.option(
+    "--phase-concurrency",
+    multiple=True,
+    help="Runs of one phase allowed at the same time, as PHASE=N. Defaults to 1.",
+)
+@click.option(
+    "--missed-ticks",
+    type=click.Choice(["skip", "catch_up", "coalesce"]),
+    default="skip",
+    help="What to do with cron ticks that pass while the scheduler is busy.",
+)
+@click.option(
+    "--jitter",
+    default=0.0,
+    help="Up to this many seconds of random delay on each cron tick.",
+)
+@click.option(
+    "--poll-interval",
+    default=60.0,
+    help="Seconds between checks of each phase's queue for changes. 0 disables.",
+)
+@click.option(
+    "--debounce",
+    default=5.0,
+    help="Seconds a phase waits after a change notification before running.",
+)
 @click.option("--host", default="localhost")
 @click.option("--port", default=8001)
-def sync_pingpong_with_airtable(crontime: str, host: str, port: int) -> None:
+def sync_pingpong_with_airtable(
+    crontime: str,
+    phase_crontime: tuple[str, ...],
+    overlap: OverlapPolicy,
+    phase_overlap: tuple[str, ...],
+    phase_concurrency: tuple[str, ...],
+    missed_ticks: MissedTickPolicy,
+    jitter: float,
+    poll_interval: float,
+    debounce: float,
+    host: str,
+    port: int,
+) -> None:
     """
-    Run the sync-all command in a background server.
+    Run the sync phases as independently scheduled jobs in a background server.
+
+    A phase also runs shortly after its queue changes, as seen by polling or
+    by Airtable webhook notifications to /webhooks/airtable. The cron schedule
+    is a fallback sweep.
     """
-    server = get_server(host=host, port=port)
+    crontimes = _parse_phase_options(phase_crontime, "--phase-crontime")
+    for sched, option in [
+        (crontime, "--crontime"),
+        *((sched, "--phase-crontime") for sched in crontimes.values()),
+    ]:
+        try:
+            compile_cron(sched)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint=option)
+    overlaps = dict[str, OverlapPolicy]()
+    for name, policy in _parse_phase_options(phase_overlap, "--phase-overlap").items():
+        if policy not in get_args(OverlapPolicy):
+            raise click.BadParameter(
+                f"Unknown overlap policy {policy!r}.", param_hint="--phase-overlap"
+            )
+        overlaps[name] = cast(OverlapPolicy, policy)
+    concurrencies = dict[str, int]()
+    for name, value in _parse_phase_options(
+        phase_concurrency, "--phase-concurrency"
+    ).items():
+        if not value.isdigit() or int(value) < 1:
+            raise click.BadParameter(
+                f"Expected a positive number of runs, got {value!r}.",
+                param_hint="--phase-concurrency",
+            )
+        concurrencies[name] = int(value)
+
+    # All phases share one connection pool to the PingPong API.
+    context = SyncContext()
+
+    def run_phase(phase) -> Callable[[], Awaitable[None]]:
+        async def run() -> None:
+            async with context.session() as session:
+                await phase(session)
+
+        return run
+
+    scheduler = Scheduler(
+        [
+            Job(
+                name,
+                run_phase(phase),
+                crontimes.get(name, crontime),
+                concurrency=concurrencies.get(name, 1),
+                overlap=overlaps.get(name, overlap),
+                debounce=debounce,
+                missed=missed_ticks,
+                jitter=jitter,
+            )
+            for name, phase in SYNC_PHASES.items()
+        ]
+    )
+    if not AIRTABLE_WEBHOOK_SECRET:
+        logger.warning(
+            "No Airtable webhook secret, webhook notifications will be rejected."
+        )
+    server = get_server(
+        host=host,
+        port=port,
+        scheduler=scheduler,
+        webhook_jobs=queues_by_base(PHASE_QUEUES),
+        webhook_secret=AIRTABLE_WEBHOOK_SECRET,
+    )
 
     async def _sync_pingpong_with_airtable():
-        async for _ in croner(crontime, logger=logger):
-            try:
-                await _process_airtable_class_requests()
-                await _process_students_to_add()
-                await _process_external_logins_to_add()
-                await _process_airtable_nonstudy_class_requests()
-                await _process_external_logins_to_add_non_study()
-                logger.info(f"Sync completed successfully at {datetime.now()}")
-            except Exception as e:
-                logger.exception(f"Error during sync: {e}")
+        tasks = [scheduler.run()]
+        if poll_interval > 0:
+            watcher = QueueWatcher(PHASE_QUEUES, scheduler.notify, poll_interval)
+            tasks.append(watcher.run())
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await context.close()
 
     # Run the Uvicorn server in the background
     with server.run_in_thread():
@@ -81,12 +81,17 @@ def process_external_logins_to_add_non_study() -> None:
 
 
 @cli.command("process_airtable_class_update_requests")
-def process_airtable_class_update_requests() -> None:
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    help="Report which assistants would change without updating them.",
+)
+def process_airtable_class_update_requests(dry_run: bool) -> None:
     """
     Process pending Airtable class update requests.
     """
     logger.info("Processing class update requests...")
-    asyncio.run(_process_airtable_class_update_requests())
+    asyncio.run(_process_airtable_class_update_requests(dry_run=dry_run))
     logger.info("Finished processing class update requests.")
 
 
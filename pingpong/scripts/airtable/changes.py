@@ -0,0 +1,80 @@
+"""Change-driven triggering of the sync phases.
+
+The sync phases run on a cron schedule, so new requests wait for the next
+tick, and every tick reads every queue even when nothing changed. A
+`QueueWatcher` instead checks each phase's queue for rows modified since the
+last check, one single-record request per queue, and notifies the phase when
+there is something new. Airtable webhook pings, received by the background
+server, notify the phases of the base that changed in the same way.
+
+The cron schedule stays as a fallback sweep, for rows a run didn't get to and
+changes a check missed.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable
+
+from pingpong.now import utcnow
+from pingpong.scripts.airtable.queues import Queue, changed_since
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the queues.
+POLL_INTERVAL = 60.0
+# How far back each check overlaps the previous one, to allow for the
+# difference between our clock and Airtable's.
+CLOCK_SKEW = timedelta(seconds=30)
+
+
+def queues_by_base(queues: dict[str, Queue]) -> dict[str, list[str]]:
+    """The names of the queues in each Airtable base."""
+    bases = dict[str, list[str]]()
+    for name, queue in queues.items():
+        bases.setdefault(queue.model.meta.base_id, []).append(name)
+    return bases
+
+
+class QueueWatcher:
+    """Notifies the sync phase of each queue when rows in it change.
+
+    The first check notifies every phase that has rows waiting at all.
+    """
+
+    def __init__(
+        self,
+        queues: dict[str, Queue],
+        notify: Callable[[str], object],
+        interval: float = POLL_INTERVAL,
+    ):
+        self.queues = queues
+        self.notify = notify
+        self.interval = interval
+        self._watermarks = dict[str, datetime]()
+
+    async def check(self) -> list[str]:
+        """Check every queue once and notify the ones that changed."""
+        changed = list[str]()
+        for name, queue in self.queues.items():
+            checked_at = utcnow()
+            watermark = self._watermarks.get(name)
+            try:
+                has_changes = await changed_since(
+                    queue, watermark - CLOCK_SKEW if watermark else None
+                )
+            except Exception as e:
+                logger.warning(f"Error checking {name} for changes: {e}")
+                continue
+            self._watermarks[name] = checked_at
+            if has_changes:
+                logger.info(f"New rows waiting for {name}.")
+                self.notify(name)
+                changed.append(name)
+        return changed
+
+    async def run(self) -> None:
+        """Check the queues every interval until cancelled."""
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
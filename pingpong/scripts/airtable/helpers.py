@@ -1,12 +1,27 @@
+import asyncio
+import json
 import logging
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, TypeVar
+from urllib.parse import urlsplit
+from weakref import WeakKeyDictionary
 
 import aiohttp
 import pingpong.schemas as schemas
 import pingpong.scripts.airtable.schemas as scripts_schemas
 import pingpong.scripts.airtable.server_requests as server_requests
+from pingpong.scripts.airtable.journal import Checkpoint, ProvisioningJournal
+from pingpong.scripts.airtable.prefetch import LinkedRecords
+from pingpong.scripts.airtable.prompts import PromptRenderer
+from pingpong.scripts.airtable.queues import Queue, iterate_queue
+from pingpong.scripts.airtable.sync_context import pingpong_session
+from pingpong.scripts.airtable.write_back import WriteBackBuffer
 
 from pingpong.scripts.airtable.vars import (
     BILLING_PROVIDERS,
+    CLASS_PROVISIONING_CONCURRENCY,
+    INSTITUTION_DIRECTORY_PATH,
     PINGPONG_COOKIE,
     PINGPONG_URL,
 )
@@ -14,10 +29,35 @@ from pyairtable.formulas import match, AND, NE, Field
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+A = TypeVar(
+    "A",
+    scripts_schemas.PingPongAssistant,
+    scripts_schemas.PingPongAssistantNonStudy,
+)
+
+# Students added to a class per request to the PingPong API.
+STUDENT_BATCH_SIZE = 100
+
+# The rows each sync phase works through.
+CLASS_REQUESTS = Queue(
+    scripts_schemas.PingPongClass, match({"Status": "Ready for Add"})
+)
+NONSTUDY_CLASS_REQUESTS = Queue(
+    scripts_schemas.PingPongClassNonStudy, match({"Status": "Ready for Add"})
+)
+STUDENTS_TO_ADD = Queue(
+    scripts_schemas.UserClassRole, match({"Status": "Add to Class"})
+)
+EXTERNAL_LOGINS_TO_ADD = Queue(
+    scripts_schemas.ExternalLoginRequests, match({"Status": "Ready to Add"})
+)
+EXTERNAL_LOGINS_TO_ADD_NON_STUDY = Queue(
+    scripts_schemas.ExternalLoginRequestsNonStudy, match({"Status": "Ready to Add"})
+)
+
 if not PINGPONG_COOKIE:
     raise ValueError("Missing PingPong cookie in environment.")
-else:
-    _PINGPONG_COOKIE = PINGPONG_COOKIE
 
 if not PINGPONG_URL:
     raise ValueError("Missing PingPong URL in environment.")
@@ -25,25 +65,109 @@ else:
     _PINGPONG_URL = PINGPONG_URL
 
 
+class InstitutionDirectory:
+    """The PingPong institutions, indexed by name.
+
+    The index is loaded once and updated as institutions are created, so
+    provisioning lists the institutions once instead of once per class.
+    Creation is serialized per name, so classes provisioned concurrently at a
+    new institution, by any sync phase, don't each create it.
+
+    With a `path`, the index is also saved to that file and reused by later
+    runs. A name missing from the index is looked up on the server again
+    before the institution is created.
+    """
+
+    def __init__(self, path: str | None = INSTITUTION_DIRECTORY_PATH):
+        self.path = Path(path) if path else None
+        self._institutions: dict[str, schemas.Institution] | None = None
+        self._load_lock = asyncio.Lock()
+        self._name_locks = defaultdict[str, asyncio.Lock](asyncio.Lock)
+
+    def _read(self) -> dict[str, schemas.Institution] | None:
+        if self.path is None or not self.path.exists():
+            return None
+        try:
+            return {
+                name: schemas.Institution.model_validate(institution)
+                for name, institution in json.loads(self.path.read_text()).items()
+            }
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable institution directory: {e}")
+            return None
+
+    def _write(self, institutions: dict[str, schemas.Institution]) -> None:
+        if self.path is None:
+            return
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {
+                    name: institution.model_dump(mode="json")
+                    for name, institution in institutions.items()
+                }
+            )
+        )
+        tmp_path.replace(self.path)
+
+    async def _list(self, session) -> dict[str, schemas.Institution]:
+        institutions = await server_requests.list_institutions(session, _PINGPONG_URL)
+        self._institutions = {
+            institution.name: institution for institution in institutions.institutions
+        }
+        self._write(self._institutions)
+        return self._institutions
+
+    async def _index(
+        self, session, refresh: bool = False
+    ) -> dict[str, schemas.Institution]:
+        async with self._load_lock:
+            if self._institutions is None:
+                self._institutions = self._read()
+            if self._institutions is None or refresh:
+                return await self._list(session)
+            return self._institutions
+
+    async def get_or_create(
+        self, session, institution_name: str
+    ) -> schemas.Institution:
+        async with self._name_locks[institution_name]:
+            institutions = await self._index(session)
+            if institution_name not in institutions:
+                institutions = await self._index(session, refresh=True)
+            if institution_name in institutions:
+                return institutions[institution_name]
+
+            institution = await server_requests.create_institution(
+                session,
+                schemas.CreateInstitution(name=institution_name),
+                _PINGPONG_URL,
+            )
+            logger.debug(f'Institution "{institution_name}" did not exist, created.')
+            institutions[institution_name] = institution
+            self._write(institutions)
+            return institution
+
+
+# Completed provisioning steps of each class request, shared by every run.
+_provisioning_journal = ProvisioningJournal()
+
+
+# One directory for every phase and session of the process, so concurrent
+# phases share the per-name locks. Kept per event loop, which its locks are
+# bound to.
+_institution_directories = WeakKeyDictionary[
+    asyncio.AbstractEventLoop, InstitutionDirectory
+]()
+
+
 async def get_or_create_institution(
     session, institution_name: str
 ) -> schemas.Institution:
-    selected_institution = None
-    institutions = await server_requests.list_institutions(session, _PINGPONG_URL)
-    institution_names = {
-        institution.name: institution for institution in institutions.institutions
-    }
-    if institution_name in institution_names:
-        selected_institution = institution_names[institution_name]
-    else:
-        selected_institution = await server_requests.create_institution(
-            session, schemas.CreateInstitution(name=institution_name), _PINGPONG_URL
-        )
-        logger.debug(f'Institution "{institution_name}" did not exist, created.')
-
-    if not selected_institution:
-        raise Exception("Institution not found or created.")
-    return selected_institution
+    loop = asyncio.get_running_loop()
+    if loop not in _institution_directories:
+        _institution_directories[loop] = InstitutionDirectory()
+    return await _institution_directories[loop].get_or_create(session, institution_name)
 
 
 async def create_class(
@@ -101,162 +225,97 @@ async def add_moderator(
     )
 
 
+# The service account's own user, resolved once per client session. Keyed by
+# the session cookie too, so it's looked up again if the cookie rotates.
+_service_users = WeakKeyDictionary[
+    Any, tuple[str | None, "asyncio.Future[schemas.User]"]
+]()
+
+
+def _session_cookie(session) -> str | None:
+    host = urlsplit(_PINGPONG_URL).hostname
+    for cookie in session.cookie_jar:
+        if cookie.key == "session" and cookie["domain"] in ("", host):
+            return cookie.value
+    return None
+
+
+async def get_service_user(session) -> schemas.User:
+    cookie = _session_cookie(session)
+    cached = _service_users.get(session)
+    if cached is None or cached[0] != cookie:
+        # Share one lookup between classes being provisioned concurrently.
+        future = asyncio.ensure_future(server_requests.get_me(session, _PINGPONG_URL))
+        cached = _service_users[session] = (cookie, future)
+    try:
+        return await asyncio.shield(cached[1])
+    except Exception:
+        if _service_users.get(session) is cached:
+            del _service_users[session]
+        raise
+
+
 async def remove_self_from_class(
     session,
     class_id: int,
 ) -> None:
-    user = await server_requests.get_me(session, _PINGPONG_URL)
+    user = await get_service_user(session)
     await server_requests.delete_user_from_class(
         session, class_id, user.id, _PINGPONG_URL
     )
     logger.debug(f'Removed {user.email} from class "{class_id}".')
 
 
-async def add_student(
+async def add_students(
     session,
-    request: scripts_schemas.UserClassRole,
+    emails: list[str],
     class_id: str,
-) -> None:
+) -> dict[str, str | None]:
+    """Add students to a class in one request.
+
+    Returns the error for each email, or None if the student was added.
+    """
     user_roles = schemas.CreateUserClassRoles(
         roles=[
             schemas.CreateUserClassRole(
-                email=request.email,
+                email=email,
                 roles=schemas.ClassUserRoles(admin=False, teacher=False, student=True),
             )
+            for email in emails
         ],
         silent=False,
     )
     user_results = await server_requests.add_user_to_class(
         session, int(class_id), user_roles, _PINGPONG_URL
     )
-    if len(user_results.results) > 1:
-        raise Exception(
-            "More than one user was added to the class. This is unexpected."
-        )
-    elif len(user_results.results) == 0:
-        raise Exception("No user was added to the class. This is unexpected.")
-    else:
-        student = user_results.results[0]
-
-    if student.error:
-        raise Exception(
-            f'Error adding student "{student.email}" to class {class_id}: {student.error}'
-        )
+    results = {
+        result.email.strip().lower(): result.error for result in user_results.results
+    }
 
-    logger.debug(f'Added student "{student.email}" to class {class_id}.')
+    errors = dict[str, str | None]()
+    for email in emails:
+        key = email.strip().lower()
+        if key not in results:
+            errors[email] = "No result was returned for this student."
+        elif results[key]:
+            errors[email] = (
+                f'Error adding student "{email}" to class {class_id}: {results[key]}'
+            )
+        else:
+            errors[email] = None
+            logger.debug(f'Added student "{email}" to class {class_id}.')
+    return errors
 
 
-def compute_assistant_prompt(
-    request: scripts_schemas.PingPongClass | scripts_schemas.PingPongClassNonStudy,
-    assistant_template: scripts_schemas.AssistantTemplate
-    | scripts_schemas.AssistantTemplateNonStudy,
-) -> str:
-    prompt = assistant_template.prompt_template[0]
-    prompt = prompt.replace(
-        assistant_template.course_name_code[0], request.class_name[0]
-    )
+# Compiled prompt templates and rendered prompts, kept per client session so
+# each run renders every distinct prompt once.
+_prompt_renderers = WeakKeyDictionary[Any, PromptRenderer]()
 
-    if "None" in request.class_programming_languages:
-        prompt = prompt.replace(assistant_template.prog_lang_sub_code[0], "")
-    elif "Any" in request.class_programming_languages:
-        programming_languages = request.class_programming_languages.copy()
-        programming_prompt = " " + assistant_template.prog_lang_any[0]
-        if "Python" in request.class_programming_languages:
-            programming_languages.remove("Python")
-        programming_languages.remove("Any")
-        if len(programming_languages) == 1:
-            extra_prompt = assistant_template.prog_lang_single_with_python[0]
-            extra_prompt = extra_prompt.replace(
-                assistant_template.prog_lang_code_single[0],
-                programming_languages[0],
-            )
-            programming_prompt = programming_prompt + " " + extra_prompt
-        elif len(programming_languages) > 1:
-            extra_prompt = assistant_template.prog_lang_multi_with_python[0]
-            extra_prompt = extra_prompt.replace(
-                assistant_template.prog_lang_code_multi_and[0],
-                (
-                    ", ".join(programming_languages[:-1])
-                    + ", and "
-                    + programming_languages[-1]
-                ),
-            )
-            extra_prompt = extra_prompt.replace(
-                assistant_template.prog_lang_code_multi_or[0],
-                (
-                    ", ".join(programming_languages[:-1])
-                    + ", or "
-                    + programming_languages[-1]
-                ),
-            )
-            programming_prompt = programming_prompt + " " + extra_prompt
-        prompt = prompt.replace(
-            assistant_template.prog_lang_sub_code[0], programming_prompt
-        )
-    else:
-        programming_languages = request.class_programming_languages.copy()
-        programming_prompt = " "
-        if "Python" in request.class_programming_languages:
-            programming_prompt += assistant_template.prog_lang_python[0]
-            programming_languages.remove("Python")
-            if len(programming_languages) == 1:
-                extra_prompt = assistant_template.prog_lang_single_with_python[0]
-                extra_prompt = extra_prompt.replace(
-                    assistant_template.prog_lang_code_single[0],
-                    programming_languages[0],
-                )
-                programming_prompt = programming_prompt + " " + extra_prompt
-            elif len(programming_languages) > 1:
-                extra_prompt = assistant_template.prog_lang_multi_with_python[0]
-                extra_prompt = extra_prompt.replace(
-                    assistant_template.prog_lang_code_multi_and[0],
-                    (
-                        ", ".join(programming_languages[:-1])
-                        + ", and "
-                        + programming_languages[-1]
-                    ),
-                )
-                extra_prompt = extra_prompt.replace(
-                    assistant_template.prog_lang_code_multi_or[0],
-                    (
-                        ", ".join(programming_languages[:-1])
-                        + ", or "
-                        + programming_languages[-1]
-                    ),
-                )
-                programming_prompt = programming_prompt + " " + extra_prompt
-        else:
-            if len(programming_languages) == 1:
-                extra_prompt = assistant_template.prog_lang_single_no_python[0]
-                extra_prompt = extra_prompt.replace(
-                    assistant_template.prog_lang_code_single[0],
-                    programming_languages[0],
-                )
-                programming_prompt = programming_prompt + extra_prompt
-            elif len(programming_languages) > 1:
-                extra_prompt = assistant_template.prog_lang_multi_no_python[0]
-                extra_prompt = extra_prompt.replace(
-                    assistant_template.prog_lang_code_multi_and[0],
-                    (
-                        ", ".join(programming_languages[:-1])
-                        + ", and "
-                        + programming_languages[-1]
-                    ),
-                )
-                extra_prompt = extra_prompt.replace(
-                    assistant_template.prog_lang_code_multi_or[0],
-                    (
-                        ", ".join(programming_languages[:-1])
-                        + ", or "
-                        + programming_languages[-1]
-                    ),
-                )
-                programming_prompt = programming_prompt + extra_prompt
-        prompt = prompt.replace(
-            assistant_template.prog_lang_sub_code[0], programming_prompt
-        )
 
-    return prompt
+def prompt_renderer(session) -> PromptRenderer:
+    if session not in _prompt_renderers:
+        _prompt_renderers[session] = PromptRenderer()
+    return _prompt_renderers[session]
 
 
 def compute_model_name(
@@ -288,6 +347,7 @@ async def add_assistant(
     assistant_template: scripts_schemas.AssistantTemplate,
     request: scripts_schemas.PingPongClass,
     class_: schemas.Class,
+    checkpoint: Checkpoint | None = None,
 ) -> scripts_schemas.PingPongAssistant:
     billing_configuration = BILLING_PROVIDERS.get(request.billing_api_key, None)
     if not billing_configuration:
@@ -302,7 +362,7 @@ async def add_assistant(
         name=assistant_template.name,
         code_interpreter_file_ids=[],
         file_search_file_ids=[],
-        instructions=compute_assistant_prompt(request, assistant_template),
+        instructions=prompt_renderer(session).render(request, assistant_template),
         description=assistant_template.description,
         model=compute_model_name(request, assistant_template),
         temperature=assistant_template.temperature,
@@ -312,48 +372,121 @@ async def add_assistant(
         hide_prompt=assistant_template.hide_prompt,
     )
 
-    assistant = await server_requests.add_assistant_to_class(
-        session, class_.id, assistant_data, _PINGPONG_URL
-    )
-    pingpong_assistant = scripts_schemas.PingPongAssistant(
-        pingpong_id=assistant.id, template=assistant_template
+    return await _add_journaled_assistant(
+        session,
+        checkpoint or Checkpoint(None, request.id),
+        assistant_template.id,
+        scripts_schemas.PingPongAssistant(template=assistant_template),
+        assistant_data,
+        class_,
     )
-    pingpong_assistant.save()
 
-    logger.debug(
-        f'Assistant "{assistant.name}" ({assistant.id}) added to class "{class_.name}" ({class_.id}).'
-    )
 
-    await lock_assistant(session, pingpong_assistant, class_)
-    logger.debug(f'Assistant "{assistant.name}" ({assistant.id}) successfully locked.')
+async def _add_journaled_assistant(
+    session,
+    checkpoint: Checkpoint,
+    template_id: str,
+    pingpong_assistant: A,
+    assistant_data: scripts_schemas.CreateAssistant,
+    class_: schemas.Class,
+) -> A:
+    """Create an assistant, record it in Airtable, and lock it.
+
+    Each of these is recorded in the checkpoint under the assistant's template,
+    and skipped when resuming a request where it already completed.
+    """
+    step = f"assistant:{template_id}"
+    progress = dict(checkpoint.get(step) or {})
+
+    if "pingpong_id" not in progress:
+        assistant = await server_requests.add_assistant_to_class(
+            session, class_.id, assistant_data, _PINGPONG_URL
+        )
+        logger.debug(
+            f'Assistant "{assistant.name}" ({assistant.id}) added to class "{class_.name}" ({class_.id}).'
+        )
+        progress["pingpong_id"] = assistant.id
+        checkpoint.done(step, progress)
+    pingpong_assistant.pingpong_id = progress["pingpong_id"]
+
+    if "record_id" in progress:
+        pingpong_assistant.id = progress["record_id"]
+    else:
+        await asyncio.to_thread(pingpong_assistant.save)
+        progress["record_id"] = pingpong_assistant.id
+        checkpoint.done(step, progress)
+
+    if not progress.get("locked"):
+        await lock_assistant(session, pingpong_assistant, class_)
+        logger.debug(
+            f'Assistant "{assistant_data.name}" ({pingpong_assistant.pingpong_id}) successfully locked.'
+        )
+        progress["locked"] = True
+        checkpoint.done(step, progress)
 
     return pingpong_assistant
 
 
-async def update_assistant(
+def assistant_update(
     session,
-    assistant: scripts_schemas.PingPongAssistant,
-) -> None:
+    pp_class: scripts_schemas.PingPongClass,
+    template: scripts_schemas.AssistantTemplate,
+) -> scripts_schemas.UpdateAssistant:
+    """The update that makes a class's assistant match a template."""
     assistant_tools = []
-    if assistant.update_to.file_search:
+    if template.file_search:
         assistant_tools.append({"type": "file_search"})
-    if assistant.update_to.code_interpreter:
+    if template.code_interpreter:
         assistant_tools.append({"type": "code_interpreter"})
 
-    assistant_data = scripts_schemas.UpdateAssistant(
-        name=assistant.update_to.name,
+    return scripts_schemas.UpdateAssistant(
+        name=template.name,
         code_interpreter_file_ids=[],
         file_search_file_ids=[],
-        instructions=compute_assistant_prompt(assistant.pp_class, assistant.update_to),
-        description=assistant.update_to.description,
-        model=compute_model_name(assistant.pp_class, assistant.update_to),
-        temperature=assistant.update_to.temperature,
+        instructions=prompt_renderer(session).render(pp_class, template),
+        description=template.description,
+        model=compute_model_name(pp_class, template),
+        temperature=template.temperature,
         tools=assistant_tools,
-        use_latex=assistant.update_to.use_latex,
-        hide_prompt=assistant.update_to.hide_prompt,
-        use_image_descriptions=assistant.update_to.experimental_vision,
+        use_latex=template.use_latex,
+        hide_prompt=template.hide_prompt,
+        use_image_descriptions=template.experimental_vision,
     )
 
+
+def plan_assistant_update(
+    session,
+    assistant: scripts_schemas.PingPongAssistant,
+) -> tuple[scripts_schemas.UpdateAssistant, list[str]]:
+    """The update for an assistant, and the fields it would change.
+
+    The update is compared with what the assistant's current template gives
+    for its class. Every field counts as changed when there is no current
+    template, or when it's the same record as the target, which is how a
+    template edited in place is pushed out again.
+    """
+    if not assistant.update_to:
+        raise Exception("No template to update the assistant to.")
+    if not assistant.pp_class:
+        raise Exception("Assistant is not linked to a class.")
+    update = assistant_update(session, assistant.pp_class, assistant.update_to)
+    fields = update.model_dump()
+    if not assistant.template or assistant.template.id == assistant.update_to.id:
+        return update, list(fields)
+    current = assistant_update(
+        session, assistant.pp_class, assistant.template
+    ).model_dump()
+    return update, [name for name, value in fields.items() if current[name] != value]
+
+
+async def update_assistant(
+    session,
+    assistant: scripts_schemas.PingPongAssistant,
+    assistant_data: scripts_schemas.UpdateAssistant | None = None,
+) -> None:
+    if assistant_data is None:
+        assistant_data, _ = plan_assistant_update(session, assistant)
+
     # logger.info(f'About to update assistant "{assistant.update_to.name}" ({assistant.pingpong_id}) with data: {assistant_data.model_dump_json(indent=2)}')
     pp_assistant = await server_requests.update_assistant(
         session,
@@ -374,6 +507,7 @@ async def add_assistant_non_study(
     assistant_template: scripts_schemas.AssistantTemplateNonStudy,
     request: scripts_schemas.PingPongClassNonStudy,
     class_: schemas.Class,
+    checkpoint: Checkpoint | None = None,
 ) -> scripts_schemas.PingPongAssistantNonStudy:
     billing_configuration = BILLING_PROVIDERS.get(request.billing_api_key, None)
     if not billing_configuration:
@@ -388,7 +522,7 @@ async def add_assistant_non_study(
         name=assistant_template.name,
         code_interpreter_file_ids=[],
         file_search_file_ids=[],
-        instructions=compute_assistant_prompt(request, assistant_template),
+        instructions=prompt_renderer(session).render(request, assistant_template),
         description=assistant_template.description,
         model=compute_model_name(request, assistant_template),
         temperature=1.0,
@@ -398,219 +532,446 @@ async def add_assistant_non_study(
         hide_prompt=assistant_template.hide_prompt,
     )
 
-    assistant = await server_requests.add_assistant_to_class(
-        session, class_.id, assistant_data, _PINGPONG_URL
-    )
-    pingpong_assistant = scripts_schemas.PingPongAssistantNonStudy(
-        pingpong_id=assistant.id, template=assistant_template
+    return await _add_journaled_assistant(
+        session,
+        checkpoint or Checkpoint(None, request.id),
+        assistant_template.id,
+        scripts_schemas.PingPongAssistantNonStudy(template=assistant_template),
+        assistant_data,
+        class_,
     )
-    pingpong_assistant.save()
 
-    logger.debug(
-        f'Assistant "{assistant.name}" ({assistant.id}) added to class "{class_.name}" ({class_.id}).'
-    )
 
-    await lock_assistant(session, pingpong_assistant, class_)
-    logger.debug(f'Assistant "{assistant.name}" ({assistant.id}) successfully locked.')
+async def _gather_all(*aws: Awaitable[T]) -> list[T]:
+    """Run all awaitables to completion, then raise the first error, if any.
 
-    return pingpong_assistant
+    Unlike a plain gather, one failure doesn't leave the rest running unawaited,
+    so everything that was created is known before the error is handled.
+    """
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results  # type: ignore[return-value]
 
 
-async def _process_airtable_class_requests() -> None:
-    requests_to_process = scripts_schemas.PingPongClass.all(
-        formula=match({"Status": "Ready for Add"})
-    )
+async def _provision_concurrently(
+    pages: AsyncIterable[list[T]],
+    provision: Callable[[T], Awaitable[None]],
+    concurrency: int,
+    label: str,
+) -> None:
+    """Provision requests in parallel, at most `concurrency` at a time.
+
+    `label` names a single request in the error log, e.g. "a class request".
+    Requests are taken from the pages as workers free up, so the next page is
+    only needed once the current one has been handed out. Each request handles
+    its own errors, so one failing class doesn't hold up or abort the others.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks = set[asyncio.Task]()
+
+    async def worker(request: T) -> None:
+        try:
+            await provision(request)
+        except Exception:
+            logger.exception("Unhandled error provisioning %s.", label)
+        finally:
+            semaphore.release()
+
+    try:
+        async for page in pages:
+            for request in page:
+                await semaphore.acquire()
+                task = asyncio.create_task(worker(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+    finally:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _link_assistants(
+    request: scripts_schemas.PingPongClass | scripts_schemas.PingPongClassNonStudy,
+    assistant_tasks: list[asyncio.Task],
+) -> None:
+    """Link the assistants the tasks created to the request.
 
-    async with aiohttp.ClientSession(cookies={"session": _PINGPONG_COOKIE}) as session:
-        for request in requests_to_process:
-            try:
-                institution = await get_or_create_institution(
-                    session, request.class_institution
-                )
-                class_ = await create_class(session, request, institution)
-                await add_moderator(session, request, class_)
-                await remove_self_from_class(session, class_.id)
-                if request.assistant_templates:
-                    for assistant_template in request.assistant_templates:
-                        pingpong_assistant = await add_assistant(
-                            session, assistant_template, request, class_
-                        )
-                        request.pingpong_assistants.append(pingpong_assistant)
-                request.pingpong_id = str(class_.id)
-                request.status = "Added"
-                request.update_status = "Complete"
-                request.remove_admin = True
-                request.save()
-            except Exception as e:
-                logger.warning(f"Error processing request: {e}")
-                request.status = "Error"
-                request.status_notes = str(e)
-                request.save()
-                continue
+    A resumed request already links the assistants an earlier run saved, and
+    the journal hands those back, so they aren't linked a second time.
+    """
+    linked = {assistant.id for assistant in request.pingpong_assistants}
+    for task in assistant_tasks:
+        if task.done() and not task.cancelled() and task.exception() is None:
+            assistant = task.result()
+            if assistant.id not in linked:
+                linked.add(assistant.id)
+                request.pingpong_assistants.append(assistant)
 
 
-async def _process_airtable_nonstudy_class_requests() -> None:
-    requests_to_process = scripts_schemas.PingPongClassNonStudy.all(
-        formula=match({"Status": "Ready for Add"})
-    )
+async def _create_journaled_class(
+    session,
+    checkpoint: Checkpoint,
+    request: scripts_schemas.PingPongClass | scripts_schemas.PingPongClassNonStudy,
+) -> schemas.Class:
+    """Create the requested class and add its moderator, unless already done."""
+    if (institution_data := checkpoint.get("institution")) is not None:
+        institution = schemas.Institution.model_validate(institution_data)
+    else:
+        institution = await get_or_create_institution(
+            session, request.class_institution
+        )
+        checkpoint.done("institution", institution.model_dump(mode="json"))
 
-    async with aiohttp.ClientSession(cookies={"session": _PINGPONG_COOKIE}) as session:
-        for request in requests_to_process:
-            try:
-                institution = await get_or_create_institution(
-                    session, request.class_institution
-                )
-                class_ = await create_class(session, request, institution)
-                await add_moderator(session, request, class_)
-                if request.assistant_templates:
-                    for assistant_template in request.assistant_templates:
-                        pingpong_assistant = await add_assistant_non_study(
-                            session, assistant_template, request, class_
-                        )
-                        request.pingpong_assistants.append(pingpong_assistant)
-                await remove_self_from_class(session, class_.id)
-                request.pingpong_id = str(class_.id)
-                request.status = "Added"
-                request.update_status = "Complete"
-                request.remove_admin = True
-                request.save()
-                formula = (
-                    scripts_schemas.ExternalLoginRequestsNonStudy.current_email.eq(
-                        request.teacher_email[0]
-                    )
-                    & scripts_schemas.ExternalLoginRequestsNonStudy.new_email.eq(
-                        request.teacher_personal_email[0]
-                    )
-                )
-                external_logins = scripts_schemas.ExternalLoginRequestsNonStudy.all(
-                    formula=formula
-                )
-                if not external_logins:
-                    external_login = scripts_schemas.ExternalLoginRequestsNonStudy(
-                        current_email=request.teacher_email[0],
-                        new_email=request.teacher_personal_email[0],
-                        status="Ready to Add",
-                        instructor=[
-                            scripts_schemas.InstructorNonStudy.from_id(
-                                request.teacher_id[0]
-                            )
-                        ],
-                    )
-                    external_login.save()
-            except Exception as e:
-                logger.warning(f"Error processing request: {e}", exc_info=True)
-                request.status = "Error"
-                request.status_notes = str(e)
-                request.save()
-                continue
+    if (class_data := checkpoint.get("class")) is not None:
+        class_ = schemas.Class.model_validate(class_data)
+    else:
+        class_ = await create_class(session, request, institution)
+        checkpoint.done("class", class_.model_dump(mode="json"))
 
+    if not checkpoint.get("moderator"):
+        await add_moderator(session, request, class_)
+        checkpoint.done("moderator")
+    return class_
 
-async def _process_students_to_add() -> None:
-    students_to_add = scripts_schemas.UserClassRole.all(
-        formula=match({"Status": "Add to Class"})
-    )
 
-    async with aiohttp.ClientSession(cookies={"session": _PINGPONG_COOKIE}) as session:
-        for student in students_to_add:
+async def _remove_self_journaled(
+    session, checkpoint: Checkpoint, class_: schemas.Class
+) -> None:
+    if not checkpoint.get("self_removal"):
+        await remove_self_from_class(session, class_.id)
+        checkpoint.done("self_removal")
+
+
+async def _provision_class(
+    session, writes: WriteBackBuffer, request: scripts_schemas.PingPongClass
+) -> None:
+    try:
+        checkpoint = _provisioning_journal.checkpoint(request.id)
+        class_ = await _create_journaled_class(session, checkpoint, request)
+        await _remove_self_journaled(session, checkpoint, class_)
+        if request.assistant_templates:
+            assistant_tasks = [
+                asyncio.create_task(
+                    add_assistant(
+                        session, assistant_template, request, class_, checkpoint
+                    )
+                )
+                for assistant_template in request.assistant_templates
+            ]
             try:
-                await add_student(session, student, student.class_id[0])
-                student.status = "Added"
-                student.save()
-            except Exception as e:
-                logger.warning(f"Error processing student: {e}")
-                student.status = "Error"
-                student.status_notes = str(e)
-                student.save()
-                continue
+                await _gather_all(*assistant_tasks)
+            finally:
+                # Link whichever assistants were created, even if some failed.
+                _link_assistants(request, assistant_tasks)
+        writes.update(
+            request,
+            pingpong_id=str(class_.id),
+            status="Added",
+            update_status="Complete",
+            remove_admin=True,
+            pingpong_assistants=request.pingpong_assistants,
+        )
+        writes.after_write(request, checkpoint.clear)
+    except Exception as e:
+        logger.warning(f"Error processing request: {e}")
+        writes.update(
+            request,
+            status="Error",
+            status_notes=str(e),
+            pingpong_assistants=request.pingpong_assistants,
+        )
 
 
-async def _process_external_logins_to_add() -> None:
-    external_logins_to_add = scripts_schemas.ExternalLoginRequests.all(
-        formula=match({"Status": "Ready to Add"})
+async def _process_airtable_class_requests(
+    session: aiohttp.ClientSession | None = None,
+    concurrency: int = CLASS_PROVISIONING_CONCURRENCY,
+) -> None:
+    requests_to_process = LinkedRecords().pages(
+        iterate_queue(*CLASS_REQUESTS), "assistant_templates", "pingpong_assistants"
     )
 
-    async with aiohttp.ClientSession(cookies={"session": _PINGPONG_COOKIE}) as session:
-        for request in external_logins_to_add:
-            try:
-                user = await server_requests.get_user_by_email(
-                    session, request.current_email, _PINGPONG_URL
-                )
-                await server_requests.add_login_email(
-                    session,
-                    user.id,
-                    request.new_email,
-                    _PINGPONG_URL,
+    async with pingpong_session(session) as session, WriteBackBuffer() as writes:
+        await _provision_concurrently(
+            requests_to_process,
+            lambda request: _provision_class(session, writes, request),
+            concurrency,
+            "a class request",
+        )
+
+
+async def _provision_nonstudy_class(
+    session, writes: WriteBackBuffer, request: scripts_schemas.PingPongClassNonStudy
+) -> None:
+    try:
+        checkpoint = _provisioning_journal.checkpoint(request.id)
+        class_ = await _create_journaled_class(session, checkpoint, request)
+        if request.assistant_templates:
+            assistant_tasks = [
+                asyncio.create_task(
+                    add_assistant_non_study(
+                        session, assistant_template, request, class_, checkpoint
+                    )
                 )
-                request.status = "Added"
-                request.save()
-            except Exception as e:
-                logger.warning(f"Error processing external login: {e}")
-                request.status = "Error"
-                request.status_notes = str(e)
-                request.save()
-                continue
+                for assistant_template in request.assistant_templates
+            ]
+            try:
+                await _gather_all(*assistant_tasks)
+            finally:
+                _link_assistants(request, assistant_tasks)
+        await _remove_self_journaled(session, checkpoint, class_)
+        writes.update(
+            request,
+            pingpong_id=str(class_.id),
+            status="Added",
+            update_status="Complete",
+            remove_admin=True,
+            pingpong_assistants=request.pingpong_assistants,
+        )
+        writes.after_write(request, checkpoint.clear)
+        formula = scripts_schemas.ExternalLoginRequestsNonStudy.current_email.eq(
+            request.teacher_email[0]
+        ) & scripts_schemas.ExternalLoginRequestsNonStudy.new_email.eq(
+            request.teacher_personal_email[0]
+        )
+        external_logins = await asyncio.to_thread(
+            scripts_schemas.ExternalLoginRequestsNonStudy.all, formula=formula
+        )
+        if not external_logins:
+            instructor = await asyncio.to_thread(
+                scripts_schemas.InstructorNonStudy.from_id, request.teacher_id[0]
+            )
+            external_login = scripts_schemas.ExternalLoginRequestsNonStudy(
+                current_email=request.teacher_email[0],
+                new_email=request.teacher_personal_email[0],
+                status="Ready to Add",
+                instructor=[instructor],
+            )
+            await asyncio.to_thread(external_login.save)
+    except Exception as e:
+        logger.warning(f"Error processing request: {e}", exc_info=True)
+        writes.update(
+            request,
+            status="Error",
+            status_notes=str(e),
+            pingpong_assistants=request.pingpong_assistants,
+        )
 
 
-async def _process_external_logins_to_add_non_study() -> None:
-    external_logins_to_add = scripts_schemas.ExternalLoginRequestsNonStudy.all(
-        formula=match({"Status": "Ready to Add"})
+async def _process_airtable_nonstudy_class_requests(
+    session: aiohttp.ClientSession | None = None,
+    concurrency: int = CLASS_PROVISIONING_CONCURRENCY,
+) -> None:
+    requests_to_process = LinkedRecords().pages(
+        iterate_queue(*NONSTUDY_CLASS_REQUESTS),
+        "assistant_templates",
+        "pingpong_assistants",
     )
 
-    async with aiohttp.ClientSession(cookies={"session": _PINGPONG_COOKIE}) as session:
-        for request in external_logins_to_add:
+    async with pingpong_session(session) as session, WriteBackBuffer() as writes:
+        await _provision_concurrently(
+            requests_to_process,
+            lambda request: _provision_nonstudy_class(session, writes, request),
+            concurrency,
+            "a non-study class request",
+        )
+
+
+async def _process_students_to_add(
+    session: aiohttp.ClientSession | None = None,
+) -> None:
+    writes = WriteBackBuffer()
+
+    async def students_by_class() -> AsyncIterator[
+        list[tuple[str, list[scripts_schemas.UserClassRole]]]
+    ]:
+        async for page in iterate_queue(*STUDENTS_TO_ADD):
+            by_class = defaultdict[str, list[scripts_schemas.UserClassRole]](list)
+            for student in page:
+                if not student.class_id or not student.email:
+                    writes.update(
+                        student, status="Error", status_notes="Missing class or email."
+                    )
+                    continue
+                by_class[student.class_id[0]].append(student)
+            yield list(by_class.items())
+
+    async def add_class_students(
+        class_id: str, students: list[scripts_schemas.UserClassRole]
+    ) -> None:
+        for i in range(0, len(students), STUDENT_BATCH_SIZE):
+            batch = students[i : i + STUDENT_BATCH_SIZE]
             try:
-                user = await server_requests.get_user_by_email(
-                    session, request.current_email, _PINGPONG_URL
+                errors = await add_students(
+                    session, list({student.email: None for student in batch}), class_id
                 )
-                await server_requests.add_login_email(
-                    session,
-                    user.id,
-                    request.new_email,
-                    _PINGPONG_URL,
-                )
-                request.status = "Added"
-                request.save()
             except Exception as e:
-                logger.warning(f"Error processing external login: {e}")
-                request.status = "Error"
-                request.status_notes = str(e)
-                request.save()
-                continue
+                logger.warning(f"Error processing students: {e}")
+                errors = {student.email: str(e) for student in batch}
+            for student in batch:
+                error = errors[student.email]
+                if error:
+                    logger.warning(f"Error processing student: {error}")
+                    writes.update(student, status="Error", status_notes=error)
+                else:
+                    writes.update(student, status="Added")
+
+    async with pingpong_session(session) as session, writes:
+        await _provision_concurrently(
+            students_by_class(),
+            lambda item: add_class_students(*item),
+            CLASS_PROVISIONING_CONCURRENCY,
+            "a class's students",
+        )
 
 
-async def _process_remove_self_from_classes() -> None:
-    classes_to_remove_self = scripts_schemas.PingPongClass.all(
-        formula=match({"Remove Admin": False})
-    )
+async def _process_external_logins_to_add(
+    session: aiohttp.ClientSession | None = None,
+) -> None:
+    external_logins_to_add = iterate_queue(*EXTERNAL_LOGINS_TO_ADD)
+
+    async with pingpong_session(session) as session, WriteBackBuffer() as writes:
+        async for page in external_logins_to_add:
+            for request in page:
+                try:
+                    user = await server_requests.get_user_by_email(
+                        session, request.current_email, _PINGPONG_URL
+                    )
+                    await server_requests.add_login_email(
+                        session,
+                        user.id,
+                        request.new_email,
+                        _PINGPONG_URL,
+                    )
+                    writes.update(request, status="Added")
+                except Exception as e:
+                    logger.warning(f"Error processing external login: {e}")
+                    writes.update(request, status="Error", status_notes=str(e))
+                    continue
 
-    async with aiohttp.ClientSession(cookies={"session": _PINGPONG_COOKIE}) as session:
-        for class_ in classes_to_remove_self:
-            try:
-                await remove_self_from_class(session, int(class_.pingpong_id))
-                class_.remove_admin = True
-                class_.save()
-            except Exception as e:
-                logger.warning(f"Error processing class: {e}")
-                continue
 
+async def _process_external_logins_to_add_non_study(
+    session: aiohttp.ClientSession | None = None,
+) -> None:
+    external_logins_to_add = iterate_queue(*EXTERNAL_LOGINS_TO_ADD_NON_STUDY)
+
+    async with pingpong_session(session) as session, WriteBackBuffer() as writes:
+        async for page in external_logins_to_add:
+            for request in page:
+                try:
+                    user = await server_requests.get_user_by_email(
+                        session, request.current_email, _PINGPONG_URL
+                    )
+                    await server_requests.add_login_email(
+                        session,
+                        user.id,
+                        request.new_email,
+                        _PINGPONG_URL,
+                    )
+                    writes.update(request, status="Added")
+                except Exception as e:
+                    logger.warning(f"Error processing external login: {e}")
+                    writes.update(request, status="Error", status_notes=str(e))
+                    continue
 
-async def _process_airtable_class_update_requests() -> None:
-    requests_to_process = scripts_schemas.PingPongAssistant.all(
-        formula=AND(match({"Status": "Update"}), NE(Field("Update To Template"), ""))
+
+async def _process_remove_self_from_classes(
+    session: aiohttp.ClientSession | None = None,
+) -> None:
+    classes_to_remove_self = iterate_queue(
+        scripts_schemas.PingPongClass, match({"Remove Admin": False})
     )
 
-    async with aiohttp.ClientSession(cookies={"session": _PINGPONG_COOKIE}) as session:
-        for request in requests_to_process:
+    async with pingpong_session(session) as session, WriteBackBuffer() as writes:
+        async for page in classes_to_remove_self:
+            for class_ in page:
+                try:
+                    await remove_self_from_class(session, int(class_.pingpong_id))
+                    writes.update(class_, remove_admin=True)
+                except Exception as e:
+                    logger.warning(f"Error processing class: {e}")
+                    continue
+
+
+async def _process_airtable_class_update_requests(
+    session: aiohttp.ClientSession | None = None,
+    concurrency: int = CLASS_PROVISIONING_CONCURRENCY,
+    dry_run: bool = False,
+) -> Counter[str]:
+    """Update assistants to their new templates.
+
+    Updates that wouldn't change anything aren't sent. The assistants of a
+    class are updated one after another, and classes concurrently. With
+    `dry_run`, nothing is sent or written back, and the assistants that would
+    change are only logged.
+
+    Returns how many assistants were (or would be) changed, left unchanged,
+    or failed.
+    """
+    requests_to_process = LinkedRecords().pages(
+        iterate_queue(
+            scripts_schemas.PingPongAssistant,
+            AND(match({"Status": "Update"}), NE(Field("Update To Template"), "")),
+        ),
+        "update_to",
+        "pp_class",
+        "template",
+    )
+    outcomes = Counter[str]()
+    writes = WriteBackBuffer()
+
+    async def assistants_by_class() -> AsyncIterator[
+        list[list[scripts_schemas.PingPongAssistant]]
+    ]:
+        async for page in requests_to_process:
+            by_class = defaultdict[str, list[scripts_schemas.PingPongAssistant]](list)
+            for assistant in page:
+                class_id = assistant.pp_class.id if assistant.pp_class else assistant.id
+                by_class[class_id].append(assistant)
+            yield list(by_class.values())
+
+    async def update_class_assistants(
+        assistants: list[scripts_schemas.PingPongAssistant],
+    ) -> None:
+        for request in assistants:
             try:
-                if request.update_to:
-                    await update_assistant(session, request)
-                request.status = "Complete"
-                request.template = request.update_to
-                request.update_to = None
-                request.save()
+                update, changes = plan_assistant_update(session, request)
+                if not changes:
+                    outcomes["unchanged"] += 1
+                    logger.info(
+                        f"Assistant {request.pingpong_id} is already up to date."
+                    )
+                elif dry_run:
+                    outcomes["changed"] += 1
+                    logger.info(
+                        f"Assistant {request.pingpong_id} would change: {', '.join(changes)}."
+                    )
+                else:
+                    await update_assistant(session, request, update)
+                    outcomes["changed"] += 1
+                if not dry_run:
+                    writes.update(
+                        request,
+                        status="Complete",
+                        template=request.update_to,
+                        update_to=None,
+                    )
             except Exception as e:
+                outcomes["error"] += 1
                 logger.warning(f"Error processing request: {e}")
-                request.status = "Error"
-                request.status_notes = str(e)
-                request.save()
-                continue
+                if not dry_run:
+                    writes.update(request, status="Error", status_notes=str(e))
+
+    async with pingpong_session(session) as session, writes:
+        await _provision_concurrently(
+            assistants_by_class(),
+            update_class_assistants,
+            concurrency,
+            "a class's assistant updates",
+        )
+
+    logger.info(
+        f"Assistant updates{' (dry run)' if dry_run else ''}: "
+        f"{outcomes['changed']} {'would change' if dry_run else 'changed'}, "
+        f"{outcomes['unchanged']} unchanged, {outcomes['error']} failed."
+    )
+    return outcomes
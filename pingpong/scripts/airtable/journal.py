@@ -0,0 +1,117 @@
+"""Checkpoint journal for class provisioning.
+
+Provisioning a class takes several PingPong API calls (institution, class,
+moderator, assistants, locks, self-removal), and the Airtable row is only
+marked as done at the end. If the process dies in between, the row is still
+"Ready for Add" and the next run would create everything again.
+
+The journal records each completed step, with what it created, in a SQLite
+file keyed by the Airtable record ID, so the next run picks up where the last
+one stopped. Once the row is saved as complete, its steps are cleared, so a
+request that is later set back to "Ready for Add" is provisioned from scratch.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from typing import Any
+
+from pingpong.scripts.airtable.vars import PROVISIONING_JOURNAL_PATH
+
+logger = logging.getLogger(__name__)
+
+# Journal entries older than this are dropped when the journal is opened.
+RETENTION = 90 * 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS steps (
+    request_id TEXT NOT NULL,
+    step TEXT NOT NULL,
+    result TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (request_id, step)
+);
+"""
+
+
+class ProvisioningJournal:
+    """The completed provisioning steps of each request.
+
+    Without a path, the journal only lasts as long as the process.
+    """
+
+    def __init__(self, path: str | None = PROVISIONING_JOURNAL_PATH):
+        self.path = path
+        self._db: sqlite3.Connection | None = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+            with self._db:
+                self._db.execute(
+                    "DELETE FROM steps WHERE recorded_at < ?",
+                    (time.time() - RETENTION,),
+                )
+        return self._db
+
+    def checkpoint(self, request_id: str) -> "Checkpoint":
+        rows = self.db.execute(
+            "SELECT step, result FROM steps WHERE request_id = ?", (request_id,)
+        ).fetchall()
+        if rows:
+            logger.info(
+                f"Resuming provisioning of {request_id} after {len(rows)} steps."
+            )
+        return Checkpoint(
+            self, request_id, {step: json.loads(result) for step, result in rows}
+        )
+
+    def record(self, request_id: str, step: str, result: Any) -> None:
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO steps (request_id, step, result, recorded_at) "
+                "VALUES (?, ?, ?, ?)",
+                (request_id, step, json.dumps(result), time.time()),
+            )
+
+    def clear(self, request_id: str) -> None:
+        """Forget every step of a request."""
+        with self.db:
+            self.db.execute("DELETE FROM steps WHERE request_id = ?", (request_id,))
+
+
+class Checkpoint:
+    """The steps one request has completed so far.
+
+    Without a journal, the steps are only remembered by this object.
+    """
+
+    def __init__(
+        self,
+        journal: ProvisioningJournal | None,
+        request_id: str,
+        steps: dict[str, Any] | None = None,
+    ):
+        self.journal = journal
+        self.request_id = request_id
+        self.steps = steps or {}
+
+    def get(self, step: str) -> Any:
+        """What the step produced, or None if it hasn't completed."""
+        return self.steps.get(step)
+
+    def done(self, step: str, result: Any = True) -> None:
+        """Record that a step completed, along with what it produced."""
+        self.steps[step] = result
+        if self.journal is not None:
+            self.journal.record(self.request_id, step, result)
+
+    def clear(self) -> None:
+        """Forget every step, once the request is done for good."""
+        self.steps.clear()
+        if self.journal is not None:
+            self.journal.clear(self.request_id)
@@ -0,0 +1,89 @@
+"""Batched loading of linked Airtable records.
+
+Reading a link field of a pyairtable model fetches the linked records the
+first time, with one request per record that has the field. Provisioning
+reads the assistant templates of every class request, and updating reads the
+template and class of every assistant, so a run made one request per row on
+top of reading the queue, mostly for the same handful of templates.
+
+A `LinkedRecords` collects the linked record IDs of a whole page of rows,
+fetches the ones it hasn't seen yet this run in a few `RECORD_ID()` queries,
+and fills in the link fields, so reading them afterwards makes no requests.
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterable, AsyncIterator, Sequence, TypeVar
+
+from pyairtable.formulas import EQ, OR, RECORD_ID
+from pyairtable.orm import Model
+from pyairtable.orm.fields import LinkField, SingleLinkField
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=Model)
+
+# Record IDs per query, keeping the formula well within URL length limits.
+PREFETCH_BATCH_SIZE = 50
+
+
+class LinkedRecords:
+    """Linked records fetched during a sync run, by model and record ID."""
+
+    def __init__(self, batch_size: int = PREFETCH_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._records = dict[type[Model], dict[str, Model]]()
+        # IDs that weren't found, so they aren't asked for again.
+        self._missing = set[str]()
+
+    async def _fetch(
+        self, model: type[Model], record_ids: set[str]
+    ) -> dict[str, Model]:
+        known = self._records.setdefault(model, {})
+        unknown = sorted(record_ids - known.keys() - self._missing)
+        for i in range(0, len(unknown), self.batch_size):
+            batch = unknown[i : i + self.batch_size]
+            formula = OR(*(EQ(RECORD_ID(), record_id) for record_id in batch))
+            for record in await asyncio.to_thread(model.all, formula=formula):
+                known[record.id] = record
+        if unknown:
+            self._missing.update(set(unknown) - known.keys())
+            logger.debug(f"Fetched {len(unknown)} linked {model.__name__} records.")
+        return known
+
+    async def prefetch(self, records: Sequence[Model], *fields: str) -> None:
+        """Load what the named link fields of the records point to.
+
+        Links to records that no longer exist are left alone, so reading them
+        fails as it would have.
+        """
+        if not records:
+            return
+        model = type(records[0])
+        for attr in fields:
+            field = getattr(model, attr)
+            if not isinstance(field, (LinkField, SingleLinkField)):
+                raise TypeError(f"{model.__name__}.{attr} is not a link field.")
+            links = {
+                record.id: record.to_record()["fields"].get(field.field_name) or []
+                for record in records
+            }
+            linked = await self._fetch(
+                field.linked_model, {i for ids in links.values() for i in ids}
+            )
+            for record in records:
+                ids = links[record.id]
+                if not ids or not all(i in linked for i in ids):
+                    continue
+                if isinstance(field, SingleLinkField):
+                    setattr(record, attr, linked[ids[0]])
+                else:
+                    setattr(record, attr, [linked[i] for i in ids])
+
+    async def pages(
+        self, pages: AsyncIterable[list[M]], *fields: str
+    ) -> AsyncIterator[list[M]]:
+        """Pass pages of records through, with their link fields loaded."""
+        async for page in pages:
+            await self.prefetch(page, *fields)
+            yield page
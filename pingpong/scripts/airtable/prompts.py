@@ -0,0 +1,158 @@
+"""Rendering of assistant prompts from their Airtable templates.
+
+A prompt is the template's main prompt with the course name code replaced by
+the class name, and the programming language substitute code replaced by a
+sentence built from the class's programming languages. Provisioning renders
+the same few templates for hundreds of classes, so each template is compiled
+once per run: its prompt is split around the two codes, and the language
+sentence is built once per set of languages. Rendered prompts are memoized on
+the template, class name and languages.
+
+Rendering gives exactly what replacing the codes one after the other would.
+When a class name could form a substitute code together with the text around
+it, the compiled template falls back to doing just that.
+"""
+
+from typing import Any, Hashable, Sequence
+
+import pingpong.scripts.airtable.schemas as scripts_schemas
+
+Template = scripts_schemas.AssistantTemplate | scripts_schemas.AssistantTemplateNonStudy
+ClassRequest = scripts_schemas.PingPongClass | scripts_schemas.PingPongClassNonStudy
+
+
+def _list_languages(languages: list[str], conjunction: str) -> str:
+    return ", ".join(languages[:-1]) + f", {conjunction} " + languages[-1]
+
+
+def _multi_language_prompt(template: Template, extra: str, languages: list[str]) -> str:
+    extra = extra.replace(
+        template.prog_lang_code_multi_and[0], _list_languages(languages, "and")
+    )
+    return extra.replace(
+        template.prog_lang_code_multi_or[0], _list_languages(languages, "or")
+    )
+
+
+def programming_prompt(template: Template, class_languages: Sequence[str]) -> str:
+    """The text that replaces the programming language substitute code."""
+    if "None" in class_languages:
+        return ""
+
+    programming_languages = list(class_languages)
+    if "Any" in class_languages:
+        prompt = " " + template.prog_lang_any[0]
+        if "Python" in class_languages:
+            programming_languages.remove("Python")
+        programming_languages.remove("Any")
+        single, multi = (
+            template.prog_lang_single_with_python[0],
+            template.prog_lang_multi_with_python[0],
+        )
+        separator = " "
+    elif "Python" in class_languages:
+        prompt = " " + template.prog_lang_python[0]
+        programming_languages.remove("Python")
+        single, multi = (
+            template.prog_lang_single_with_python[0],
+            template.prog_lang_multi_with_python[0],
+        )
+        separator = " "
+    else:
+        prompt = " "
+        single, multi = (
+            template.prog_lang_single_no_python[0],
+            template.prog_lang_multi_no_python[0],
+        )
+        separator = ""
+
+    if len(programming_languages) == 1:
+        extra = single.replace(
+            template.prog_lang_code_single[0], programming_languages[0]
+        )
+        prompt = prompt + separator + extra
+    elif len(programming_languages) > 1:
+        extra = _multi_language_prompt(template, multi, programming_languages)
+        prompt = prompt + separator + extra
+    return prompt
+
+
+class CompiledTemplate:
+    """An assistant template, split around its substitution codes."""
+
+    def __init__(self, template: Template):
+        self.template = template
+        self.prompt = template.prompt_template[0]
+        self.course_name_code = template.course_name_code[0]
+        self.prog_lang_sub_code = template.prog_lang_sub_code[0]
+        # The prompt split around the course name code, then each part split
+        # around the substitute code. Replacing with an empty code inserts
+        # the replacement between every character, so that isn't split.
+        self._parts: list[str] | None = None
+        self._segments: list[list[str]] | None = None
+        if self.course_name_code and self.prog_lang_sub_code:
+            self._parts = self.prompt.split(self.course_name_code)
+            self._segments = [
+                part.split(self.prog_lang_sub_code) for part in self._parts
+            ]
+        self._programming_prompts = dict[tuple[str, ...], str]()
+
+    def programming_prompt(self, languages: tuple[str, ...]) -> str:
+        if languages not in self._programming_prompts:
+            self._programming_prompts[languages] = programming_prompt(
+                self.template, languages
+            )
+        return self._programming_prompts[languages]
+
+    def _codes_stay_separate(self, class_name: str) -> bool:
+        """Whether no substitute code appears in or across an inserted class name.
+
+        Otherwise, replacing the course name code first creates substitute
+        codes the segments don't have.
+        """
+        assert self._parts is not None
+        margin = len(self.prog_lang_sub_code) - 1
+        text = class_name.join(self._parts)
+        start = 0
+        for part in self._parts[:-1]:
+            start += len(part)
+            end = start + len(class_name)
+            window = text[max(0, start - margin) : end + margin]
+            if self.prog_lang_sub_code in window:
+                return False
+            start = end
+        return True
+
+    def render(self, class_name: str, languages: tuple[str, ...]) -> str:
+        programming = self.programming_prompt(languages)
+        if self._segments is None or not self._codes_stay_separate(class_name):
+            return self.prompt.replace(self.course_name_code, class_name).replace(
+                self.prog_lang_sub_code, programming
+            )
+        return class_name.join(programming.join(part) for part in self._segments)
+
+
+class PromptRenderer:
+    """Compiled templates and rendered prompts, kept for a sync run.
+
+    Templates are identified by record ID and version, so an edited template
+    is compiled again as long as its version is bumped.
+    """
+
+    def __init__(self) -> None:
+        self._templates = dict[Hashable, CompiledTemplate]()
+        self._prompts = dict[Hashable, str]()
+
+    def compile(self, template: Template) -> CompiledTemplate:
+        key = (template.id, template.version)
+        if key not in self._templates:
+            self._templates[key] = CompiledTemplate(template)
+        return self._templates[key]
+
+    def render(self, request: ClassRequest, template: Template) -> str:
+        class_name = request.class_name[0]
+        languages = tuple(request.class_programming_languages)
+        key: tuple[Any, ...] = (template.id, template.version, class_name, languages)
+        if key not in self._prompts:
+            self._prompts[key] = self.compile(template).render(class_name, languages)
+        return self._prompts[key]
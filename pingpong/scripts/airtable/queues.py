@@ -0,0 +1,127 @@
+"""Streaming reads of the Airtable tables the sync phases work through.
+
+Each sync phase processes the rows of a table that are waiting in some status.
+Instead of loading every waiting row before starting, `iterate_queue` yields
+them a page at a time and fetches the next page while the current one is
+being processed. A run can be given a time budget, after which it stops
+taking new pages; the rows it didn't get to are still waiting next time.
+
+Processing a row moves it out of the queue while later pages are still to be
+read, which shifts Airtable's paging under an open list iterator (and a long
+run can outlive the iterator). So the IDs of the waiting rows are listed
+first, with one field each, and every page is then read by ID.
+
+`changed_since` checks whether any waiting row was modified after a given
+time with a single one-record request, so the queues can be watched for new
+work without reading them.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Generic, NamedTuple, TypeVar
+
+from pyairtable.api.types import RecordDict
+from pyairtable.formulas import AND, EQ, IS_AFTER, LAST_MODIFIED_TIME, OR, RECORD_ID
+from pyairtable.orm import Model
+from pyairtable.orm.fields import Field
+
+from pingpong.scripts.airtable.vars import SYNC_TIME_BUDGET
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=Model)
+
+# Records per page; the most Airtable returns per request.
+PAGE_SIZE = 100
+
+
+class Queue(NamedTuple, Generic[M]):
+    """The rows of a table waiting to be processed."""
+
+    model: type[M]
+    formula: Any
+
+
+def _waiting_ids(model: type[Model], formula: Any) -> list[str]:
+    """The IDs of the rows matching `formula`, in Airtable's order."""
+    # Airtable returns every field unless asked for some, so ask for one.
+    field = next(f for f in vars(model).values() if isinstance(f, Field))
+    return [
+        record["id"]
+        for page in model.meta.table.iterate(
+            formula=formula,
+            fields=[field.field_name],
+            page_size=PAGE_SIZE,
+            **model.meta.request_kwargs,
+        )
+        for record in page
+    ]
+
+
+def _read_page(model: type[Model], formula: Any, ids: list[str]) -> list[RecordDict]:
+    """The rows with the given IDs that still match `formula`, in that order."""
+    records = model.meta.table.all(
+        formula=AND(formula, OR(*[EQ(RECORD_ID(), id) for id in ids])),
+        **model.meta.request_kwargs,
+    )
+    by_id = {record["id"]: record for record in records}
+    return [by_id[id] for id in ids if id in by_id]
+
+
+async def iterate_queue(
+    model: type[M],
+    formula: Any,
+    *,
+    time_budget: float | None = SYNC_TIME_BUDGET,
+    page_size: int = PAGE_SIZE,
+) -> AsyncIterator[list[M]]:
+    """Yield pages of the records matching `formula` when the run started.
+
+    Rows that stop matching before their page is read are left out. The
+    blocking pyairtable requests run in a worker thread, one page ahead of
+    the caller. No more pages are yielded once `time_budget` seconds have
+    passed since the first one was requested.
+    """
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    ids: list[str] | None = None
+
+    def next_page() -> list[RecordDict] | None:
+        nonlocal ids
+        if ids is None:
+            ids = _waiting_ids(model, formula)
+        while ids:
+            batch, ids = ids[:page_size], ids[page_size:]
+            if page := _read_page(model, formula, batch):
+                return page
+        return None
+
+    fetch = asyncio.ensure_future(asyncio.to_thread(next_page))
+    try:
+        while (page := await fetch) is not None:
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.info(
+                    f"Time budget for {model.__name__} used up, "
+                    "leaving the remaining records for the next run."
+                )
+                return
+            fetch = asyncio.ensure_future(asyncio.to_thread(next_page))
+            yield [model.from_record(record) for record in page]
+    finally:
+        fetch.cancel()
+
+
+async def changed_since(queue: Queue, since: datetime | None) -> bool:
+    """Whether any row in the queue was modified after `since`.
+
+    Without `since`, whether any row is waiting at all.
+    """
+    model = queue.model
+    formula = queue.formula
+    if since is not None:
+        formula = AND(formula, IS_AFTER(LAST_MODIFIED_TIME(), since))
+    record = await asyncio.to_thread(
+        model.meta.table.first, formula=formula, **model.meta.request_kwargs
+    )
+    return record is not None
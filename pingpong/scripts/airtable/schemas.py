@@ -1,6 +1,7 @@
 from pyairtable.orm import Model, fields as F
 from pydantic import BaseModel
 
+from pingpong.ratelimit import Priority, limit_models
 from pingpong.scripts.airtable.vars import (
     AIRTABLE_API_KEY,
     AIRTABLE_BASE_ID,
@@ -234,6 +235,21 @@ class PingPongClassNonStudy(Model):
         api_key: str = _AIRTABLE_API_KEY
 
 
+limit_models(
+    AssistantTemplate,
+    AssistantTemplateNonStudy,
+    PingPongAssistant,
+    PingPongAssistantNonStudy,
+    UserClassRole,
+    ExternalLoginRequests,
+    InstructorNonStudy,
+    ExternalLoginRequestsNonStudy,
+    PingPongClass,
+    PingPongClassNonStudy,
+    priority=Priority.BATCH,
+)
+
+
 class Tool(BaseModel):
     type: str
 
@@ -0,0 +1,116 @@
+"""Pooled HTTP connections to the PingPong API for the sync scripts.
+
+The scheduler runs several sync phases back to back on every tick. A
+`SyncContext` owns one connection pool for the life of the process, and hands
+out one client session per sync run, which every phase of that run shares.
+Connections stay open between phases, and between runs that are close enough
+together, instead of being rebuilt for each phase.
+
+Per-session state (the institution index, the service account's own user) is
+therefore scoped to a single run.
+"""
+
+import logging
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import AsyncIterator
+
+import aiohttp
+
+import pingpong.metrics as metrics
+from pingpong.scripts.airtable.vars import PINGPONG_COOKIE
+
+logger = logging.getLogger(__name__)
+
+# Connections kept to the PingPong API, in total and per host.
+CONNECTION_LIMIT = 32
+CONNECTIONS_PER_HOST = 16
+# Seconds an idle connection is kept open for reuse.
+KEEPALIVE_TIMEOUT = 60.0
+# Seconds resolved host names are cached for.
+DNS_CACHE_TTL = 300
+
+
+class SyncContext:
+    """A long-lived connection pool for the PingPong API."""
+
+    def __init__(
+        self,
+        cookie: str | None = PINGPONG_COOKIE,
+        *,
+        limit: int = CONNECTION_LIMIT,
+        limit_per_host: int = CONNECTIONS_PER_HOST,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+    ):
+        if not cookie:
+            raise ValueError("Missing PingPong cookie in environment.")
+        self.cookie = cookie
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._connector: aiohttp.TCPConnector | None = None
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    @property
+    def connector(self) -> aiohttp.TCPConnector:
+        """The shared connector, created on first use inside the running loop."""
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                limit=self._limit,
+                limit_per_host=self._limit_per_host,
+                keepalive_timeout=self._keepalive_timeout,
+                ttl_dns_cache=DNS_CACHE_TTL,
+            )
+        return self._connector
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        async def on_create(session, context: SimpleNamespace, params) -> None:
+            self.connections_created += 1
+            metrics.pingpong_api_connections.inc(event="created")
+
+        async def on_reuse(session, context: SimpleNamespace, params) -> None:
+            self.connections_reused += 1
+            metrics.pingpong_api_connections.inc(event="reused")
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(on_create)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        return trace_config
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[aiohttp.ClientSession]:
+        """Open a client session for one sync run, over the shared pool."""
+        created, reused = self.connections_created, self.connections_reused
+        async with aiohttp.ClientSession(
+            connector=self.connector,
+            connector_owner=False,
+            cookies={"session": self.cookie},
+            trace_configs=[self._trace_config()],
+        ) as session:
+            yield session
+        logger.info(
+            "PingPong API connections this run: %d opened, %d reused.",
+            self.connections_created - created,
+            self.connections_reused - reused,
+        )
+
+    async def close(self) -> None:
+        if self._connector is not None and not self._connector.closed:
+            await self._connector.close()
+
+
+@asynccontextmanager
+async def pingpong_session(
+    session: aiohttp.ClientSession | None = None,
+) -> AsyncIterator[aiohttp.ClientSession]:
+    """Use the given session, or open a short-lived one if there is none."""
+    if session is not None:
+        yield session
+        return
+    context = SyncContext()
+    try:
+        async with context.session() as session:
+            yield session
+    finally:
+        await context.close()
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+
+import pingpong.schemas as schemas
+import pingpong.scripts.airtable.helpers as helpers
+
+
+class FakePingPong:
+    """The institution endpoints of a PingPong server."""
+
+    def __init__(self, *names: str):
+        self.institutions = [self._institution(name) for name in names]
+        self.created = list[str]()
+        self.lists = 0
+
+    def _institution(self, name: str) -> schemas.Institution:
+        return schemas.Institution(
+            id=len(getattr(self, "institutions", [])) + 1,
+            name=name,
+            description=None,
+            logo=None,
+            created=datetime.now(timezone.utc),
+            updated=None,
+        )
+
+    async def list_institutions(self, session, url):
+        self.lists += 1
+        await asyncio.sleep(0.01)
+        return schemas.Institutions(institutions=list(self.institutions))
+
+    async def create_institution(self, session, institution, url):
+        await asyncio.sleep(0.01)
+        self.created.append(institution.name)
+        self.institutions.append(self._institution(institution.name))
+        return self.institutions[-1]
+
+
+@pytest.fixture
+def pingpong(monkeypatch):
+    server = FakePingPong("Existing University")
+    monkeypatch.setattr(
+        helpers.server_requests, "list_institutions", server.list_institutions
+    )
+    monkeypatch.setattr(
+        helpers.server_requests, "create_institution", server.create_institution
+    )
+    monkeypatch.setattr(
+        helpers, "_institution_directories", type(helpers._institution_directories)()
+    )
+    return server
+
+
+async def test_concurrent_phases_create_a_new_institution_once(pingpong):
+    # Each phase run has its own session.
+    study_session, nonstudy_session = object(), object()
+    institutions = await asyncio.gather(
+        *[
+            helpers.get_or_create_institution(session, "New College")
+            for session in [study_session, nonstudy_session] * 3
+        ]
+    )
+    assert pingpong.created == ["New College"]
+    assert len({institution.id for institution in institutions}) == 1
+
+
+async def test_existing_institutions_are_listed_once(pingpong):
+    for session in [object(), object()]:
+        institution = await helpers.get_or_create_institution(
+            session, "Existing University"
+        )
+        assert institution.id == 1
+    assert pingpong.lists == 1
+    assert pingpong.created == []
+
+
+async def test_service_user_is_resolved_again_when_the_cookie_rotates(monkeypatch):
+    lookups = list[str | None]()
+
+    async def get_me(session, url):
+        cookie = helpers._session_cookie(session)
+        lookups.append(cookie)
+        return SimpleNamespace(id=len(lookups), email=f"sync-{cookie}@example.com")
+
+    monkeypatch.setattr(helpers.server_requests, "get_me", get_me)
+    async with aiohttp.ClientSession(cookies={"session": "first"}) as session:
+        users = await asyncio.gather(
+            *[helpers.get_service_user(session) for _ in range(5)]
+        )
+        assert {user.id for user in users} == {1}
+
+        session.cookie_jar.update_cookies({"session": "second"})
+        assert (await helpers.get_service_user(session)).id == 2
+    assert lookups == ["first", "second"]
+
+
+async def test_provision_errors_name_what_failed(caplog):
+    async def pages():
+        yield [1, 2]
+
+    async def provision(student: int) -> None:
+        if student == 1:
+            raise RuntimeError("boom")
+
+    await helpers._provision_concurrently(pages(), provision, 2, "a class's students")
+    assert [r.getMessage() for r in caplog.records] == [
+        "Unhandled error provisioning a class's students."
+    ]
+
+
+async def test_resumed_requests_link_each_assistant_once():
+    saved = SimpleNamespace(id="recSaved")
+    request = SimpleNamespace(pingpong_assistants=[saved])
+
+    async def assistant(record_id: str):
+        if record_id == "recFailed":
+            raise RuntimeError("boom")
+        return SimpleNamespace(id=record_id)
+
+    tasks = [
+        asyncio.create_task(assistant(record_id))
+        for record_id in ("recSaved", "recNew", "recFailed")
+    ]
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    helpers._link_assistants(request, tasks)  # type: ignore[arg-type]
+    assert [a.id for a in request.pingpong_assistants] == ["recSaved", "recNew"]
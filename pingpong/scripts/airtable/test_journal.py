@@ -0,0 +1,61 @@
+from pyairtable import Table
+from pyairtable.orm import Model, fields
+
+from pingpong.scripts.airtable.journal import ProvisioningJournal
+from pingpong.scripts.airtable.write_back import WriteBackBuffer
+
+
+class Request(Model):
+    status = fields.TextField("Status")
+
+    class Meta:
+        api_key = "key"
+        base_id = "appJournal"
+        table_name = "Requests"
+
+
+def test_cleared_requests_start_from_scratch(tmp_path):
+    journal = ProvisioningJournal(str(tmp_path / "journal.db"))
+    checkpoint = journal.checkpoint("recA")
+    checkpoint.done("class", {"id": 1})
+    journal.checkpoint("recB").done("class", {"id": 2})
+
+    reopened = ProvisioningJournal(str(tmp_path / "journal.db"))
+    assert reopened.checkpoint("recA").get("class") == {"id": 1}
+
+    checkpoint.clear()
+    assert checkpoint.get("class") is None
+    assert reopened.checkpoint("recA").steps == {}
+    assert reopened.checkpoint("recB").get("class") == {"id": 2}
+
+
+async def test_journal_is_cleared_only_once_the_row_is_saved(tmp_path, monkeypatch):
+    rejected = {"recBad"}
+
+    def batch_update(self, batch, typecast=False):
+        if any(update["id"] in rejected for update in batch):
+            raise RuntimeError("rejected")
+
+    def update(self, record_id, fields, typecast=False):
+        if record_id in rejected:
+            raise RuntimeError("rejected")
+
+    monkeypatch.setattr(Table, "batch_update", batch_update)
+    monkeypatch.setattr(Table, "update", update)
+
+    journal = ProvisioningJournal(str(tmp_path / "journal.db"))
+    writes = WriteBackBuffer()
+    for record_id in ("recOk", "recBad"):
+        checkpoint = journal.checkpoint(record_id)
+        checkpoint.done("class", {"id": record_id})
+        request = Request.from_record(
+            {"id": record_id, "createdTime": "2024-01-01T00:00:00.000Z", "fields": {}}
+        )
+        writes.update(request, status="Added")
+        writes.after_write(request, checkpoint.clear)
+        # Nothing is cleared until the write goes through.
+        assert journal.checkpoint(record_id).get("class") == {"id": record_id}
+
+    await writes.flush()
+    assert journal.checkpoint("recOk").steps == {}
+    assert journal.checkpoint("recBad").get("class") == {"id": "recBad"}
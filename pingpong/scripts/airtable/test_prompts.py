@@ -0,0 +1,43 @@
+import random
+from types import SimpleNamespace
+
+from pingpong.scripts.airtable.prompts import CompiledTemplate, programming_prompt
+
+
+def _template(prompt: str, course_code: str, sub_code: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        prompt_template=[prompt],
+        course_name_code=[course_code],
+        prog_lang_sub_code=[sub_code],
+        prog_lang_any=["Any language."],
+        prog_lang_python=["Python."],
+        prog_lang_single_with_python=["Also {L}."],
+        prog_lang_multi_with_python=["Also {M&} ({M|})."],
+        prog_lang_single_no_python=["Only {L}."],
+        prog_lang_multi_no_python=["Only {M&}."],
+        prog_lang_code_single=["{L}"],
+        prog_lang_code_multi_and=["{M&}"],
+        prog_lang_code_multi_or=["{M|}"],
+    )
+
+
+def test_rendering_matches_replacing_the_codes_in_order():
+    rng = random.Random(21)
+    alphabet = "ab{}"
+    languages = [(), ("None",), ("Python",), ("Any", "C"), ("C", "Java", "Go")]
+    for _ in range(5000):
+
+        def text(longest: int) -> str:
+            return "".join(rng.choices(alphabet, k=rng.randint(0, longest)))
+
+        template = _template(text(30), text(3), text(3))
+        class_name = text(6)
+        langs = rng.choice(languages)
+        expected = (
+            template.prompt_template[0]
+            .replace(template.course_name_code[0], class_name)
+            .replace(
+                template.prog_lang_sub_code[0], programming_prompt(template, langs)
+            )
+        )
+        assert CompiledTemplate(template).render(class_name, langs) == expected
@@ -0,0 +1,58 @@
+import re
+
+from pyairtable import Table
+from pyairtable.formulas import to_formula_str
+from pyairtable.orm import Model, fields
+
+from pingpong.scripts.airtable.queues import iterate_queue
+
+
+class Row(Model):
+    status = fields.TextField("Status")
+    name = fields.TextField("Name")
+
+    class Meta:
+        api_key = "key"
+        base_id = "appQueue"
+        table_name = "Rows"
+
+
+def _record(n: int, status: str) -> dict:
+    return {
+        "id": f"rec{n:03}",
+        "createdTime": "2025-01-01T00:00:00.000Z",
+        "fields": {"Status": status, "Name": f"Row {n}"},
+    }
+
+
+async def test_rows_leaving_the_queue_dont_shift_later_pages(monkeypatch):
+    table = {f"rec{n:03}": _record(n, "Waiting") for n in range(25)}
+    listed_fields = list[list[str]]()
+
+    def waiting() -> list[dict]:
+        return [r for r in table.values() if r["fields"]["Status"] == "Waiting"]
+
+    def iterate(self, formula=None, fields=None, page_size=100, **kwargs):
+        listed_fields.append(fields)
+        rows = waiting()
+        for start in range(0, len(rows), page_size):
+            yield rows[start : start + page_size]
+
+    def all(self, formula=None, **kwargs):
+        ids = re.findall(r"RECORD_ID\(\)='(rec\d+)'", to_formula_str(formula))
+        return [r for r in waiting() if r["id"] in ids]
+
+    monkeypatch.setattr(Table, "iterate", iterate)
+    monkeypatch.setattr(Table, "all", all)
+
+    seen = list[str]()
+    async for page in iterate_queue(Row, "{Status}='Waiting'", page_size=10):
+        for row in page:
+            seen.append(row.id)
+            # Processing a row moves it out of the queue, and a row further
+            # on is picked up by someone else.
+            table[row.id]["fields"]["Status"] = "Done"
+        table["rec024"]["fields"]["Status"] = "Taken"
+
+    assert seen == [f"rec{n:03}" for n in range(24)]
+    assert listed_fields == [["Status"]]
@@ -29,3 +29,23 @@ AIRTABLE_NONSTUDY_BASE_ID = os.getenv("AIRTABLE_NONSTUDY_BASE_ID")
 AIRTABLE_API_KEY = os.getenv("AIRTABLE_API_KEY")
 PINGPONG_COOKIE = os.getenv("PINGPONG_COOKIE")
 PINGPONG_URL = os.getenv("PINGPONG_URL")
+
+# Number of class requests provisioned at the same time.
+CLASS_PROVISIONING_CONCURRENCY = int(os.getenv("CLASS_PROVISIONING_CONCURRENCY", "8"))
+
+# Optional file where the PingPong institution index is kept between runs.
+INSTITUTION_DIRECTORY_PATH = os.getenv("INSTITUTION_DIRECTORY_PATH")
+
+# Optional SQLite file where completed class provisioning steps are journaled,
+# so a run that dies halfway is resumed instead of repeated.
+PROVISIONING_JOURNAL_PATH = os.getenv("PROVISIONING_JOURNAL_PATH")
+
+# Seconds a sync phase may keep taking new work before leaving the rest for the
+# next run. Unlimited when unset.
+SYNC_TIME_BUDGET = (
+    float(os.environ["SYNC_TIME_BUDGET"]) if os.getenv("SYNC_TIME_BUDGET") else None
+)
+
+# Base64 MAC secret of the Airtable webhook that notifies the sync of changes.
+# Webhook notifications are all rejected when unset.
+AIRTABLE_WEBHOOK_SECRET = os.getenv("AIRTABLE_WEBHOOK_SECRET")
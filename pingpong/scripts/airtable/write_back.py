@@ -0,0 +1,168 @@
+"""Batched write-back of sync results to Airtable.
+
+The sync loops record the outcome of each request (status, notes, PingPong
+IDs) on its Airtable row. Saving every row as soon as it's processed blocks
+the event loop on one HTTP request per row. Instead, changes are collected in
+a `WriteBackBuffer` and written in batch updates of up to 10 records, the most
+Airtable accepts per request, from a worker thread. Work that must wait until
+a row is saved can be attached to it with `WriteBackBuffer.after_write`.
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable
+
+from pyairtable.api.types import UpdateRecordDict
+from pyairtable.orm import Model
+
+logger = logging.getLogger(__name__)
+
+# Records per Airtable batch update; the most the API accepts.
+AIRTABLE_BATCH_SIZE = 10
+# Pending records that trigger a flush without waiting for the interval.
+FLUSH_SIZE = 50
+# Seconds between background flushes.
+FLUSH_INTERVAL = 5.0
+
+
+class WriteBackBuffer:
+    """Collects field updates to Airtable records and writes them in batches.
+
+    Use it as an async context manager: changes are flushed in the background
+    when enough have piled up or the flush interval passes, and everything
+    left is flushed on exit, even if the block raised or was cancelled.
+    """
+
+    def __init__(
+        self,
+        flush_size: int = FLUSH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+    ):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        # Changed fields by model, then by record ID, keyed by Airtable field name.
+        self._pending = dict[type[Model], dict[str, dict[str, Any]]]()
+        # Callbacks to run once a record's pending changes are written.
+        self._callbacks = dict[str, list[Callable[[], None]]]()
+        self._lock = asyncio.Lock()
+        self._timer: asyncio.Task | None = None
+        self._closed = asyncio.Event()
+        self._flushes = set[asyncio.Task]()
+
+    @property
+    def pending(self) -> int:
+        return sum(len(records) for records in self._pending.values())
+
+    def update(self, record: Model, **changes: Any) -> None:
+        """Set attributes on a saved record and queue them to be written.
+
+        Changes to the same record are merged; the latest value of each field
+        wins.
+        """
+        if not record.id:
+            raise ValueError("Only records that already exist can be updated.")
+        model = type(record)
+        fields = self._pending.setdefault(model, {}).setdefault(record.id, {})
+        for attr, value in changes.items():
+            setattr(record, attr, value)
+        # Let the ORM convert the values (linked records, dates) for the API.
+        record_fields = record.to_record()["fields"]
+        for attr in changes:
+            field_name = getattr(model, attr).field_name
+            fields[field_name] = record_fields.get(field_name)
+
+        if self.pending >= self.flush_size:
+            task = asyncio.create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    def after_write(self, record: Model, callback: Callable[[], None]) -> None:
+        """Call `callback` once the record's pending changes are written.
+
+        If writing the record fails, the callback is dropped without being
+        called.
+        """
+        if not record.id:
+            raise ValueError("Only records that already exist can be updated.")
+        self._callbacks.setdefault(record.id, []).append(callback)
+
+    async def flush(self) -> None:
+        """Write every pending change to Airtable."""
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            callbacks, self._callbacks = self._callbacks, {}
+            for model, records in pending.items():
+                updates: list[UpdateRecordDict] = [
+                    {"id": record_id, "fields": fields}
+                    for record_id, fields in records.items()
+                ]
+                for i in range(0, len(updates), AIRTABLE_BATCH_SIZE):
+                    written = await self._write(
+                        model, updates[i : i + AIRTABLE_BATCH_SIZE]
+                    )
+                    for record_id in written:
+                        for callback in callbacks.pop(record_id, []):
+                            try:
+                                callback()
+                            except Exception:
+                                logger.exception(
+                                    f"Error after writing record {record_id}."
+                                )
+
+    async def _write(
+        self, model: type[Model], batch: list[UpdateRecordDict]
+    ) -> list[str]:
+        """Write a batch of updates, returning the IDs of the written records."""
+        table = model.meta.table
+        try:
+            await asyncio.to_thread(
+                table.batch_update, batch, typecast=model.meta.typecast
+            )
+            return [update["id"] for update in batch]
+        except Exception as e:
+            logger.warning(
+                f"Error writing {len(batch)} {model.__name__} records, "
+                f"retrying them one by one: {e}"
+            )
+        # A batch is rejected as a whole, so find the records that caused it.
+        written = list[str]()
+        for update in batch:
+            try:
+                await asyncio.to_thread(
+                    table.update,
+                    update["id"],
+                    update["fields"],
+                    typecast=model.meta.typecast,
+                )
+                written.append(update["id"])
+            except Exception as e:
+                logger.warning(
+                    f"Error writing {model.__name__} record {update['id']}: {e}"
+                )
+        return written
+
+    async def _flush_periodically(self) -> None:
+        # Wait on an event rather than sleeping, so closing the buffer never
+        # cancels a flush halfway through.
+        while not self._closed.is_set():
+            try:
+                await asyncio.wait_for(self._closed.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Error flushing Airtable write-back buffer.")
+
+    async def __aenter__(self) -> "WriteBackBuffer":
+        self._timer = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._closed.set()
+        tasks = [*self._flushes]
+        if self._timer is not None:
+            tasks.append(self._timer)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Shield the final flush so cancelling the caller can't drop changes.
+        await asyncio.shield(self.flush())
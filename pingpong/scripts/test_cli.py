@@ -0,0 +1,20 @@
+import pytest
+from click.testing import CliRunner
+
+from pingpong.scripts.__main__ import cli
+
+
+@pytest.mark.parametrize(
+    ("args", "option"),
+    [
+        (["--crontime", "*/15 * * *"], "--crontime"),
+        (["--phase-crontime", "class_requests=61 * * * *"], "--phase-crontime"),
+        (["--phase-concurrency", "class_requests=0"], "--phase-concurrency"),
+        (["--phase-overlap", "class_requests=sometimes"], "--phase-overlap"),
+    ],
+)
+def test_bad_settings_are_rejected_before_starting(args, option):
+    result = CliRunner().invoke(cli, ["sync_pingpong_with_airtable", *args])
+    assert result.exit_code == 2
+    assert option in result.output
+    assert "PHASE=VALUE" not in result.output
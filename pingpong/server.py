@@ -1,6 +1,8 @@
+import asyncio
 import logging
 import time
 from contextlib import asynccontextmanager
+from typing import Any, Callable, Coroutine
 from fastapi import (
     FastAPI,
     HTTPException,
@@ -9,17 +11,28 @@ from fastapi import (
 from fastapi.responses import JSONResponse
 
 import pingpong.metrics as metrics
+from .airtable_client import close_clients
 from .config import config
 from .errors import sentry
 
 logger = logging.getLogger(__name__)
 
+# Long-running tasks started with the server and cancelled on shutdown.
+background_tasks = list[Callable[[], Coroutine[Any, Any, None]]]()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Run services in the background."""
     with sentry(), metrics.metrics():
-        yield
+        tasks = [asyncio.create_task(task()) for task in background_tasks]
+        try:
+            yield
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await close_clients()
 
 
 app = FastAPI(
@@ -49,8 +62,12 @@ async def handle_exception(request: Request, exc: Exception):
 # Conditionally mount Study app when configured
 try:
     if config.study_public_url and config.study:
+        from pingpong.study.airtable import replica as study_replica
         from pingpong.study.server import study as study_app
 
+        if study_replica is not None:
+            background_tasks.append(study_replica.run)
+
         # Attach logging middleware to study app
         @study_app.middleware("http")
         async def log_request(request: Request, call_next):
@@ -1,36 +1,228 @@
 import asyncio
-from requests import HTTPError
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Generic,
+    Iterator,
+    Literal,
+    NamedTuple,
+    TypeVar,
+    get_args,
+)
+from aiohttp import ClientError, ClientResponseError
 from pyairtable import formulas
+from pyairtable.orm import Model
+from pingpong.airtable_client import AirtableClient, AirtableError
+from pingpong.cache import TTLCache
+from pingpong.study.replica import Replica
 from pingpong.study.schemas import (
     Admin,
     Course,
     Instructor,
     PreAssessmentStudentSubmission,
     PostAssessmentStudentSubmission,
+    RosterCursorExpiredException,
+    StudentRemovalException,
     UserClassAssociation,
     UserNotFoundException,
+    study_config,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+M = TypeVar("M", bound=Model)
+RecordKey = tuple[str, str]
+RosterSort = Literal["name", "submission_date", "status"]
+PostStatus = Literal["OK", "PEND", "NRC", "PRE"]
+POST_STATUSES: tuple[PostStatus, ...] = get_args(PostStatus)
+
+client = AirtableClient(study_config.airtable_api_key)
+
+replica = (
+    Replica(
+        study_config.replica_path,
+        client,
+        [
+            Admin,
+            Course,
+            Instructor,
+            PreAssessmentStudentSubmission,
+            PostAssessmentStudentSubmission,
+            UserClassAssociation,
+        ],
+        sync_interval=study_config.replica_sync_interval,
+        full_sync_interval=study_config.replica_full_sync_interval,
+        # Incremental syncs miss lookup and count changes, and the dashboard
+        # shows these tables' lookups and counts.
+        full_sync_intervals=dict.fromkeys(
+            [
+                Course,
+                PreAssessmentStudentSubmission,
+                PostAssessmentStudentSubmission,
+                UserClassAssociation,
+            ],
+            study_config.replica_lookup_full_sync_interval,
+        ),
+        # Lookups and counts computed from each table's records.
+        dependents={
+            Instructor: [Course],
+            PreAssessmentStudentSubmission: [Course],
+            PostAssessmentStudentSubmission: [Course],
+            UserClassAssociation: [PreAssessmentStudentSubmission, Course],
+        },
+    )
+    if study_config.replica_path
+    else None
 )
 
+# Instructor records are read on every authenticated request, so keep them
+# around for a short while instead of going back to Airtable each time.
+_instructor_cache = TTLCache[str, Instructor](
+    "instructor", ttl=study_config.instructor_cache_ttl
+)
+
+# IDs of the courses each instructor teaches, keyed by instructor ID and the
+# excluded sessions, so authorization checks don't need to list courses. Each
+# entry remembers the replica's Course table version it was read at, and is
+# dropped once any worker's sync or write changes that table. Without the
+# replica, the TTL is the only bound on how stale an entry can be.
+_course_ids_cache = TTLCache[
+    tuple[str, tuple[str, ...]], tuple[int | None, frozenset[str]]
+]("instructor_course_ids", ttl=study_config.course_index_ttl)
+
+# Records already loaded while handling the current request.
+_request_records: ContextVar[dict[RecordKey, Any] | None] = ContextVar(
+    "study_request_records", default=None
+)
+
+# Record reads currently in flight in this worker, shared by all callers.
+_in_flight: dict[RecordKey, asyncio.Future[Any]] = {}
+
+
+@contextmanager
+def request_scope() -> Iterator[None]:
+    """Load each Airtable record at most once while handling a request."""
+    token = _request_records.set({})
+    try:
+        yield
+    finally:
+        _request_records.reset(token)
+
+
+async def _load(key: RecordKey, fetch: Callable[[], Awaitable[T]]) -> T:
+    """Load a record through the request's identity map.
+
+    Concurrent loads of the same record, from this or any other request, share
+    a single Airtable read.
+    """
+    records = _request_records.get()
+    if records is not None and key in records:
+        return records[key]
+
+    future = _in_flight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(fetch())
+        _in_flight[key] = future
+        future.add_done_callback(lambda _: _in_flight.pop(key, None))
+
+    result = await asyncio.shield(future)
+    if records is not None:
+        records[key] = result
+    return result
+
+
+async def _all(
+    model: type[M],
+    formula: Any,
+    where: dict[str, Any],
+    keep: Callable[[M], bool] | None = None,
+) -> list[M]:
+    """Query the local replica if it's ready, otherwise Airtable.
+
+    `where` expresses the same equality conditions as `formula` for the
+    replica, and `keep` can filter out what `where` can't express.
+    """
+    if replica is not None:
+        records = replica.select(model, where)
+        if records is not None:
+            return [record for record in records if keep is None or keep(record)]
+    return await client.all(model, formula=formula)
+
+
+async def _get(model: type[M], record_id: str) -> M:
+    if replica is not None:
+        record = replica.get(model, record_id)
+        if record is not None:
+            return record
+    return await client.get(model, record_id)
+
+
+def table_version(model: type[Model]) -> int | None:
+    """The replica's version of a table, or None without a ready replica."""
+    return replica.version(model) if replica is not None else None
+
+
+def data_version(*models: type[Model]) -> tuple[int, ...] | None:
+    """The replica's versions of several tables, or None if any isn't ready.
+
+    Every worker sees the same versions, and they change whenever the
+    replicated data does, so they tell whether a response is still current.
+    """
+    versions = [table_version(model) for model in models]
+    if None in versions:
+        return None
+    return tuple(version for version in versions if version is not None)
+
+
+def _stored(*instances: Model) -> None:
+    """Keep the replica in step with records just written to Airtable."""
+    if replica is not None:
+        replica.store(*instances)
+
+
+async def _fetch_instructor(user_id: str) -> Instructor:
+    cached = _instructor_cache.get(user_id)
+    if cached is not None:
+        return cached
 
-async def get_instructor(user_id: str) -> Instructor:
     try:
-        instructor = await asyncio.to_thread(Instructor.from_id, user_id)
-    except HTTPError as e:
-        if e.response.status_code == 403:
+        instructor = await _get(Instructor, user_id)
+    except ClientResponseError as e:
+        if e.status in (403, 404):
             raise UserNotFoundException(
                 detail="We couldn't find you in the study database. Please contact the study administrator.",
                 user_id=user_id,
             )
+        raise
 
+    _instructor_cache.set(user_id, instructor)
     return instructor
 
 
+async def get_instructor(user_id: str) -> Instructor:
+    return await _load(("instructor", user_id), lambda: _fetch_instructor(user_id))
+
+
+def invalidate_instructor(instructor_id: str) -> None:
+    """Drop the cached record for an instructor after their profile changes."""
+    _instructor_cache.invalidate(instructor_id)
+    records = _request_records.get()
+    if records is not None:
+        records.pop(("instructor", instructor_id), None)
+
+
 async def get_instructor_by_email(email: str) -> Instructor | None:
     email_to_match = email.lower().strip()
     formula = Instructor.academic_email.eq(
         email_to_match
     ) | Instructor.personal_email.eq(email_to_match)
-    instructor = await asyncio.to_thread(Instructor.first, formula=formula)
+    instructor = await client.first(Instructor, formula=formula)
     return instructor
 
 
@@ -43,107 +235,508 @@ async def get_courses_by_instructor_id(
             *[formulas.FIND(session, Course.session) for session in exclude_sessions]
         )
         formula &= formulas.NOT(exclusion_formula)
-    courses = await asyncio.to_thread(Course.all, formula=formula)
+
+    def not_excluded(course: Course) -> bool:
+        # FIND matches against the comma-joined list of sessions.
+        sessions = ", ".join(course.session or [])
+        return not any(session in sessions for session in exclude_sessions or [])
+
+    version = table_version(Course)
+    courses = await _all(
+        Course,
+        formula,
+        {Course.instructor.field_name: instructor_id},
+        keep=not_excluded,
+    )
+    _course_ids_cache.set(
+        (instructor_id, tuple(exclude_sessions or ())),
+        (version, frozenset(course.id for course in courses)),
+    )
     return courses
 
 
 async def check_if_instructor_teaches_course_by_ids(
     instructor_id: str, course_id: str, exclude_sessions: list[str] | None = None
 ) -> bool:
+    key = (instructor_id, tuple(exclude_sessions or ()))
+    cached = _course_ids_cache.get(key)
+    if cached is not None and cached[0] == table_version(Course):
+        return course_id in cached[1]
     courses = await get_courses_by_instructor_id(
         instructor_id, exclude_sessions=exclude_sessions
     )
-    return any(course.id == course_id for course in courses)
+    return course_id in {course.id for course in courses}
 
 
 async def update_course_enrollment_by_record_id(
     course_record_id: str, enrollment_count: int
 ) -> None:
     """Update the Enrollment field for the course with the given custom record id."""
-
-    def _update():
-        course = Course.from_id(course_record_id)
-        if course is None:
-            return False
-        course.enrollment_count = enrollment_count
-        course.save()
-        return True
-
-    ok = await asyncio.to_thread(_update)
-    if not ok:
-        raise UserNotFoundException(
-            detail="Course not found.",
-            user_id=course_record_id,
+    try:
+        course = await client.update(
+            Course,
+            course_record_id,
+            {Course.enrollment_count.field_name: enrollment_count},
         )
+    except ClientResponseError as e:
+        if e.status in (403, 404):
+            raise UserNotFoundException(
+                detail="Course not found.",
+                user_id=course_record_id,
+            )
+        raise
+    _stored(course)
 
 
-async def get_preassessment_students_by_class_id(
-    class_id: str,
+class RosterQuery(NamedTuple, Generic[M]):
+    """A filtered, sorted roster listing, for both Airtable and the replica."""
+
+    model: type[M]
+    formula: Any
+    where: dict[str, Any]
+    keep: Callable[[M], bool] | None
+    # Airtable field names to sort by, prefixed with "-" when descending.
+    sort: list[str]
+    # Sort key for the same order when sorting in Python. Like Airtable, it
+    # compares the fields' values as they are, with empty values first.
+    order: Callable[[M], Any]
+    descending: bool
+    # Formulas splitting the roster into groups that come one after another,
+    # for orders Airtable can't sort by. Each group is sorted by `sort`.
+    groups: tuple[Any, ...] = ()
+
+
+def _submitted_at(submission: Any) -> float:
+    return submission.submitted_at.timestamp() if submission.submitted_at else 0.0
+
+
+def preassessment_removed(student: PreAssessmentStudentSubmission) -> bool:
+    return bool(student.removal_status and student.removal_status[0] != "")
+
+
+def _replicated_removals(
+    students: list[PreAssessmentStudentSubmission],
 ) -> list[PreAssessmentStudentSubmission]:
-    formula = PreAssessmentStudentSubmission.course_id.eq(
-        class_id
-    ) & PreAssessmentStudentSubmission.status.eq("Processed")
-    submissions = await asyncio.to_thread(
-        PreAssessmentStudentSubmission.all, formula=formula
+    """The students with their removal status read from the replicated
+    association rows, rather than from the lookup on their submission.
+
+    Changes to the lookup only reach the replica with a full sync, while the
+    association rows are stored as soon as a removal is written.
+    """
+    if replica is None:
+        return students
+    rows_by_class = dict[str, list[UserClassAssociation] | None]()
+    result = list[PreAssessmentStudentSubmission]()
+    for student in students:
+        if not student.class_id or not student.student_id:
+            result.append(student)
+            continue
+        if student.class_id not in rows_by_class:
+            rows_by_class[student.class_id] = replica.select(
+                UserClassAssociation,
+                {UserClassAssociation.class_id.field_name: student.class_id},
+            )
+        rows = rows_by_class[student.class_id]
+        if rows is None:
+            result.append(student)
+            continue
+        record = student.to_record()
+        record["fields"][PreAssessmentStudentSubmission.removal_status.field_name] = [
+            row.removal_status
+            for row in rows
+            if row.removal_status and student.student_id in (row.student_id or [])
+        ]
+        result.append(PreAssessmentStudentSubmission.from_record(record))
+    return result
+
+
+def preassessment_roster(
+    class_id: str,
+    *,
+    sort: RosterSort = "name",
+    descending: bool = False,
+    removed: bool | None = None,
+) -> RosterQuery[PreAssessmentStudentSubmission]:
+    """Processed pre-assessment submissions for a class.
+
+    Pre-assessment submissions have no status, so sorting by status sorts
+    them by name.
+    """
+    Pre = PreAssessmentStudentSubmission
+    conditions: list[formulas.Formula] = [
+        Pre.course_id.eq(class_id),
+        Pre.status.eq("Processed"),
+    ]
+    keep = None
+    if removed is not None:
+        removal_status = formulas.Field(Pre.removal_status.field_name)
+        has_removal = formulas.GT(formulas.LEN(formulas.CONCATENATE(removal_status)), 0)
+        conditions.append(has_removal if removed else formulas.NOT(has_removal))
+
+        def keep(student: PreAssessmentStudentSubmission) -> bool:
+            return preassessment_removed(student) == removed
+
+    name_fields = [Pre.last_name.field_name, Pre.first_name.field_name]
+
+    def by_name(s: PreAssessmentStudentSubmission) -> tuple[str, str]:
+        return s.last_name or "", s.first_name or ""
+
+    if sort == "submission_date":
+        fields = [Pre.submitted_at.field_name, *name_fields]
+
+        def order(s: PreAssessmentStudentSubmission) -> Any:
+            return _submitted_at(s), *by_name(s)
+    else:
+        fields, order = name_fields, by_name
+
+    return RosterQuery(
+        Pre,
+        formulas.AND(*conditions),
+        {Pre.course_id.field_name: class_id, Pre.status.field_name: "Processed"},
+        keep,
+        [f"-{field}" if descending else field for field in fields],
+        order,
+        descending,
+    )
+
+
+def normalize_post_status(
+    submission: PostAssessmentStudentSubmission,
+) -> tuple[PostStatus, bool]:
+    raw_status = (submission.status or "").strip()
+    error_type = (submission.error_type or "").strip() if submission.error_type else ""
+    removed = raw_status == "Removed from Class"
+
+    match raw_status:
+        case "Complete":
+            return "OK", removed
+        case "Error":
+            match error_type:
+                case "OK":
+                    return "OK", removed
+                case "NRC":
+                    return "NRC", removed
+                case "PRE":
+                    return "PRE", removed
+                case _:
+                    return "PEND", removed
+    # Explicit return for static analyzers and future maintainers
+    return "PEND", removed
+
+
+def _post_status_formula(status: PostStatus) -> formulas.Formula:
+    """The formula equivalent of `normalize_post_status(...)[0] == status`."""
+    Post = PostAssessmentStudentSubmission
+    is_error = Post.status.eq("Error")
+    ok = formulas.OR(Post.status.eq("Complete"), is_error & Post.error_type.eq("OK"))
+    nrc = is_error & Post.error_type.eq("NRC")
+    pre = is_error & Post.error_type.eq("PRE")
+    match status:
+        case "OK":
+            return ok
+        case "NRC":
+            return nrc
+        case "PRE":
+            return pre
+    return formulas.NOT(formulas.OR(ok, nrc, pre))
+
+
+def postassessment_roster(
+    class_id: str,
+    *,
+    sort: RosterSort = "name",
+    descending: bool = False,
+    removed: bool | None = None,
+    statuses: list[PostStatus] | None = None,
+) -> RosterQuery[PostAssessmentStudentSubmission]:
+    """Post-assessment submissions for a class."""
+    Post = PostAssessmentStudentSubmission
+    conditions: list[formulas.Formula] = [Post.course_id.eq(class_id)]
+    if removed is not None:
+        is_removed = Post.status.eq("Removed from Class")
+        conditions.append(is_removed if removed else formulas.NOT(is_removed))
+    if statuses:
+        conditions.append(formulas.OR(*[_post_status_formula(s) for s in statuses]))
+
+    def keep(submission: PostAssessmentStudentSubmission) -> bool:
+        status, is_removed = normalize_post_status(submission)
+        return (removed is None or is_removed == removed) and (
+            not statuses or status in statuses
+        )
+
+    def by_name(s: PostAssessmentStudentSubmission) -> tuple[str, str]:
+        return s.name or "", s.email or ""
+
+    name_fields = [Post.name.field_name, Post.email.field_name]
+    groups: tuple[formulas.Formula, ...] = ()
+    match sort:
+        case "submission_date":
+            fields = [Post.submitted_at.field_name, *name_fields]
+
+            def order(s: PostAssessmentStudentSubmission) -> Any:
+                return _submitted_at(s), *by_name(s)
+        case "status":
+            # The statuses shown are derived from two fields, so Airtable
+            # can't sort by them. Each status is queried in turn instead.
+            fields = name_fields
+            groups = tuple(
+                _post_status_formula(status)
+                for status in sorted(set(statuses or POST_STATUSES), reverse=descending)
+            )
+
+            def order(s: PostAssessmentStudentSubmission) -> Any:
+                return normalize_post_status(s)[0], *by_name(s)
+        case _:
+            fields, order = name_fields, by_name
+
+    return RosterQuery(
+        Post,
+        formulas.AND(*conditions),
+        {Post.course_id.field_name: class_id},
+        keep,
+        [f"-{field}" if descending else field for field in fields],
+        order,
+        descending,
+        groups,
+    )
+
+
+def _replica_roster(query: RosterQuery[M]) -> list[M] | None:
+    if replica is None:
+        return None
+    records = replica.select(query.model, query.where)
+    if records is None:
+        return None
+    if query.model is PreAssessmentStudentSubmission:
+        records = _replicated_removals(records)  # type: ignore[arg-type,assignment]
+    return sorted(
+        (r for r in records if query.keep is None or query.keep(r)),
+        key=query.order,
+        reverse=query.descending,
     )
-    return submissions
+
+
+async def get_roster(query: RosterQuery[M]) -> list[M]:
+    """Every submission matching a roster query, in the query's order.
+
+    Sorted the same way as pages and streams of the same query.
+    """
+    records = list[M]()
+    async for page in iterate_roster(query):
+        records += page
+    return records
+
+
+def _group_formulas(query: RosterQuery) -> list[Any]:
+    """The formula of each group of the query, in order."""
+    if not query.groups:
+        return [query.formula]
+    return [formulas.AND(query.formula, group) for group in query.groups]
+
+
+async def iterate_roster(query: RosterQuery[M]) -> AsyncIterator[list[M]]:
+    """Yield pages of a roster query as they arrive, sorted by Airtable."""
+    records = _replica_roster(query)
+    if records is not None:
+        yield records
+        return
+    for formula in _group_formulas(query):
+        async for page in client.iterate(query.model, formula=formula, sort=query.sort):
+            yield page
+
+
+async def get_roster_page(
+    query: RosterQuery[M], limit: int, cursor: str | None = None
+) -> tuple[list[M], str | None]:
+    """Get up to `limit` submissions, continuing from `cursor`.
+
+    Returns the submissions and the cursor of the next page, if there is one.
+    Airtable does the filtering and sorting, and the cursor is the group of
+    the query being read and Airtable's offset token within it. Replica pages
+    use a plain position instead.
+
+    Raises:
+        ValueError: If the cursor is not valid.
+        RosterCursorExpiredException: If Airtable no longer knows the offset
+            in the cursor, and the listing has to start over.
+    """
+    records = _replica_roster(query)
+    if records is not None and (cursor is None or cursor.startswith("replica:")):
+        try:
+            start = int(cursor.removeprefix("replica:")) if cursor else 0
+        except ValueError:
+            raise ValueError("Invalid cursor.")
+        end = start + limit
+        return records[start:end], f"replica:{end}" if end < len(records) else None
+
+    group_formulas = _group_formulas(query)
+    group, offset = 0, None
+    if cursor is not None:
+        if not cursor.startswith("airtable:"):
+            raise ValueError("Invalid cursor.")
+        position, _, offset = cursor.removeprefix("airtable:").partition(":")
+        if not position.isdigit() or int(position) >= len(group_formulas):
+            raise ValueError("Invalid cursor.")
+        group = int(position)
+
+    # Fill the page from as many groups as it takes.
+    page = list[M]()
+    while True:
+        try:
+            raw, offset = await client.list_page(
+                query.model,
+                formula=group_formulas[group],
+                sort=query.sort,
+                page_size=limit - len(page),
+                offset=offset or None,
+            )
+        except AirtableError as e:
+            if e.error_type == "LIST_RECORDS_ITERATOR_NOT_AVAILABLE":
+                raise RosterCursorExpiredException(
+                    "The cursor has expired. Start again from the first page."
+                )
+            raise
+        page += [query.model.from_record(record) for record in raw]
+        if not offset:
+            group += 1
+            if group == len(group_formulas):
+                return page, None
+        if len(page) >= limit:
+            return page, f"airtable:{group}:{offset or ''}"
 
 
 async def get_preassessment_submission_by_response_id(
     submission_id: str,
 ) -> PreAssessmentStudentSubmission | None:
-    def _get():
-        return PreAssessmentStudentSubmission.first(
-            formula=PreAssessmentStudentSubmission.submission_id.eq(submission_id)
+    formula = PreAssessmentStudentSubmission.submission_id.eq(submission_id)
+    if replica is not None:
+        submissions = replica.select(
+            PreAssessmentStudentSubmission,
+            {PreAssessmentStudentSubmission.submission_id.field_name: submission_id},
         )
-
-    return await asyncio.to_thread(_get)
+        if submissions is not None:
+            return _replicated_removals(submissions)[0] if submissions else None
+    return await client.first(PreAssessmentStudentSubmission, formula=formula)
 
 
-async def get_postassessment_students_by_class_id(
-    class_id: str,
-) -> list[PostAssessmentStudentSubmission]:
-    formula = PostAssessmentStudentSubmission.course_id.eq(class_id)
-    submissions = await asyncio.to_thread(
-        PostAssessmentStudentSubmission.all, formula=formula
+async def get_preassessment_submissions_by_response_ids(
+    submission_ids: list[str],
+) -> list[PreAssessmentStudentSubmission]:
+    if replica is not None and replica.ready(PreAssessmentStudentSubmission):
+        submissions = list[PreAssessmentStudentSubmission]()
+        for submission_id in submission_ids:
+            submissions += (
+                replica.select(
+                    PreAssessmentStudentSubmission,
+                    {
+                        PreAssessmentStudentSubmission.submission_id.field_name: submission_id
+                    },
+                )
+                or []
+            )
+        return _replicated_removals(submissions)
+    if not submission_ids:
+        return []
+    formula = formulas.OR(
+        *[
+            PreAssessmentStudentSubmission.submission_id.eq(submission_id)
+            for submission_id in submission_ids
+        ]
     )
-    return submissions
+    return await client.all(PreAssessmentStudentSubmission, formula=formula)
 
 
-async def request_student_group_removal(student_id: str, class_id: str) -> int:
-    """Mark user/group associations for a student in a class as removal requested."""
+async def request_students_group_removal(
+    class_id: str, student_ids: list[str]
+) -> dict[str, str | None]:
+    """Mark user/group associations for students in a class as removal requested.
+
+    The rows are updated with batch writes. Returns, for each student ID, None
+    if all of their rows were updated or the error that prevented it.
+    """
+    if not student_ids:
+        return {}
+    formula = UserClassAssociation.class_id.eq(class_id) & formulas.OR(
+        *[UserClassAssociation.student_id.eq(student_id) for student_id in student_ids]
+    )
+    rows = await _all(
+        UserClassAssociation,
+        formula,
+        {UserClassAssociation.class_id.field_name: class_id},
+        keep=lambda row: any(s in student_ids for s in row.student_id or []),
+    )
+    result = await client.batch_update(
+        UserClassAssociation,
+        [
+            (
+                row.id,
+                {UserClassAssociation.removal_status.field_name: "Requested to Remove"},
+            )
+            for row in rows
+        ],
+    )
+    _stored(*result.updated)
+    await _refresh_submissions(class_id, student_ids)
+
+    errors = dict[str, str | None].fromkeys(student_ids)
+    for row in rows:
+        if row.id in result.failed:
+            for student_id in row.student_id or []:
+                if student_id in errors:
+                    errors[student_id] = result.failed[row.id]
+    return errors
+
+
+async def _refresh_submissions(class_id: str, student_ids: list[str]) -> None:
+    """Re-read the students' submissions into the replica after a removal.
+
+    Their removal status is a lookup of the association rows, which
+    incremental syncs don't pick up.
+    """
+    if replica is None:
+        return
+    formula = PreAssessmentStudentSubmission.class_id.eq(class_id) & formulas.OR(
+        *[
+            PreAssessmentStudentSubmission.student_id.eq(student_id)
+            for student_id in student_ids
+        ]
+    )
+    try:
+        submissions = await client.all(PreAssessmentStudentSubmission, formula=formula)
+    except ClientError:
+        # The replica still shows the removal through the association rows.
+        logger.warning("Couldn't refresh submissions after a removal.", exc_info=True)
+        return
+    _stored(*submissions)
 
-    def _update():
-        formula = UserClassAssociation.student_id.eq(
-            student_id
-        ) & UserClassAssociation.class_id.eq(class_id)
-        rows = UserClassAssociation.all(formula=formula)
-        for row in rows:
-            row.removal_status = "Requested to Remove"
-            row.save()
-        return len(rows)
 
-    return await asyncio.to_thread(_update)
+async def request_student_group_removal(student_id: str, class_id: str) -> None:
+    """Mark user/group associations for a student in a class as removal requested."""
+    errors = await request_students_group_removal(class_id, [student_id])
+    if errors[student_id]:
+        raise StudentRemovalException(
+            detail=errors[student_id] or "", student_id=student_id
+        )
 
 
 async def get_admin_by_id(admin_id: str) -> Admin | None:
-    admin = await asyncio.to_thread(Admin.from_id, admin_id)
+    admin = await _load(("admin", admin_id), lambda: _get(Admin, admin_id))
     return admin
 
 
 async def set_instructor_profile_notice_seen(instructor_id: str) -> None:
     """Mark the profile moved notice as seen for an instructor."""
-
-    def _update():
-        inst = Instructor.from_id(instructor_id)
-        inst.profile_notice_seen_sep_25 = True
-        inst.save()
-
-    await asyncio.to_thread(_update)
+    instructor = await client.update(
+        Instructor,
+        instructor_id,
+        {Instructor.profile_notice_seen_sep_25.field_name: True},
+    )
+    _stored(instructor)
+    invalidate_instructor(instructor_id)
 
 
 async def get_admin_by_email(email: str) -> Admin | None:
     email_to_match = email.lower().strip()
     formula = Admin.email.eq(email_to_match)
-    admin = await asyncio.to_thread(Admin.first, formula=formula)
+    admin = await client.first(Admin, formula=formula)
     return admin
@@ -0,0 +1,118 @@
+"""Conditional GET support for the study dashboard.
+
+The dashboard polls its GET endpoints, and most polls return exactly what the
+previous one did. Responses carry a strong ETag (a hash of the body) and a
+Last-Modified time, and the client gets a 304 when its copy matches.
+
+With the replica, each worker also remembers the last validator it handed out
+for a route, along with the replica's version of the tables the response was
+read from. A request matching a remembered validator gets a 304 straight away,
+without reading the data, as long as those tables haven't changed since. The
+versions live in the replica file, so a write handled by one worker, or a sync,
+is seen by all of them. Without the replica the data is always read, and only
+the body is spared.
+"""
+
+import hashlib
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Hashable, NamedTuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from pingpong.cache import TTLCache
+from pingpong.study.schemas import study_config
+
+
+class Validator(NamedTuple):
+    etag: str
+    # Unix time at which the body with this ETag was first served.
+    last_modified: float
+    # Version of the data the body was computed from, if it's known.
+    version: Hashable = None
+
+
+_validators = TTLCache[Hashable, Validator](
+    "study_http_validators", ttl=study_config.http_validator_ttl, maxsize=4096
+)
+
+
+def _cache_headers(validator: Validator, max_age: int) -> dict[str, str]:
+    return {
+        "ETag": validator.etag,
+        "Last-Modified": formatdate(validator.last_modified, usegmt=True),
+        "Cache-Control": f"private, max-age={max_age}",
+    }
+
+
+def _is_fresh(request: Request, validator: Validator) -> bool:
+    """Whether the client's copy matches the validator (RFC 9110, 13.1)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return validator.etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(validator.last_modified) <= since
+
+
+def not_modified(
+    request: Request, key: Hashable, max_age: int, version: Hashable
+) -> Response | None:
+    """Return a 304 if the client already has the current response for `key`.
+
+    Only answers when the response was computed from data at `version`, which
+    must be read before the data itself. A `version` of None never matches.
+    """
+    if version is None:
+        return None
+    validator = _validators.get(key)
+    if (
+        validator is None
+        or validator.version != version
+        or not _is_fresh(request, validator)
+    ):
+        return None
+    return Response(status_code=304, headers=_cache_headers(validator, max_age))
+
+
+def conditional_json(
+    request: Request,
+    content: Any,
+    max_age: int,
+    key: Hashable | None = None,
+    version: Hashable = None,
+) -> Response:
+    """Serialize `content` as JSON with cache validators.
+
+    Answers with a 304 if the body matches the client's copy. If `key` is
+    given, the validator is remembered with the data `version` the content was
+    read at, so `not_modified` can answer later requests for the same key
+    without reading the data again while it stays at that version.
+    """
+    response = JSONResponse(jsonable_encoder(content))
+    etag = f'"{hashlib.sha256(response.body).hexdigest()[:32]}"'
+
+    previous = _validators.get(key) if key is not None else None
+    if previous is not None and previous.etag == etag:
+        validator = previous._replace(version=version)
+    else:
+        validator = Validator(etag, time.time(), version)
+    if key is not None:
+        _validators.set(key, validator)
+
+    headers = _cache_headers(validator, max_age)
+    if _is_fresh(request, validator):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
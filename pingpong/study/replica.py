@@ -0,0 +1,256 @@
+"""Local SQLite replica of the study Airtable tables.
+
+Dashboard reads are served from a SQLite file instead of live Airtable queries.
+One worker per replica file keeps it fresh in the background by pulling records
+modified since the last sync, and periodically re-reads each table in full to
+pick up deletions and lookup fields (which don't bump LAST_MODIFIED_TIME).
+Tables whose lookups matter can be re-read more often than the others.
+Writes still go to Airtable first and are then stored in the replica.
+
+Each table has a version that goes up whenever a sync or a write changes its
+records. Every worker reading the file sees the same versions, so they can
+tell whether something derived from a table is still current. A table whose
+lookups or counts are computed from another table's records is bumped along
+with that table, since Airtable changes those fields without the replica
+seeing a change to the table's own records until its next full sync.
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import sqlite3
+import time
+from datetime import timedelta
+from typing import IO, Any, TypeVar
+
+from pyairtable.api.types import RecordDict
+from pyairtable.formulas import DATETIME_PARSE, IS_AFTER, LAST_MODIFIED_TIME
+from pyairtable.orm import Model
+
+from pingpong.airtable_client import AirtableClient
+from pingpong.now import utcnow
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=Model)
+
+# Overlap between incremental syncs, to absorb clock skew with Airtable.
+SYNC_OVERLAP = timedelta(minutes=5)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    tbl TEXT NOT NULL,
+    id TEXT NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (tbl, id)
+);
+CREATE TABLE IF NOT EXISTS syncs (
+    tbl TEXT PRIMARY KEY,
+    synced_at TEXT NOT NULL,
+    full_synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    tbl TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+# Stores a record unless the replica already has exactly that record, so the
+# connection's change count only counts records that actually changed.
+_UPSERT = """
+INSERT INTO records (tbl, id, record) VALUES (?, ?, ?)
+ON CONFLICT (tbl, id) DO UPDATE SET record = excluded.record
+WHERE record != excluded.record
+"""
+
+
+def _dump(record: RecordDict) -> str:
+    return json.dumps(record, sort_keys=True)
+
+
+class Replica:
+    """A SQLite copy of a set of Airtable tables."""
+
+    def __init__(
+        self,
+        path: str,
+        client: AirtableClient,
+        models: list[type[Model]],
+        sync_interval: float = 30,
+        full_sync_interval: float = 3600,
+        full_sync_intervals: dict[type[Model], float] | None = None,
+        dependents: dict[type[Model], list[type[Model]]] | None = None,
+    ):
+        self.path = path
+        self.client = client
+        self.models = models
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        # Per-table overrides of the full sync interval.
+        self.full_sync_intervals = full_sync_intervals or {}
+        # Tables with lookups or counts of each table's records, by table name.
+        self._dependents = {
+            model.meta.table_name: {dependent.meta.table_name for dependent in models}
+            for model, models in (dependents or {}).items()
+        }
+        self._db: sqlite3.Connection | None = None
+        self._lock_file: IO[str] | None = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def ready(self, model: type[Model]) -> bool:
+        """Whether the model's table has been fully synced at least once."""
+        row = self.db.execute(
+            "SELECT 1 FROM syncs WHERE tbl = ?", (model.meta.table_name,)
+        ).fetchone()
+        return row is not None
+
+    def get(self, model: type[M], record_id: str) -> M | None:
+        """Get a record by ID, or None if it (or the table) isn't replicated."""
+        if not self.ready(model):
+            return None
+        row = self.db.execute(
+            "SELECT record FROM records WHERE tbl = ? AND id = ?",
+            (model.meta.table_name, record_id),
+        ).fetchone()
+        return model.from_record(json.loads(row[0])) if row else None
+
+    def version(self, model: type[Model]) -> int | None:
+        """The table's version, or None if it isn't replicated yet."""
+        if not self.ready(model):
+            return None
+        row = self.db.execute(
+            "SELECT version FROM versions WHERE tbl = ?", (model.meta.table_name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _bump(self, tables: set[str]) -> None:
+        for table in list(tables):
+            tables |= self._dependents.get(table, set())
+        self.db.executemany(
+            "INSERT INTO versions (tbl, version) VALUES (?, 1) "
+            "ON CONFLICT (tbl) DO UPDATE SET version = version + 1",
+            [(table,) for table in tables],
+        )
+
+    def select(self, model: type[M], where: dict[str, Any]) -> list[M] | None:
+        """Get the records whose fields equal (or, for lists, contain) the values.
+
+        `where` is keyed by Airtable field name. Returns None if the table
+        hasn't been replicated yet, so the caller can fall back to Airtable.
+        """
+        if not self.ready(model):
+            return None
+        query = "SELECT record FROM records WHERE tbl = ?"
+        params: list[Any] = [model.meta.table_name]
+        for field_name, value in where.items():
+            # json_each yields the items of a list, or the value itself.
+            query += " AND EXISTS (SELECT 1 FROM json_each(record, ?) WHERE value = ?)"
+            params += [f'$.fields."{field_name}"', value]
+        return [
+            model.from_record(json.loads(row[0]))
+            for row in self.db.execute(query, params)
+        ]
+
+    def store(self, *instances: Model) -> None:
+        """Write records that were just saved to Airtable into the replica."""
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO records (tbl, id, record) VALUES (?, ?, ?)",
+                [
+                    (
+                        type(instance).meta.table_name,
+                        instance.id,
+                        _dump(instance.to_record()),
+                    )
+                    for instance in instances
+                ],
+            )
+            self._bump({type(instance).meta.table_name for instance in instances})
+
+    async def sync_table(self, model: type[Model], full: bool = False) -> int:
+        """Pull changed records (or every record, if `full`) from Airtable."""
+        table = model.meta.table_name
+        started = utcnow()
+        row = self.db.execute(
+            "SELECT synced_at, full_synced_at FROM syncs WHERE tbl = ?", (table,)
+        ).fetchone()
+        if row is None:
+            full = True
+
+        formula = None
+        if not full:
+            formula = IS_AFTER(LAST_MODIFIED_TIME(), DATETIME_PARSE(row[0]))
+        records = list[RecordDict]()
+        async for page in self.client.iterate_records(model, formula=formula):
+            records.extend(page)
+
+        with self.db:
+            changes = self.db.total_changes
+            self.db.executemany(
+                _UPSERT, [(table, record["id"], _dump(record)) for record in records]
+            )
+            if full:
+                self.db.execute(
+                    "DELETE FROM records WHERE tbl = ? "
+                    "AND id NOT IN (SELECT value FROM json_each(?))",
+                    (table, json.dumps([record["id"] for record in records])),
+                )
+            if self.db.total_changes != changes:
+                self._bump({table})
+            self.db.execute(
+                "INSERT OR REPLACE INTO syncs (tbl, synced_at, full_synced_at) VALUES (?, ?, ?)",
+                (
+                    table,
+                    (started - SYNC_OVERLAP).isoformat(),
+                    time.time() if full else row[1],
+                ),
+            )
+        return len(records)
+
+    async def sync(self) -> None:
+        """Bring every table up to date."""
+        for model in self.models:
+            row = self.db.execute(
+                "SELECT full_synced_at FROM syncs WHERE tbl = ?",
+                (model.meta.table_name,),
+            ).fetchone()
+            interval = self.full_sync_intervals.get(model, self.full_sync_interval)
+            full = row is None or time.time() - row[0] >= interval
+            count = await self.sync_table(model, full=full)
+            logger.debug(
+                "Replica synced %d %s records (%s).",
+                count,
+                model.__name__,
+                "full" if full else "incremental",
+            )
+
+    def _claim_sync(self) -> bool:
+        """Become the process that syncs this replica, if no other process is."""
+        if self._lock_file is not None:
+            return True
+        lock_file = open(f"{self.path}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def run(self) -> None:
+        """Keep the replica fresh until cancelled."""
+        while True:
+            try:
+                if self._claim_sync():
+                    await self.sync()
+            except Exception:
+                logger.exception("Error syncing the study replica.")
+            await asyncio.sleep(self.sync_interval)
@@ -2,7 +2,7 @@ from datetime import datetime
 from pyairtable.orm import Model, fields as F
 from typing import Literal, cast
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from pingpong.config import config, StudySettings
 
 # Ensure study config is available at import time for Airtable models
@@ -17,6 +17,19 @@ class UserNotFoundException(Exception):
         self.detail = detail
 
 
+class StudentRemovalException(Exception):
+    def __init__(self, detail: str = "", student_id: str = ""):
+        super().__init__(detail)
+        self.student_id = student_id
+        self.detail = detail
+
+
+class RosterCursorExpiredException(Exception):
+    def __init__(self, detail: str = ""):
+        super().__init__(detail)
+        self.detail = detail
+
+
 class Instructor(Model):
     """Airtable instructor model."""
 
@@ -131,6 +144,27 @@ class PreAssessmentStudentSubmissionsResponse(BaseModel):
 
     pre_assessment_submissions: list[PreAssessmentStudentSubmissionResponse]
     post_assessment_submissions: list[PostAssessmentStudentSubmissionResponse]
+    next_cursor: str | None = None
+
+
+class RemoveStudentsRequest(BaseModel):
+    """Request body for removing several students from a class."""
+
+    submission_ids: list[str] = Field(..., min_length=1, max_length=500)
+
+
+class RemoveStudentResult(BaseModel):
+    """Outcome of removing one student, by pre-assessment submission ID."""
+
+    submission_id: str
+    status: Literal["ok", "not_found", "error"]
+    detail: str | None = None
+
+
+class RemoveStudentsResponse(BaseModel):
+    """Response model for removing several students from a class."""
+
+    results: list[RemoveStudentResult]
 
 
 class UpdateEnrollmentRequest(BaseModel):
@@ -1,6 +1,9 @@
-from fastapi import Depends, FastAPI, HTTPException, Request
-from typing import Literal
-from fastapi.responses import RedirectResponse
+import asyncio
+import base64
+import json
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from typing import Any, AsyncIterator, Literal
+from fastapi.responses import RedirectResponse, StreamingResponse
 from urllib.parse import urlencode
 from jwt import PyJWTError
 import jwt
@@ -18,23 +21,43 @@ from pingpong.config import config
 from pingpong.session import get_now_fn
 from pingpong.study.schemas import (
     Course,
+    Instructor,
+    PostAssessmentStudentSubmission,
+    PreAssessmentStudentSubmission,
     PreAssessmentStudentSubmissionsResponse,
     PreAssessmentStudentSubmissionResponse,
     PostAssessmentStudentSubmissionResponse,
+    RemoveStudentResult,
+    RemoveStudentsRequest,
+    RemoveStudentsResponse,
+    RosterCursorExpiredException,
     UpdateEnrollmentRequest,
     UserNotFoundException,
 )
+from pingpong.study.conditional import conditional_json, not_modified
 from pingpong.study.airtable import (
     check_if_instructor_teaches_course_by_ids,
+    data_version,
     get_admin_by_email,
     get_admin_by_id,
     get_courses_by_instructor_id,
     get_instructor,
     get_instructor_by_email,
-    get_postassessment_students_by_class_id,
-    get_preassessment_students_by_class_id,
+    PostStatus,
+    RosterQuery,
+    RosterSort,
     get_preassessment_submission_by_response_id,
+    get_preassessment_submissions_by_response_ids,
+    get_roster,
+    get_roster_page,
+    iterate_roster,
+    normalize_post_status,
+    postassessment_roster,
+    preassessment_removed,
+    preassessment_roster,
+    request_scope,
     request_student_group_removal,
+    request_students_group_removal,
     update_course_enrollment_by_record_id,
     set_instructor_profile_notice_seen,
 )
@@ -43,6 +66,15 @@ from pingpong.time import convert_seconds
 
 EXCLUDED_COURSE_SESSIONS = ["Fall 2025"]
 
+# Seconds browsers may reuse each dashboard response without revalidating.
+# Responses the instructor acts on are always revalidated; that's all of them.
+ME_MAX_AGE = 0
+COURSES_MAX_AGE = 0
+ROSTER_MAX_AGE = 0
+
+# Roster pages a stream holds for a slow client before fetching stops.
+ROSTER_STREAM_BUFFER = 2
+
 if config.development:
     study = FastAPI()
 else:
@@ -117,8 +149,9 @@ async def populate_request(request):
 @study.middleware("http")
 async def parse_session_token(request: Request, call_next):
     """Parse the session token from the cookie and add it to the request state."""
-    request = await populate_request(request)
-    return await call_next(request)
+    with request_scope():
+        request = await populate_request(request)
+        return await call_next(request)
 
 
 @study.get(
@@ -126,7 +159,7 @@ async def parse_session_token(request: Request, call_next):
 )
 async def get_me(request: Request):
     """Get the session information."""
-    return request.state.session
+    return conditional_json(request, request.state.session, max_age=ME_MAX_AGE)
 
 
 @study.post(
@@ -443,6 +476,11 @@ def process_course(course: Course) -> schemas.StudyCourse:
 @study.get("/courses", dependencies=[Depends(LoggedIn())])
 async def get_courses(request: Request):
     """Get the courses for the current user."""
+    cache_key = ("courses", request.state.session.token.sub)
+    version = data_version(Course, Instructor)
+    if response := not_modified(request, cache_key, COURSES_MAX_AGE, version):
+        return response
+
     instructor = await get_instructor(request.state.session.token.sub)
     if not instructor:
         raise HTTPException(
@@ -453,7 +491,115 @@ async def get_courses(request: Request):
     courses = await get_courses_by_instructor_id(
         instructor.record_id, exclude_sessions=EXCLUDED_COURSE_SESSIONS
     )
-    return {"courses": [process_course(course) for course in courses]}
+    return conditional_json(
+        request,
+        {"courses": [process_course(course) for course in courses]},
+        max_age=COURSES_MAX_AGE,
+        key=cache_key,
+        version=version,
+    )
+
+
+def process_pre_submission(
+    student: PreAssessmentStudentSubmission,
+) -> PreAssessmentStudentSubmissionResponse:
+    return PreAssessmentStudentSubmissionResponse(
+        id=student.submission_id,
+        first_name=student.first_name,
+        last_name=student.last_name,
+        email=student.email,
+        submission_date=student.submitted_at or "",
+        student_id=student.student_id,
+        class_id=student.class_id,
+        removed=preassessment_removed(student),
+    )
+
+
+def process_post_submission(
+    submission: PostAssessmentStudentSubmission, class_id: str
+) -> PostAssessmentStudentSubmissionResponse:
+    normalized_status, removed = normalize_post_status(submission)
+    return PostAssessmentStudentSubmissionResponse(
+        id=submission.submission_id,
+        name=submission.name or "",
+        email=submission.email or "",
+        submission_date=submission.submitted_at or "",
+        student_id=submission.student_id,
+        class_id=class_id,
+        status=normalized_status,
+        removed=removed,
+    )
+
+
+async def stream_roster(
+    class_id: str,
+    pre_query: RosterQuery[PreAssessmentStudentSubmission],
+    post_query: RosterQuery[PostAssessmentStudentSubmission],
+) -> AsyncIterator[str]:
+    """Stream a class roster as NDJSON while the pages arrive from Airtable.
+
+    The pre- and post-assessment queries run concurrently, and wait for the
+    client once a few pages are buffered. Each line is an object with a single
+    `pre_assessment_submission` or `post_assessment_submission` key.
+    """
+    queue = asyncio.Queue[tuple[str, list[Any] | BaseException | None]](
+        maxsize=ROSTER_STREAM_BUFFER
+    )
+
+    async def drain(kind: str, pages: AsyncIterator[list[Any]]) -> None:
+        try:
+            async for page in pages:
+                await queue.put((kind, page))
+        except Exception as e:
+            await queue.put((kind, e))
+        else:
+            await queue.put((kind, None))
+
+    tasks = [
+        asyncio.create_task(
+            drain("pre_assessment_submission", iterate_roster(pre_query))
+        ),
+        asyncio.create_task(
+            drain("post_assessment_submission", iterate_roster(post_query))
+        ),
+    ]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            kind, page = await queue.get()
+            if page is None:
+                remaining -= 1
+                continue
+            if isinstance(page, BaseException):
+                raise page
+            for submission in page:
+                if kind == "pre_assessment_submission":
+                    line = process_pre_submission(submission).model_dump_json()
+                else:
+                    line = process_post_submission(
+                        submission, class_id
+                    ).model_dump_json()
+                yield f'{{"{kind}":{line}}}\n'
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def encode_roster_cursor(positions: dict[str, str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(positions).encode()).decode()
+
+
+def decode_roster_cursor(cursor: str) -> dict[str, str]:
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        positions = None
+    if not isinstance(positions, dict) or not all(
+        isinstance(key, str) and isinstance(position, str)
+        for key, position in positions.items()
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return positions
 
 
 @study.get(
@@ -461,8 +607,30 @@ async def get_courses(request: Request):
     dependencies=[Depends(LoggedIn())],
     response_model=PreAssessmentStudentSubmissionsResponse,
 )
-async def get_preassessment_students(class_id: str, request: Request):
-    """Get the pre-assessment students for a specific class."""
+async def get_preassessment_students(
+    class_id: str,
+    request: Request,
+    format: Literal["json", "ndjson"] = "json",
+    limit: int | None = Query(None, ge=1, le=100),
+    cursor: str | None = None,
+    sort: RosterSort = "name",
+    order: Literal["asc", "desc"] = "asc",
+    removed: bool | None = None,
+    status: list[PostStatus] | None = Query(None),
+):
+    """Get the pre-assessment students for a specific class.
+
+    Both lists are sorted by `sort` and can be filtered by `removed`; the
+    post-assessment list can also be filtered by `status`. Filtering and
+    sorting happen in Airtable.
+
+    With `limit`, at most that many students of each list are returned, along
+    with a `next_cursor` to pass back (with the same filters) for the next
+    page. A list that has run out comes back empty on later pages.
+
+    With `format=ndjson` the students are streamed one per line, in order
+    within each list, as soon as Airtable returns them.
+    """
     instructor = await get_instructor(request.state.session.token.sub)
     if not instructor:
         raise HTTPException(
@@ -478,77 +646,76 @@ async def get_preassessment_students(class_id: str, request: Request):
             detail="You do not have permission to view this class's pre-assessment students.",
         )
 
-    pre_students = await get_preassessment_students_by_class_id(class_id)
-    post_students = await get_postassessment_students_by_class_id(class_id)
+    descending = order == "desc"
+    pre_query = preassessment_roster(
+        class_id, sort=sort, descending=descending, removed=removed
+    )
+    post_query = postassessment_roster(
+        class_id, sort=sort, descending=descending, removed=removed, statuses=status
+    )
 
-    def normalize_post_status(
-        submission,
-    ) -> tuple[Literal["OK", "PEND", "NRC", "PRE"], bool]:
-        raw_status = (submission.status or "").strip()
-        error_type = (
-            (submission.error_type or "").strip() if submission.error_type else ""
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_roster(class_id, pre_query, post_query),
+            media_type="application/x-ndjson",
         )
-        removed = raw_status == "Removed from Class"
-
-        match raw_status:
-            case "Complete":
-                return "OK", removed
-            case "Error":
-                match error_type:
-                    case "OK":
-                        return "OK", removed
-                    case "NRC":
-                        return "NRC", removed
-                    case "PRE":
-                        return "PRE", removed
-                    case _:
-                        return "PEND", removed
-        # Explicit return for static analyzers and future maintainers
-        return "PEND", removed
-
-    pre_responses = [
-        PreAssessmentStudentSubmissionResponse(
-            id=student.submission_id,
-            first_name=student.first_name,
-            last_name=student.last_name,
-            email=student.email,
-            submission_date=student.submitted_at or "",
-            student_id=student.student_id,
-            class_id=student.class_id,
-            removed=bool(student.removal_status and student.removal_status[0] != ""),
+
+    cache_key = ("roster", class_id, tuple(sorted(request.query_params.multi_items())))
+    version = data_version(
+        PreAssessmentStudentSubmission, PostAssessmentStudentSubmission
+    )
+    if response := not_modified(request, cache_key, ROSTER_MAX_AGE, version):
+        return response
+
+    next_cursor = None
+    if limit is None and cursor is None:
+        pre_students, post_students = await asyncio.gather(
+            get_roster(pre_query), get_roster(post_query)
         )
-        for student in sorted(
-            pre_students,
-            key=lambda s: (
-                (s.last_name or "").lower(),
-                (s.first_name or "").lower(),
-            ),
+    else:
+        page_size = limit or 100
+        positions = (
+            decode_roster_cursor(cursor) if cursor else {"pre": None, "post": None}
         )
-    ]
 
-    post_responses: list[PostAssessmentStudentSubmissionResponse] = []
-    for submission in sorted(
-        post_students,
-        key=lambda s: (s.name or s.email or "").lower(),
-    ):
-        normalized_status, removed = normalize_post_status(submission)
-        post_responses.append(
-            PostAssessmentStudentSubmissionResponse(
-                id=submission.submission_id,
-                name=submission.name or "",
-                email=submission.email or "",
-                submission_date=submission.submitted_at or "",
-                student_id=submission.student_id,
-                class_id=class_id,
-                status=normalized_status,
-                removed=removed,
-            )
-        )
+        async def page(key: str, query: RosterQuery) -> tuple[list, str | None]:
+            if key not in positions:
+                return [], None
+            return await get_roster_page(query, page_size, positions[key])
 
-    return {
-        "pre_assessment_submissions": pre_responses,
-        "post_assessment_submissions": post_responses,
-    }
+        try:
+            (pre_students, pre_next), (post_students, post_next) = await asyncio.gather(
+                page("pre", pre_query), page("post", post_query)
+            )
+        except RosterCursorExpiredException as e:
+            raise HTTPException(status_code=410, detail=e.detail)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        next_positions = {
+            key: position
+            for key, position in (("pre", pre_next), ("post", post_next))
+            if position
+        }
+        if next_positions:
+            next_cursor = encode_roster_cursor(next_positions)
+
+    return conditional_json(
+        request,
+        PreAssessmentStudentSubmissionsResponse(
+            pre_assessment_submissions=[
+                process_pre_submission(student) for student in pre_students
+            ],
+            post_assessment_submissions=[
+                process_post_submission(submission, class_id)
+                for submission in post_students
+            ],
+            next_cursor=next_cursor,
+        ),
+        max_age=ROSTER_MAX_AGE,
+        key=cache_key,
+        version=version,
+    )
 
 
 @study.patch(
@@ -641,3 +808,72 @@ async def delete_preassessment_student_submission(
         raise HTTPException(status_code=500, detail=str(e))
 
     return {"status": "ok"}
+
+
+@study.post(
+    "/preassessment/{class_id}/students/remove",
+    dependencies=[Depends(LoggedIn())],
+    response_model=RemoveStudentsResponse,
+)
+async def remove_preassessment_students(
+    class_id: str, body: RemoveStudentsRequest, request: Request
+):
+    """Request removal for several students and their PingPong group associations."""
+
+    instructor = await get_instructor(request.state.session.token.sub)
+    if not instructor:
+        raise HTTPException(
+            status_code=404,
+            detail="We couldn't find you in the study database. Please contact the study administrator.",
+        )
+
+    teaches = await check_if_instructor_teaches_course_by_ids(
+        instructor.record_id, class_id, exclude_sessions=EXCLUDED_COURSE_SESSIONS
+    )
+    if not teaches:
+        raise HTTPException(
+            status_code=403,
+            detail="You do not have permission to update this course.",
+        )
+
+    submission_ids = list(dict.fromkeys(body.submission_ids))
+    submissions = await get_preassessment_submissions_by_response_ids(submission_ids)
+    student_ids = {
+        submission.submission_id: submission.student_id
+        for submission in submissions
+        if submission.student_id and submission.class_id == class_id
+    }
+
+    errors = dict[str, str | None]()
+    if student_ids:
+        try:
+            errors = await request_students_group_removal(
+                class_id, list(set(student_ids.values()))
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    results = list[RemoveStudentResult]()
+    for submission_id in submission_ids:
+        student_id = student_ids.get(submission_id)
+        if not student_id:
+            results.append(
+                RemoveStudentResult(
+                    submission_id=submission_id,
+                    status="not_found",
+                    detail="Student not found.",
+                )
+            )
+        elif errors.get(student_id):
+            results.append(
+                RemoveStudentResult(
+                    submission_id=submission_id,
+                    status="error",
+                    detail=errors[student_id],
+                )
+            )
+        else:
+            results.append(
+                RemoveStudentResult(submission_id=submission_id, status="ok")
+            )
+    return {"results": results}
@@ -0,0 +1,311 @@
+import pytest
+from pyairtable import formulas
+from pyairtable.formulas import to_formula_str
+
+import pingpong.study.airtable as study_airtable
+from pingpong.airtable_client import AirtableError, BatchUpdateResult
+from pingpong.study.airtable import POST_STATUSES
+from pingpong.study.replica import Replica
+from pingpong.study.schemas import (
+    Course,
+    PostAssessmentStudentSubmission,
+    PreAssessmentStudentSubmission,
+    RosterCursorExpiredException,
+    StudentRemovalException,
+    UserClassAssociation,
+)
+from pingpong.study.test_replica import FakeClient, course
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    replica = Replica(str(tmp_path / "replica.sqlite3"), FakeClient(), [Course])
+    monkeypatch.setattr(study_airtable, "replica", replica)
+    study_airtable._course_ids_cache.clear()
+    return replica
+
+
+async def test_course_index_follows_replica_changes(replica):
+    replica.client.records = [course("rec1", "inst1")]
+    await replica.sync_table(Course, full=True)
+    check = study_airtable.check_if_instructor_teaches_course_by_ids
+
+    assert await check("inst1", "rec1")
+    assert not await check("inst1", "rec2")
+
+    # Another worker's sync reassigns the course.
+    replica.client.records = [course("rec1", "inst2"), course("rec2", "inst1")]
+    await replica.sync_table(Course)
+
+    assert not await check("inst1", "rec1")
+    assert await check("inst1", "rec2")
+    assert await check("inst2", "rec1")
+
+
+async def test_course_index_answers_from_the_cache(replica, monkeypatch):
+    replica.client.records = [course("rec1", "inst1")]
+    await replica.sync_table(Course, full=True)
+    check = study_airtable.check_if_instructor_teaches_course_by_ids
+    assert await check("inst1", "rec1")
+
+    async def no_query(*args, **kwargs):
+        raise AssertionError("The course index should have been used.")
+
+    monkeypatch.setattr(study_airtable, "_all", no_query)
+    assert await check("inst1", "rec1")
+    assert not await check("inst1", "rec2")
+
+
+def association(record_id: str, student_id: str, class_id: str = "class"):
+    return {
+        "id": record_id,
+        "createdTime": "2025-01-01T00:00:00.000Z",
+        "fields": {
+            "ID": record_id,
+            "Student ID": [student_id],
+            "Airtable Class ID": [class_id],
+        },
+    }
+
+
+async def test_removing_no_students_makes_no_requests(monkeypatch):
+    async def no_request(*args, **kwargs):
+        raise AssertionError("Nothing should be sent to Airtable.")
+
+    monkeypatch.setattr(study_airtable.client, "request", no_request)
+    assert await study_airtable.request_students_group_removal("class", []) == {}
+    assert await study_airtable.get_preassessment_submissions_by_response_ids([]) == []
+
+
+async def test_removal_errors_are_reported_per_student(tmp_path, monkeypatch):
+    replica = Replica(
+        str(tmp_path / "replica.sqlite3"),
+        FakeClient(
+            association("rec1", "stu1"),
+            association("rec2", "stu2"),
+            association("rec3", "stu3", class_id="another class"),
+        ),
+        [UserClassAssociation],
+    )
+    await replica.sync_table(UserClassAssociation, full=True)
+    monkeypatch.setattr(study_airtable, "replica", replica)
+
+    sent = list[str]()
+
+    async def batch_update(model, updates):
+        sent.extend(record_id for record_id, _ in updates)
+        return BatchUpdateResult(
+            [
+                model.from_record(association(record_id, "stu1"))
+                for record_id, _ in updates
+                if record_id != "rec2"
+            ],
+            {"rec2": "Denied"} if any(r == "rec2" for r, _ in updates) else {},
+        )
+
+    refreshed = list[str]()
+
+    async def refresh(model, formula=None):
+        refreshed.append(to_formula_str(formula))
+        return []
+
+    monkeypatch.setattr(study_airtable.client, "batch_update", batch_update)
+    monkeypatch.setattr(study_airtable.client, "all", refresh)
+    errors = await study_airtable.request_students_group_removal(
+        "class", ["stu1", "stu2"]
+    )
+    assert errors == {"stu1": None, "stu2": "Denied"}
+    assert sent == ["rec1", "rec2"]
+    # The submissions' removal lookups are re-read into the replica.
+    assert "stu1" in refreshed[0] and "stu2" in refreshed[0]
+
+    with pytest.raises(StudentRemovalException, match="Denied"):
+        await study_airtable.request_student_group_removal("stu2", "class")
+
+
+def post_submission(n: int, name: str, status: str, error_type: str | None = None):
+    return {
+        "id": f"rec{n:02}",
+        "createdTime": "2025-01-01T00:00:00.000Z",
+        "fields": {
+            "Response ID": f"R_{n}",
+            "Name": name,
+            "Email": f"{name.lower()}@example.edu",
+            "Status": status,
+            **({"Type": error_type} if error_type else {}),
+        },
+    }
+
+
+POST_SUBMISSIONS = [
+    post_submission(1, "Zed", "Complete"),
+    post_submission(2, "Amy", "Error", "NRC"),
+    post_submission(3, "Bob", "Error", "OK"),
+    post_submission(4, "Cat", "Pending"),
+    post_submission(5, "Dan", "Error", "PRE"),
+    post_submission(6, "Eve", "Error", "Unknown"),
+    post_submission(7, "Fay", "Complete"),
+    post_submission(8, "Gus", "Error", "NRC"),
+]
+
+
+def fake_airtable(query, records):
+    """A list endpoint that understands the formulas of one roster query."""
+    Post = PostAssessmentStudentSubmission
+    matching = {to_formula_str(query.formula): records}
+    for status in POST_STATUSES:
+        group = formulas.AND(query.formula, study_airtable._post_status_formula(status))
+        matching[to_formula_str(group)] = [
+            record
+            for record in records
+            if study_airtable.normalize_post_status(Post.from_record(record))[0]
+            == status
+        ]
+
+    async def list_page(model, *, formula=None, sort=None, page_size=100, **kwargs):
+        # Airtable compares values as they are, with empty values first.
+        rows = sorted(
+            matching[to_formula_str(formula)],
+            key=lambda record: tuple(
+                record["fields"].get(field.lstrip("-"), "") for field in sort or []
+            ),
+            reverse=bool(sort) and sort[0].startswith("-"),
+        )
+        start = int(kwargs.get("offset") or 0)
+        end = start + page_size
+        return rows[start:end], str(end) if end < len(rows) else None
+
+    return list_page
+
+
+@pytest.mark.parametrize("descending", [False, True])
+async def test_status_pages_follow_the_unpaginated_order(monkeypatch, descending):
+    monkeypatch.setattr(study_airtable, "replica", None)
+    query = study_airtable.postassessment_roster(
+        "class", sort="status", descending=descending
+    )
+    monkeypatch.setattr(
+        study_airtable.client, "list_page", fake_airtable(query, POST_SUBMISSIONS)
+    )
+
+    expected = [s.name for s in await study_airtable.get_roster(query)]
+    # NRC, OK, PEND, PRE, each by name.
+    ascending = ["Amy", "Gus", "Bob", "Fay", "Zed", "Cat", "Eve", "Dan"]
+    assert expected == (ascending[::-1] if descending else ascending)
+
+    streamed = [
+        s.name async for page in study_airtable.iterate_roster(query) for s in page
+    ]
+    assert streamed == expected
+
+    paged, cursor = list[str](), None
+    while True:
+        page, cursor = await study_airtable.get_roster_page(query, 3, cursor)
+        assert len(page) == 3 or cursor is None
+        paged += [s.name for s in page]
+        if cursor is None:
+            break
+    assert paged == expected
+
+
+@pytest.mark.parametrize("descending", [False, True])
+async def test_replica_and_airtable_sort_rosters_the_same(
+    tmp_path, monkeypatch, descending
+):
+    records = [
+        post_submission(1, "bob", "Complete"),
+        post_submission(2, "Bob", "Complete"),
+        post_submission(3, "", "Complete"),
+        post_submission(4, "Amy", "Complete"),
+        post_submission(5, "amy", "Complete"),
+    ]
+    records[2]["fields"]["Email"] = "zz@example.edu"
+    query = study_airtable.postassessment_roster("class", descending=descending)
+
+    monkeypatch.setattr(study_airtable, "replica", None)
+    monkeypatch.setattr(
+        study_airtable.client, "list_page", fake_airtable(query, records)
+    )
+    from_airtable = [s.id for s in await study_airtable.get_roster(query)]
+
+    replica = Replica(
+        str(tmp_path / "replica.sqlite3"),
+        FakeClient(*records),
+        [PostAssessmentStudentSubmission],
+    )
+    await replica.sync_table(PostAssessmentStudentSubmission, full=True)
+    monkeypatch.setattr(study_airtable, "replica", replica)
+    from_replica = [
+        s.id
+        for s in sorted(
+            replica.select(PostAssessmentStudentSubmission, {}) or [],
+            key=query.order,
+            reverse=descending,
+        )
+    ]
+    assert from_replica == from_airtable
+
+
+async def test_expired_roster_cursors_ask_for_a_restart(monkeypatch):
+    monkeypatch.setattr(study_airtable, "replica", None)
+    query = study_airtable.postassessment_roster("class")
+
+    async def list_page(model, **kwargs):
+        raise AirtableError(
+            None, (), status=422, error_type="LIST_RECORDS_ITERATOR_NOT_AVAILABLE"
+        )
+
+    monkeypatch.setattr(study_airtable.client, "list_page", list_page)
+    with pytest.raises(RosterCursorExpiredException):
+        await study_airtable.get_roster_page(query, 3, "airtable:0:itrOld/rec1")
+
+
+async def test_invalid_roster_cursors_are_rejected(monkeypatch):
+    monkeypatch.setattr(study_airtable, "replica", None)
+    query = study_airtable.postassessment_roster("class", sort="status")
+    for cursor in ["nonsense", "airtable:9:", "airtable:x:abc"]:
+        with pytest.raises(ValueError):
+            await study_airtable.get_roster_page(query, 3, cursor)
+
+
+def pre_submission(n: int, student_id: str, removal: list[str] | None = None):
+    return {
+        "id": f"recPre{n}",
+        "createdTime": "2025-01-01T00:00:00.000Z",
+        "fields": {
+            "Response ID": f"R_{n}",
+            "Automation Status": "Processed",
+            "Last Name": f"Student {n}",
+            "Academic Email": f"s{n}@example.com",
+            "Completed At (ET)": "2025-01-01T00:00:00.000Z",
+            "Class": ["class"],
+            "Student ID": student_id,
+            "Class ID": "class",
+            "Exclude Status": removal or [],
+        },
+    }
+
+
+async def test_replica_rosters_read_removals_from_the_associations(
+    tmp_path, monkeypatch
+):
+    replica = Replica(
+        str(tmp_path / "replica.sqlite3"),
+        FakeClient(),
+        [PreAssessmentStudentSubmission, UserClassAssociation],
+    )
+    replica.client.records = [pre_submission(1, "stu1"), pre_submission(2, "stu2")]
+    await replica.sync_table(PreAssessmentStudentSubmission, full=True)
+    replica.client.records = [association("rec1", "stu1"), association("rec2", "stu2")]
+    await replica.sync_table(UserClassAssociation, full=True)
+    monkeypatch.setattr(study_airtable, "replica", replica)
+
+    # A removal was just written; the submissions' lookup is still stale.
+    row = UserClassAssociation.from_record(association("rec2", "stu2"))
+    row.removal_status = "Requested to Remove"
+    replica.store(row)
+
+    query = study_airtable.preassessment_roster("class", removed=True)
+    removed = await study_airtable.get_roster(query)
+    assert [s.student_id for s in removed] == ["stu2"]
+    assert study_airtable.preassessment_removed(removed[0])
@@ -0,0 +1,61 @@
+import pytest
+from fastapi import Request
+
+from pingpong.study import conditional
+
+
+@pytest.fixture(autouse=True)
+def validators():
+    conditional._validators.clear()
+
+
+def request(**headers: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+
+
+def test_matching_etag_gets_a_304():
+    response = conditional.conditional_json(request(), {"a": 1}, max_age=0)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "private, max-age=0"
+
+    again = conditional.conditional_json(
+        request(**{"If-None-Match": etag}), {"a": 1}, max_age=0
+    )
+    assert again.status_code == 304
+    changed = conditional.conditional_json(
+        request(**{"If-None-Match": etag}), {"a": 2}, max_age=0
+    )
+    assert changed.status_code == 200
+
+
+def test_validators_only_answer_at_the_same_data_version():
+    key = ("roster", "class")
+    etag = conditional.conditional_json(
+        request(), {"a": 1}, max_age=0, key=key, version=(1, 1)
+    ).headers["ETag"]
+    polled = request(**{"If-None-Match": etag})
+
+    response = conditional.not_modified(polled, key, 0, (1, 1))
+    assert response is not None and response.status_code == 304
+    # A write or sync seen through the replica moves the version on.
+    assert conditional.not_modified(polled, key, 0, (1, 2)) is None
+    # Without the replica, the data is always read.
+    assert conditional.not_modified(polled, key, 0, None) is None
+
+
+def test_last_modified_survives_an_unchanged_body():
+    key = ("courses", "inst1")
+    first = conditional.conditional_json(request(), [1], 0, key=key, version=(1,))
+    second = conditional.conditional_json(request(), [1], 0, key=key, version=(2,))
+    assert second.headers["Last-Modified"] == first.headers["Last-Modified"]
+    assert conditional.not_modified(
+        request(**{"If-None-Match": first.headers["ETag"]}), key, 0, (2,)
+    )
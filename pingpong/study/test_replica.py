@@ -0,0 +1,117 @@
+from typing import Any
+
+import pytest
+
+from pingpong.study.replica import Replica
+from pingpong.study.schemas import Course, Instructor
+
+
+def course(record_id: str, instructor: str, name: str = "Course") -> dict[str, Any]:
+    return {
+        "id": record_id,
+        "createdTime": "2025-01-01T00:00:00.000Z",
+        "fields": {"ID": record_id, "Name": name, "Instructor": [instructor]},
+    }
+
+
+class FakeClient:
+    """Returns the same records for every sync."""
+
+    def __init__(self, *records: dict[str, Any]):
+        self.records = list(records)
+
+    async def iterate_records(self, model, formula=None):
+        yield list(self.records)
+
+
+@pytest.fixture
+def replica(tmp_path):
+    return Replica(str(tmp_path / "replica.sqlite3"), FakeClient(), [Course])
+
+
+async def test_version_only_changes_with_the_records(replica):
+    assert replica.version(Course) is None
+
+    replica.client.records = [course("rec1", "inst1")]
+    await replica.sync_table(Course, full=True)
+    first = replica.version(Course)
+    assert first is not None
+
+    await replica.sync_table(Course)
+    await replica.sync_table(Course, full=True)
+    assert replica.version(Course) == first
+
+    replica.client.records = [course("rec1", "inst1", name="Renamed")]
+    await replica.sync_table(Course)
+    assert replica.version(Course) == first + 1
+
+
+async def test_full_sync_drops_deleted_records(replica):
+    replica.client.records = [course("rec1", "inst1"), course("rec2", "inst1")]
+    await replica.sync_table(Course, full=True)
+    version = replica.version(Course)
+
+    replica.client.records = [course("rec1", "inst1")]
+    await replica.sync_table(Course, full=True)
+    assert [c.id for c in replica.select(Course, {"Instructor": "inst1"})] == ["rec1"]
+    assert replica.version(Course) == version + 1
+
+
+async def test_writes_bump_only_their_table(replica):
+    replica.client.records = [course("rec1", "inst1")]
+    await replica.sync_table(Course, full=True)
+    await replica.sync_table(Instructor, full=True)
+    versions = replica.version(Course), replica.version(Instructor)
+
+    record = replica.get(Course, "rec1")
+    record.name = "Written"
+    replica.store(record)
+    assert replica.version(Course) == versions[0] + 1
+    assert replica.version(Instructor) == versions[1]
+
+
+async def test_tables_can_be_fully_synced_more_often(tmp_path):
+    full_syncs = list[str]()
+
+    class RecordingClient(FakeClient):
+        async def iterate_records(self, model, formula=None):
+            if formula is None:
+                full_syncs.append(model.__name__)
+            yield []
+
+    replica = Replica(
+        str(tmp_path / "replica.sqlite3"),
+        RecordingClient(),
+        [Course, Instructor],
+        full_sync_interval=3600,
+        full_sync_intervals={Course: 0},
+    )
+    await replica.sync()
+    await replica.sync()
+    assert full_syncs == ["Course", "Instructor", "Course"]
+
+
+async def test_writes_bump_the_tables_that_look_them_up(tmp_path):
+    replica = Replica(
+        str(tmp_path / "replica.sqlite3"),
+        FakeClient(course("rec1", "inst1")),
+        [Course, Instructor],
+        dependents={Instructor: [Course]},
+    )
+    await replica.sync()
+    versions = replica.version(Course), replica.version(Instructor)
+
+    replica.store(replica.get(Course, "rec1"))
+    assert replica.version(Course) == versions[0] + 1
+    assert replica.version(Instructor) == versions[1]
+
+    instructor = Instructor.from_record(
+        {
+            "id": "inst1",
+            "createdTime": "2025-01-01T00:00:00.000Z",
+            "fields": {"ID": "inst1"},
+        }
+    )
+    replica.store(instructor)
+    assert replica.version(Course) == versions[0] + 2
+    assert replica.version(Instructor) == versions[1] + 1
@@ -0,0 +1,100 @@
+import asyncio
+import base64
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import pingpong.study.server as server
+from pingpong.study.schemas import (
+    PreAssessmentStudentSubmission,
+    RemoveStudentsRequest,
+)
+
+
+def student(
+    n: int, class_id: str = "class", **fields
+) -> PreAssessmentStudentSubmission:
+    return PreAssessmentStudentSubmission.from_record(
+        {
+            "id": f"rec{n}",
+            "createdTime": "2025-01-01T00:00:00.000Z",
+            "fields": {
+                "Response ID": f"R_{n}",
+                "First Name": "Ada",
+                "Last Name": f"Student {n}",
+                "Academic Email": f"student{n}@example.edu",
+                "Completed At (ET)": "2025-01-01T12:00:00.000Z",
+                "Automation Status": "Processed",
+                "Student ID": f"stu{n}",
+                "Class ID": class_id,
+                **fields,
+            },
+        }
+    )
+
+
+async def test_stream_roster_waits_for_a_slow_client(monkeypatch):
+    fetched = {"pre": 0, "post": 0}
+
+    async def iterate_roster(query):
+        for n in range(50 if query == "pre" else 0):
+            fetched[query] += 1
+            yield [student(n)]
+
+    monkeypatch.setattr(server, "iterate_roster", iterate_roster)
+    lines = server.stream_roster("class", "pre", "post")
+
+    assert '"R_0"' in await anext(lines)
+    await asyncio.sleep(0.05)
+    # The page being sent, the buffered pages, and one waiting to be buffered.
+    assert fetched["pre"] <= server.ROSTER_STREAM_BUFFER + 2
+
+    rest = [line async for line in lines]
+    assert len(rest) == 49
+    assert fetched["pre"] == 50
+
+
+def instructor_request(instructor_id: str = "inst1"):
+    token = SimpleNamespace(sub=instructor_id)
+    return SimpleNamespace(state=SimpleNamespace(session=SimpleNamespace(token=token)))
+
+
+async def test_remove_students_none_of_which_are_in_the_class(monkeypatch):
+    async def get_instructor(user_id):
+        return SimpleNamespace(record_id=user_id)
+
+    async def teaches(*args, **kwargs):
+        return True
+
+    async def submissions(submission_ids):
+        return [student(1, class_id="another class")]
+
+    monkeypatch.setattr(server, "get_instructor", get_instructor)
+    monkeypatch.setattr(server, "check_if_instructor_teaches_course_by_ids", teaches)
+    monkeypatch.setattr(
+        server, "get_preassessment_submissions_by_response_ids", submissions
+    )
+
+    response = await server.remove_preassessment_students(
+        "class",
+        RemoveStudentsRequest(submission_ids=["R_1", "R_2"]),
+        instructor_request(),
+    )
+    assert [(r.submission_id, r.status) for r in response["results"]] == [
+        ("R_1", "not_found"),
+        ("R_2", "not_found"),
+    ]
+
+
+def test_roster_cursors_must_map_lists_to_positions():
+    assert server.decode_roster_cursor(
+        server.encode_roster_cursor({"pre": "airtable:0:itr1"})
+    ) == {"pre": "airtable:0:itr1"}
+
+    for positions in [{"pre": 5}, ["pre"], {"pre": None}]:
+        cursor = base64.urlsafe_b64encode(json.dumps(positions).encode()).decode()
+        with pytest.raises(HTTPException) as e:
+            server.decode_roster_cursor(cursor)
+        assert e.value.status_code == 400
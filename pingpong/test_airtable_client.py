@@ -0,0 +1,57 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import pingpong.airtable_client as airtable_client
+from pingpong.airtable_client import AirtableClient, AirtableError
+from pingpong.study.schemas import UserClassAssociation
+
+
+async def test_batch_update_reports_failed_batches(monkeypatch):
+    client = AirtableClient("key")
+    batches = list[list[str]]()
+
+    async def request(method, model, path="", **kwargs):
+        records = kwargs["json"]["records"]
+        batches.append([record["id"] for record in records])
+        if len(batches) == 2:
+            raise RuntimeError("INVALID_VALUE")
+        return {
+            "records": [
+                {"id": r["id"], "createdTime": "2025-01-01T00:00:00.000Z", "fields": {}}
+                for r in records
+            ]
+        }
+
+    monkeypatch.setattr(client, "request", request)
+    updates = [
+        (f"rec{n:02}", {"Exclude Status": "Requested to Remove"}) for n in range(25)
+    ]
+    result = await client.batch_update(UserClassAssociation, updates)
+
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert sorted(result.failed) == batches[1]
+    assert set(result.failed.values()) == {"INVALID_VALUE"}
+    assert len(result.updated) == 15
+
+
+async def test_errors_carry_the_airtable_error_type(monkeypatch):
+    async def expired(request):
+        return web.json_response(
+            {"error": {"type": "LIST_RECORDS_ITERATOR_NOT_AVAILABLE"}}, status=422
+        )
+
+    app = web.Application()
+    app.router.add_post("/{base}/{table}/listRecords", expired)
+    async with TestServer(app) as server:
+        monkeypatch.setattr(
+            airtable_client, "AIRTABLE_API_URL", str(server.make_url("")).rstrip("/")
+        )
+        client = AirtableClient("key")
+        try:
+            with pytest.raises(AirtableError) as e:
+                await client.list_page(UserClassAssociation, offset="itrOld")
+        finally:
+            await client.close()
+    assert e.value.status == 422
+    assert e.value.error_type == "LIST_RECORDS_ITERATOR_NOT_AVAILABLE"
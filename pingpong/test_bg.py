@@ -0,0 +1,52 @@
+import base64
+import hashlib
+import hmac
+import json
+
+import pytest
+from fastapi import HTTPException, Request
+
+from pingpong import bg
+
+SECRET = base64.b64encode(b"secret").decode()
+BODY = json.dumps({"base": {"id": "appBase"}}).encode()
+
+
+class FakeScheduler:
+    def notify(self, name: str) -> bool:
+        return True
+
+
+def _request(secret: str | None, mac: str | None = None) -> Request:
+    bg.get_server(
+        scheduler=FakeScheduler(),  # type: ignore[arg-type]
+        webhook_jobs={"appBase": ["job"]},
+        webhook_secret=secret,
+    )
+    headers = [(b"x-airtable-content-mac", mac.encode())] if mac else []
+
+    async def receive():
+        return {"type": "http.request", "body": BODY, "more_body": False}
+
+    scope = {"type": "http", "method": "POST", "headers": headers, "app": bg.app}
+    return Request(scope, receive)
+
+
+def _mac(body: bytes) -> str:
+    digest = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+    return f"hmac-sha256={digest}"
+
+
+async def test_signed_notifications_notify_the_base_jobs():
+    response = await bg.airtable_webhook(_request(SECRET, _mac(BODY)))
+    assert response == {"notified": ["job"]}
+
+
+@pytest.mark.parametrize(
+    ("secret", "mac"),
+    [(SECRET, None), (SECRET, _mac(b"other")), (None, None), (None, _mac(BODY))],
+)
+async def test_notifications_are_rejected_unless_signed(secret, mac):
+    with pytest.raises(HTTPException) as e:
+        await bg.airtable_webhook(_request(secret, mac))
+    assert e.value.status_code == 401
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from pingpong.jobs import Job
+
+
+def _gated_job(overlap, concurrency=1):
+    gate = asyncio.Event()
+    started = list[int]()
+
+    async def run():
+        started.append(len(started))
+        await gate.wait()
+
+    job = Job("job", run, "* * * * *", overlap=overlap, concurrency=concurrency)
+    return job, gate, started
+
+
+async def _drain(job: Job) -> None:
+    while job.running or job.backlog:
+        await asyncio.sleep(0)
+
+
+@pytest.mark.parametrize(
+    ("overlap", "runs", "skipped"),
+    [("skip", 1, 2), ("queue", 3, 0), ("coalesce", 2, 0)],
+)
+async def test_overlap_policies(overlap, runs, skipped):
+    job, gate, started = _gated_job(overlap)
+    for _ in range(3):
+        job.trigger()
+    await asyncio.sleep(0)
+    assert job.running == 1
+    assert job.skipped == skipped
+
+    gate.set()
+    await asyncio.wait_for(_drain(job), 1)
+    assert len(started) == job.runs == runs
+
+
+async def test_concurrency_allows_parallel_runs():
+    job, gate, started = _gated_job("skip", concurrency=2)
+    for _ in range(3):
+        job.trigger()
+    await asyncio.sleep(0)
+    assert job.running == 2
+    assert job.skipped == 1
+
+    gate.set()
+    await asyncio.wait_for(_drain(job), 1)
+    assert job.runs == 2
+
+
+async def test_notifications_are_debounced_into_one_run():
+    job, gate, started = _gated_job("queue")
+    job.debounce = 0.01
+    gate.set()
+    for _ in range(5):
+        job.notify()
+    await asyncio.sleep(0.05)
+    await asyncio.wait_for(_drain(job), 1)
+    assert job.notifications == 5
+    assert job.runs == 1
@@ -0,0 +1,155 @@
+import random
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import pingpong.now as now_module
+from pingpong.now import CronSchedule, croner
+
+# Inclusive value range of each cron field, as in pingpong.now.
+RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _random_field(rng: random.Random, low: int, high: int) -> tuple[str, set[int]]:
+    """A random cron field and the values it matches."""
+    kind = rng.choice(["*", "*/s", "n", "a-b", "a-b/s", "n/s", "list"])
+    a, b = sorted(rng.randint(low, high) for _ in range(2))
+    step = rng.randint(1, 5)
+    if kind == "*":
+        return "*", set(range(low, high + 1))
+    if kind == "*/s":
+        return f"*/{step}", set(range(low, high + 1, step))
+    if kind == "n":
+        return str(a), {a}
+    if kind == "a-b":
+        return f"{a}-{b}", set(range(a, b + 1))
+    if kind == "a-b/s":
+        return f"{a}-{b}/{step}", set(range(a, b + 1, step))
+    if kind == "n/s":
+        return f"{a}/{step}", set(range(a, high + 1, step))
+    values = sorted({rng.randint(low, high) for _ in range(rng.randint(2, 4))})
+    return ",".join(map(str, values)), set(values)
+
+
+def _reference_next(fields, values, ts: datetime, years: int = 9) -> datetime | None:
+    """The next run after `ts`, found by checking every day in turn."""
+    minutes, hours, days, months, weekdays = values
+    weekdays = {day % 7 for day in weekdays}
+    either_day = not (fields[2].startswith("*") or fields[4].startswith("*"))
+    start = ts.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    day = start.date()
+    while day < date(start.year + years, 1, 1):
+        dom = day.day in days
+        dow = (day.weekday() + 1) % 7 in weekdays
+        if day.month in months and ((dom or dow) if either_day else (dom and dow)):
+            for hour in sorted(hours):
+                for minute in sorted(minutes):
+                    run = datetime(
+                        day.year, day.month, day.day, hour, minute, tzinfo=ts.tzinfo
+                    )
+                    if run >= start:
+                        return run
+        day += timedelta(days=1)
+    return None
+
+
+def test_next_run_matches_a_brute_force_reference():
+    rng = random.Random(24)
+    zones = [timezone.utc, timezone(timedelta(hours=5, minutes=30))]
+    for _ in range(6000):
+        fields, values = zip(*(_random_field(rng, low, high) for low, high in RANGES))
+        tz = rng.choice(zones)
+        ts = datetime(2020, 1, 1, tzinfo=tz) + timedelta(
+            minutes=rng.randint(0, 10 * 365 * 24 * 60), seconds=rng.randint(0, 59)
+        )
+        expected = _reference_next(fields, values, ts)
+        if expected is None:
+            with pytest.raises(ValueError):
+                CronSchedule(" ".join(fields))
+            continue
+        assert CronSchedule(" ".join(fields)).next_after(ts, tz) == expected, fields
+
+
+@pytest.mark.parametrize(
+    ("sched", "expected"),
+    [
+        ("@hourly", datetime(2025, 3, 1, 13, 0)),
+        ("0 9 * * mon-fri", datetime(2025, 3, 3, 9, 0)),
+        ("0 0 * jan-feb sun", datetime(2026, 1, 4, 0, 0)),
+        ("0 0 29 2 *", datetime(2028, 2, 29, 0, 0)),
+        ("0 0 13 * 7", datetime(2025, 3, 2, 0, 0)),
+    ],
+)
+def test_names_and_macros(sched, expected):
+    ts = datetime(2025, 3, 1, 12, 7, 30, tzinfo=timezone.utc)
+    assert CronSchedule(sched).next_after(ts) == expected.replace(tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "sched", ["* * * *", "60 * * * *", "*/0 * * * *", "0 0 30 2 *", "0 0 * foo *"]
+)
+def test_invalid_schedules(sched):
+    with pytest.raises(ValueError):
+        CronSchedule(sched)
+
+
+class FakeClock:
+    """A loop clock and wall clock that only move when slept on."""
+
+    def __init__(self, start: datetime):
+        self.start = start
+        self.elapsed = 0.0
+
+    def time(self) -> float:
+        return self.elapsed
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.elapsed)
+
+    async def sleep(self, seconds: float) -> None:
+        self.elapsed += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock(datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc))
+    monkeypatch.setattr(
+        now_module,
+        "asyncio",
+        SimpleNamespace(get_running_loop=lambda: clock, sleep=clock.sleep),
+    )
+    return clock
+
+
+async def _ticks(clock: FakeClock, count: int, busy: list[float], **kwargs):
+    """The first `count` ticks, with the caller busy for `busy[i]` seconds."""
+    ticks = list[datetime]()
+    async for tick in croner("*/5 * * * *", now=clock.now, **kwargs):
+        ticks.append(tick)
+        if len(ticks) == count:
+            return [f"{t:%H:%M}" for t in ticks]
+        clock.elapsed += busy[len(ticks) - 1] if len(ticks) <= len(busy) else 0
+
+
+@pytest.mark.parametrize("jitter", [0.0, 60.0])
+@pytest.mark.parametrize(
+    ("missed", "expected"),
+    [
+        ("skip", ["12:05", "12:20", "12:25"]),
+        ("catch_up", ["12:05", "12:10", "12:15", "12:20"]),
+        ("coalesce", ["12:05", "12:15", "12:20"]),
+    ],
+)
+async def test_missed_tick_policies(clock, missed, expected, jitter):
+    ticks = await _ticks(
+        clock, len(expected), busy=[12 * 60], missed=missed, jitter=jitter
+    )
+    assert ticks == expected
+
+
+@pytest.mark.parametrize("missed", ["skip", "coalesce"])
+async def test_jitter_longer_than_the_interval_drops_no_idle_ticks(clock, missed):
+    random.seed(25)
+    ticks = await _ticks(clock, 24, busy=[], missed=missed, jitter=400)
+    assert ticks == [f"{12 + m // 60}:{m % 60:02}" for m in range(5, 125, 5)]
@@ -0,0 +1,124 @@
+import asyncio
+import fcntl
+import threading
+import time
+from types import SimpleNamespace
+
+from pyairtable import Api
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import pingpong.ratelimit as ratelimit
+from pingpong.ratelimit import Priority, RateLimitedAdapter, TokenBucket
+
+
+def test_batch_requests_leave_the_reserve(tmp_path):
+    bucket = TokenBucket(tmp_path / "bucket", rate=5.0, burst=5.0, reserve=2.0)
+    assert [bucket.try_acquire(Priority.BATCH) for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_acquire(Priority.BATCH) > 0
+    assert bucket.try_acquire(Priority.INTERACTIVE) == 0
+
+
+def test_penalty_pauses_every_priority(tmp_path):
+    bucket = TokenBucket(tmp_path / "bucket", rate=5.0, burst=5.0)
+    bucket.penalize(10)
+    assert bucket.try_acquire(Priority.INTERACTIVE) > 9
+
+
+async def test_acquire_doesnt_block_the_loop_on_a_held_lock(rate_limit_dir):
+    bucket = ratelimit.airtable_bucket("appLocked")
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    with open(bucket.path, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        threading.Timer(0.2, fcntl.flock, (f, fcntl.LOCK_UN)).start()
+        ticker = asyncio.create_task(tick())
+        await asyncio.wait_for(ratelimit.acquire("appLocked"), 5)
+        ticker.cancel()
+
+    assert ticks >= 10
+
+
+def _response(status: int, **headers: str) -> Response:
+    response = Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response._content = b""
+    response._content_consumed = True
+    return response
+
+
+def test_adapter_retries_429_through_the_shared_bucket(monkeypatch):
+    responses = [_response(429, **{"Retry-After": "0"}), _response(200)]
+    penalties = list[float]()
+    monkeypatch.setattr(HTTPAdapter, "send", lambda *args, **kwargs: responses.pop(0))
+    monkeypatch.setattr(
+        TokenBucket, "penalize", lambda self, seconds: penalties.append(seconds)
+    )
+
+    adapter = RateLimitedAdapter("appRetry")
+    request = PreparedRequest()
+    request.prepare(method="GET", url="https://api.airtable.com/v0/appRetry/t")
+    assert adapter.send(request).status_code == 200
+    assert penalties == [0.0]
+
+
+def test_adapter_keeps_the_retry_strategy_it_replaces():
+    api = Api("key")
+    model = SimpleNamespace(meta=SimpleNamespace(api=api, base_id="appKeep"))
+    ratelimit.limit_models(model)
+
+    adapter = api.session.get_adapter("https://api.airtable.com/v0/appKeep/t")
+    assert isinstance(adapter, RateLimitedAdapter)
+    assert isinstance(adapter.max_retries, Retry)
+    assert adapter.max_retries.total == 5
+    # 429s are retried by the adapter itself, after pausing the shared bucket.
+    assert 429 not in (adapter.max_retries.status_forcelist or ())
+
+
+async def test_waiters_are_served_by_priority_then_arrival(rate_limit_dir):
+    ratelimit.airtable_bucket("appOrder").penalize(0.2)
+    served = list[str]()
+
+    async def request(name: str, priority: Priority) -> None:
+        await ratelimit.acquire("appOrder", priority)
+        served.append(name)
+
+    await asyncio.gather(
+        request("batch 1", Priority.BATCH),
+        request("interactive 1", Priority.INTERACTIVE),
+        request("batch 2", Priority.BATCH),
+        request("interactive 2", Priority.INTERACTIVE),
+    )
+    assert served == ["interactive 1", "interactive 2", "batch 1", "batch 2"]
+
+
+def test_threads_are_served_by_priority_then_arrival(rate_limit_dir):
+    ratelimit.airtable_bucket("appThreads").penalize(0.3)
+    served = list[str]()
+
+    def request(name: str, priority: Priority) -> None:
+        ratelimit.acquire_sync("appThreads", priority)
+        served.append(name)
+
+    threads = [
+        threading.Thread(target=request, args=args)
+        for args in [
+            ("batch 1", Priority.BATCH),
+            ("interactive 1", Priority.INTERACTIVE),
+            ("batch 2", Priority.BATCH),
+        ]
+    ]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join(5)
+    assert served == ["interactive 1", "batch 1", "batch 2"]